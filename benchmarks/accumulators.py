@@ -0,0 +1,59 @@
+"""Per-example cost of the accumulator tiers.
+
+python benchmarks/accumulators.py --examples 100000
+"""
+
+import argparse
+import timeit
+import numpy as np
+from estimators.bandits import cressieread, cs
+from estimators.math import FloatSum, IncrementalFsum, NeumaierSum
+
+TIERS = [FloatSum, NeumaierSum, IncrementalFsum]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--examples", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, args.examples)
+    p_pred = rng.uniform(0, 1, args.examples)
+    r = rng.uniform(0, 1, args.examples)
+    examples = list(zip(p_log.tolist(), r.tolist(), p_pred.tolist()))
+
+    def one_by_one(estimator):
+        for example in examples:
+            estimator.add_example(*example)
+
+    def batched(estimator):
+        estimator.add_examples(p_log, r, p_pred)
+
+    cases = [
+        ("cressieread.Estimator", cressieread.Estimator, one_by_one),
+        ("cressieread.Estimator batched", cressieread.Estimator, batched),
+        ("cressieread.Interval", cressieread.Interval, one_by_one),
+        ("cressieread.Interval batched", cressieread.Interval, batched),
+        ("cs.Interval", cs.Interval, one_by_one),
+        ("cs.Interval batched", cs.Interval, batched),
+    ]
+
+    print(f"{'estimator':32}" + "".join(f"{a.__name__:>16}" for a in TIERS))
+    for name, estimator, run in cases:
+        costs = []
+        for accumulator in TIERS:
+            seconds = min(
+                timeit.repeat(
+                    lambda: run(estimator(accumulator=accumulator)),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            costs.append(f"{seconds / args.examples * 1e9:13.0f} ns")
+        print(f"{name:32}" + "".join(f"{c:>16}" for c in costs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Pushed states and merges per second of the aggregator under load from worker processes.
+
+python benchmarks/aggregator.py --workers 4 --connections 4 --states 5000 --max-batch 1 1024
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from estimators.aggregator import Aggregator, Client
+from estimators.bandits import cressieread
+from estimators.ccb import multislot
+
+
+def states():
+    rng = np.random.default_rng(0)
+    interval = cressieread.Interval()
+    interval.add_examples(
+        rng.uniform(0.1, 1, 1000), rng.choice([0, 1], 1000), rng.uniform(0, 1, 1000)
+    )
+    slots = multislot.Interval()
+    for i in range(1000):
+        slots.add_example([str(i % 20), "x"], [0.5, 0.5], [i % 2, 1], [1, 0.5])
+    return {"cressieread": interval.to_bytes(), "multislot": slots.to_bytes()}
+
+
+def push(address, connections, count):
+    async def connection():
+        async with await Client.connect_tcp(*address) as client:
+            for i in range(count):
+                name, data = encoded[i % 2]
+                await client.push(name, data)
+            await client.get("cressieread")
+
+    async def main():
+        await asyncio.gather(*(connection() for _ in range(connections)))
+
+    encoded = list(states().items())
+    asyncio.run(main())
+
+
+async def run(args, max_batch, executor):
+    async with Aggregator(args.max_pending, max_batch) as aggregator:
+        address = await aggregator.start_tcp()
+        loop = asyncio.get_running_loop()
+        count = args.states // (args.workers * args.connections)
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, push, address, args.connections, count)
+                for _ in range(args.workers)
+            )
+        )
+        await aggregator.get("cressieread")
+        seconds = time.perf_counter() - start
+        return aggregator.pushed, aggregator.merges, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--states", type=int, default=20000)
+    parser.add_argument("--max-pending", type=int, default=1024)
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[1, 1024])
+    args = parser.parse_args()
+
+    print(
+        f"{'max batch':>10}{'states':>10}{'merges':>10}{'states/s':>12}{'merges/s':>12}"
+    )
+    with ProcessPoolExecutor(args.workers) as executor:
+        for max_batch in args.max_batch:
+            pushed, merges, seconds = asyncio.run(run(args, max_batch, executor))
+            print(
+                f"{max_batch:>10}{pushed:>10}{merges:>10}"
+                f"{pushed / seconds:>12.0f}{merges / seconds:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Import time of the estimator modules, each measured in a fresh interpreter.
+
+python benchmarks/import_time.py --repeat 5
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = [
+    "estimators",
+    "estimators.bandits.ips",
+    "estimators.bandits.snips",
+    "estimators.bandits.gaussian",
+    "estimators.bandits.cressieread",
+    "estimators.bandits.cs",
+    "estimators.bandits.mle",
+    "estimators.ccb.multislot",
+    "scipy.stats",
+]
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter() - start, "scipy" in sys.modules]))
+"""
+
+
+def measure(module):
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(module=module)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':36}{'import time':>14}{'loads scipy':>14}")
+    for module in MODULES:
+        runs = [measure(module) for _ in range(args.repeat)]
+        seconds = min(seconds for seconds, _ in runs)
+        print(f"{module:36}{seconds * 1e3:11.1f} ms{str(runs[0][1]):>14}")
+
+
+if __name__ == "__main__":
+    main()
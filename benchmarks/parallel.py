@@ -0,0 +1,69 @@
+"""Throughput of sharded log evaluation by number of worker processes.
+
+python benchmarks/parallel.py --examples 2000000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from estimators import parallel
+from estimators.bandits import estimator_set
+
+
+def evaluate_lines(lines):
+    result = estimator_set.EstimatorSet()
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == 65536:
+            _add(result, batch)
+            batch = []
+    _add(result, batch)
+    return result
+
+
+def _add(result, batch):
+    if batch:
+        columns = np.array(b",".join(batch).replace(b"\n", b"").split(b","), float)
+        columns = columns.reshape(-1, 3)
+        result.add_examples(columns[:, 0], columns[:, 1], columns[:, 2])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--examples", type=int, default=2000000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()]
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    columns = np.column_stack(
+        (
+            rng.uniform(0.1, 1, args.examples),
+            rng.uniform(0, 1, args.examples),
+            rng.uniform(0, 1, args.examples),
+        )
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "log.csv")
+        np.savetxt(path, columns, delimiter=",", fmt="%.6f")
+        size = os.path.getsize(path)
+
+        print(f"{'workers':>8}{'seconds':>12}{'MB/s':>12}{'speedup':>12}")
+        baseline = None
+        for workers in sorted(set(args.workers)):
+            start = time.perf_counter()
+            parallel.evaluate(path, evaluate_lines, max_workers=workers)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print(
+                f"{workers:>8}{seconds:>12.2f}{size / seconds / 1e6:>12.1f}"
+                f"{baseline / seconds:>12.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Size and speed of to_bytes/from_bytes against pickle.
+
+python benchmarks/serialization.py --examples 100000
+"""
+
+import argparse
+import pickle
+import timeit
+import numpy as np
+from estimators.bandits import cressieread, estimator_set, gaussian, ips, mle
+from estimators.ccb import multislot
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--examples", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, args.examples)
+    p_pred = rng.uniform(0, 1, args.examples)
+    r = rng.uniform(0, 1, args.examples)
+
+    def filled(estimator):
+        estimator.add_examples(p_log[:1000], r[:1000], p_pred[:1000])
+        return estimator
+
+    slots = multislot.Estimator()
+    for i in range(1000):
+        slots.add_example([str(i % 20), "x"], [0.5, 0.5], [r[i], 1], [p_pred[i], 1])
+    large_mle = mle.Estimator()
+    large_mle.add_examples(p_log, r, p_pred)
+
+    cases = [
+        ("ips.Estimator", filled(ips.Estimator())),
+        ("gaussian.Interval", filled(gaussian.Interval())),
+        ("cressieread.Estimator", filled(cressieread.Estimator())),
+        ("cressieread.Interval", filled(cressieread.Interval())),
+        ("EstimatorSet", filled(estimator_set.EstimatorSet())),
+        ("multislot.Estimator (20 slots)", slots),
+        (f"mle.Estimator ({args.examples} rows)", large_mle),
+    ]
+
+    def best(fn):
+        return min(timeit.repeat(fn, number=1, repeat=args.repeat)) * 1e6
+
+    print(
+        f"{'estimator':32}{'bytes':>10}{'pickle':>10}"
+        f"{'encode us':>12}{'pickle':>10}{'decode us':>12}{'pickle':>10}"
+    )
+    for name, estimator in cases:
+        data = estimator.to_bytes()
+        pickled = pickle.dumps(estimator, protocol=pickle.HIGHEST_PROTOCOL)
+        decode = type(estimator).from_bytes
+        print(
+            f"{name:32}{len(data):>10}{len(pickled):>10}"
+            f"{best(estimator.to_bytes):>12.1f}"
+            f"{best(lambda: pickle.dumps(estimator, pickle.HIGHEST_PROTOCOL)):>10.1f}"
+            f"{best(lambda: decode(data)):>12.1f}"
+            f"{best(lambda: pickle.loads(pickled)):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -21,7 +21,7 @@ setuptools.setup(
     package_dir={"": "src"},
     packages=["estimators", "estimators.bandits", "estimators.ccb", "estimators.slates"],
     package_data={"estimators": ["py.typed"]},
-    install_requires= ['scipy>=0.9'],
+    install_requires= ['numpy', 'scipy>=0.9'],
     tests_require=['pytest'],
     python_requires=">=3.7",
 )
@@ -0,0 +1,31 @@
+""" Off-policy estimators """
+
+# Submodules are imported on first attribute access, so that e.g. importing ips does not
+# pay for scipy, which is only needed by some of the estimators.
+
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+from typing import List
+
+__all__ = [
+    "aggregator",
+    "bandits",
+    "ccb",
+    "checkpoint",
+    "math",
+    "parallel",
+    "serialization",
+    "slates",
+]
+
+
+def __getattr__(name: str) -> ModuleType:
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
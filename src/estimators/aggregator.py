@@ -0,0 +1,337 @@
+""" Aggregation of estimator states pushed over TCP or Unix sockets """
+
+# Workers push encoded states (to_bytes) under a name and the aggregator serves the merged
+# state of a name on request. Every message is a frame: operation, payload length, payload.
+# A connection decodes the states it receives and puts them in a bounded queue. A single
+# task drains the queue and merges everything queued for a name with one merge_all, so that
+# merges coalesce under load. When the queue is full connections stop reading, and the
+# socket buffers push back on the workers.
+
+from __future__ import annotations
+
+import asyncio
+import struct
+from estimators import serialization
+from estimators.parallel import tree_sum
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
+
+# operation and payload length
+_FRAME = struct.Struct("<BI")
+_NAME = struct.Struct("<H")
+
+# requests: name length, name and state / name
+_PUSH = 1
+_GET = 2
+# responses: merged state, empty for unknown names / utf-8 message
+_STATE = 3
+_ERROR = 4
+
+# name, decoded state and the errors of the pushing connection, or a future resolved once
+# everything queued before it is merged
+_Item = Tuple[str, Any, Optional[List[str]], "Optional[asyncio.Future[None]]"]
+
+
+def _write(writer: asyncio.StreamWriter, op: int, payload: bytes) -> None:
+    writer.writelines((_FRAME.pack(op, len(payload)), payload))
+
+
+async def _read(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    op, length = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    return op, await reader.readexactly(length)
+
+
+def _merged(cls: Type[Any], states: List[Any]) -> Any:
+    if len(states) == 1:
+        return states[0]
+    merge_all = getattr(cls, "merge_all", None)
+    return merge_all(states) if merge_all else tree_sum(states)
+
+
+class Aggregator:
+    """Merges estimator states pushed by workers and serves the merged states.
+
+    States pushed under the same name must be of the same class and configuration. The ones
+    that cannot be merged are dropped, counted in rejected and reported by the next get of
+    the connection that pushed them.
+
+        async with Aggregator() as aggregator:
+            host, port = await aggregator.start_tcp()
+            ...
+            interval = await aggregator.get("cressieread")
+    """
+
+    states: Dict[str, Any]
+    pushed: int
+    merges: int
+    rejected: int
+
+    def __init__(self, max_pending: int = 1024, max_batch: int = 1024) -> None:
+        """
+        Args:
+                max_pending: number of decoded states waiting to be merged before connections
+                    stop reading
+                max_batch: maximum number of queued states merged at once
+        """
+        assert max_pending > 0, "Error: max_pending must be positive"
+        assert max_batch > 0, "Error: max_batch must be positive"
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.states = {}
+        self.pushed = 0
+        self.merges = 0
+        self.rejected = 0
+        self._encoded: Dict[str, bytes] = {}
+        self._servers: List[asyncio.AbstractServer] = []
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._queue: Optional[asyncio.Queue[_Item]] = None
+        self._merger: Optional[asyncio.Task[None]] = None
+
+    async def start_tcp(
+        self, host: str = "127.0.0.1", port: int = 0
+    ) -> Tuple[str, int]:
+        """Listens on host and port, a free port by default, and returns the address"""
+        server = await asyncio.start_server(self._serve, host, port)
+        self._started(server)
+        address = server.sockets[0].getsockname()
+        return address[0], address[1]
+
+    async def start_unix(self, path: str) -> str:
+        server = await asyncio.start_unix_server(self._serve, path)
+        self._started(server)
+        return path
+
+    def _started(self, server: asyncio.AbstractServer) -> None:
+        self._servers.append(server)
+        if self._merger is None:
+            self._queue = asyncio.Queue(self.max_pending)
+            self._merger = asyncio.create_task(self._merge())
+
+    async def get(self, name: str) -> Any:
+        """Merged state of name, including every state received before the call"""
+        await self._sync()
+        return self.states.get(name)
+
+    async def close(self) -> None:
+        for server in self._servers:
+            server.close()
+        for writer in list(self._writers):
+            writer.close()
+        for server in self._servers:
+            await server.wait_closed()
+        if self._merger is not None:
+            await self._sync()
+            self._merger.cancel()
+            try:
+                await self._merger
+            except asyncio.CancelledError:
+                pass
+        self._servers, self._merger = [], None
+
+    async def __aenter__(self) -> Aggregator:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def _sync(self) -> None:
+        if self._queue is None:
+            return
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put(("", None, None, done))
+        await done
+
+    async def _merge(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        # reported to the next sync, the task keeps merging
+        failure: Optional[Exception] = None
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            pending: Dict[str, List[Tuple[Any, Optional[List[str]]]]] = {}
+            for name, state, errors, done in batch:
+                if done is None:
+                    pending.setdefault(name, []).append((state, errors))
+                    continue
+                failure = self._add_all(pending) or failure
+                pending = {}
+                if not done.done():
+                    if failure is None:
+                        done.set_result(None)
+                    else:
+                        done.set_exception(failure)
+                failure = None
+            failure = self._add_all(pending) or failure
+
+    def _add_all(
+        self, pending: Dict[str, List[Tuple[Any, Optional[List[str]]]]]
+    ) -> Optional[Exception]:
+        failure = None
+        for name, pushed in pending.items():
+            try:
+                self._add(name, pushed)
+            except Exception as e:
+                for _, errors in pushed:
+                    self._reject(errors, f"Error: merge under {name!r} failed: {e}")
+                failure = e
+        return failure
+
+    def _add(self, name: str, pushed: List[Tuple[Any, Optional[List[str]]]]) -> None:
+        current = self.states.get(name)
+        if current is not None:
+            pushed = [(current, None)] + pushed
+        cls = type(pushed[0][0])
+        accepted = []
+        for state, errors in pushed:
+            if type(state) is cls:
+                accepted.append((state, errors))
+            else:
+                self._reject(
+                    errors,
+                    f"Error: {type(state).__name__} pushed under {name!r} cannot be "
+                    f"merged with {cls.__name__}",
+                )
+        self.states[name] = self._merge_accepted(name, cls, accepted)
+        self._encoded.pop(name, None)
+        self.merges += 1
+
+    def _merge_accepted(
+        self, name: str, cls: Type[Any], accepted: List[Tuple[Any, Optional[List[str]]]]
+    ) -> Any:
+        try:
+            return _merged(cls, [state for state, _ in accepted])
+        except Exception:
+            # e.g. different r bounds, keep everything that can be merged
+            merged = accepted[0][0]
+            for state, errors in accepted[1:]:
+                try:
+                    merged = _merged(cls, [merged, state])
+                except Exception as e:
+                    self._reject(
+                        errors,
+                        f"Error: state pushed under {name!r} cannot be merged: {e}",
+                    )
+            return merged
+
+    def _reject(self, errors: Optional[List[str]], message: str) -> None:
+        self.rejected += 1
+        if errors is not None:
+            errors.append(message)
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        assert self._queue is not None
+        self._writers.add(writer)
+        # merge rejections of the states pushed by this connection
+        errors: List[str] = []
+        try:
+            while True:
+                op, payload = await _read(reader)
+                if op == _PUSH:
+                    try:
+                        (length,) = _NAME.unpack_from(payload)
+                        start, end = _NAME.size, _NAME.size + length
+                        name = payload[start:end].decode()
+                        state = serialization.from_bytes(memoryview(payload)[end:])
+                    except (ValueError, struct.error) as e:
+                        _write(writer, _ERROR, str(e).encode())
+                        await writer.drain()
+                        break
+                    self.pushed += 1
+                    await self._queue.put((name, state, errors, None))
+                elif op == _GET:
+                    _write(writer, *await self._reply(payload.decode(), errors))
+                    await writer.drain()
+                else:
+                    _write(writer, _ERROR, f"Error: unknown operation {op}".encode())
+                    await writer.drain()
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _reply(self, name: str, errors: List[str]) -> Tuple[int, bytes]:
+        """Merged state of name, or the errors of the connection since its previous get"""
+        try:
+            state = await self._state(name)
+        except Exception as e:
+            # already reported to the connections that pushed the states
+            if not errors:
+                errors.append(f"Error: merge failed: {e}")
+        if errors:
+            message = "\n".join(errors)
+            errors.clear()
+            return _ERROR, message.encode()
+        return _STATE, state
+
+    async def _state(self, name: str) -> bytes:
+        await self._sync()
+        if name not in self.states:
+            return b""
+        if name not in self._encoded:
+            self._encoded[name] = self.states[name].to_bytes()
+        return self._encoded[name]
+
+
+class Client:
+    """Connection of a worker to an aggregator"""
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect_tcp(cls, host: str, port: int) -> Client:
+        return cls(*await asyncio.open_connection(host, port))
+
+    @classmethod
+    async def connect_unix(cls, path: str) -> Client:
+        return cls(*await asyncio.open_unix_connection(path))
+
+    async def push(self, name: str, state: Any) -> None:
+        """Sends an estimator, or a state it encoded with to_bytes, to be merged under name.
+
+        Pushes are not acknowledged. A state that cannot be decoded is reported by the next
+        get, and the aggregator closes the connection. A state that cannot be merged is
+        dropped and also reported by the next get, under any name, and the connection stays
+        open.
+        """
+        encoded = name.encode()
+        if len(encoded) >= 1 << (8 * _NAME.size):
+            raise ValueError(f"Error: name of {len(encoded)} bytes is too long")
+        data = state if isinstance(state, (bytes, memoryview)) else state.to_bytes()
+        header = _FRAME.pack(_PUSH, _NAME.size + len(encoded) + len(data))
+        self._writer.writelines((header, _NAME.pack(len(encoded)), encoded, data))
+        await self._writer.drain()
+
+    async def get(self, name: str) -> Any:
+        """Merged state of name, including every push of this client, None if unknown.
+
+        Raises ValueError when a state pushed since the previous get was rejected.
+        """
+        _write(self._writer, _GET, name.encode())
+        await self._writer.drain()
+        try:
+            op, payload = await _read(self._reader)
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Error: aggregator closed the connection") from None
+        if op == _ERROR:
+            raise ValueError(payload.decode())
+        return serialization.from_bytes(payload) if payload else None
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def __aenter__(self) -> Client:
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
@@ -1,7 +1,9 @@
 """ Interface for implementation of contextual bandit estimators """
 
+import numpy.typing as npt
 from abc import ABC, abstractmethod
-from typing import Tuple, Optional
+from estimators.math import as_columns, dropped_events
+from typing import List, Optional, Sequence, Tuple
 
 
 class Estimator(ABC):
@@ -17,6 +19,19 @@ class Estimator(ABC):
         """
         ...
 
+    def add_examples(
+        self, p_log: npt.ArrayLike, r: npt.ArrayLike, p_pred: npt.ArrayLike
+    ) -> None:
+        """Adds a batch of examples, equivalent to calling add_example for each of them
+
+        Args:
+                p_log: array of probabilities of the logging policy
+                r: array of rewards
+                p_pred: array of predicted probabilities of making decision
+        """
+        for example in zip(*(c.tolist() for c in as_columns(p_log, r, p_pred))):
+            self.add_example(*example)
+
     @abstractmethod
     def get(self) -> Optional[float]:
         """Calculates the selected estimator
@@ -49,6 +64,34 @@ class Interval(ABC):
         """
         ...
 
+    def add_examples(
+        self,
+        p_log: npt.ArrayLike,
+        r: npt.ArrayLike,
+        p_pred: npt.ArrayLike,
+        p_drop: npt.ArrayLike = 0,
+        n_drop: Optional[npt.ArrayLike] = None,
+    ) -> None:
+        """Adds a batch of examples, equivalent to calling add_example for each of them
+
+        Args:
+                p_log: array of probabilities of the logging policy
+                r: array of rewards
+                p_pred: array of predicted probabilities of making decision
+                p_drop: array of probabilities for event to be dropped
+                n_drop: array of amounts of dropped events, masked entries are populated as p_drop/(1-p_drop)
+        """
+        p_log, r, p_pred, p_drop = as_columns(p_log, r, p_pred, p_drop)
+        n_drops = dropped_events(p_drop, n_drop)
+        for example in zip(
+            p_log.tolist(),
+            r.tolist(),
+            p_pred.tolist(),
+            p_drop.tolist(),
+            n_drops.tolist(),
+        ):
+            self.add_example(*example)
+
     @abstractmethod
     def get(self, alpha: float) -> Tuple[float, float]:
         """Calculates the CI
@@ -58,3 +101,13 @@ class Interval(ABC):
                 Returns the confidence interval as list[float]
         """
         ...
+
+    def get_many(self, alphas: Sequence[float]) -> List[Tuple[float, float]]:
+        """Calculates the CI for each of the alphas, equivalent to calling get for each of them
+
+        Args:
+                alphas: alpha values
+        Returns:
+                Returns the confidence intervals in the order of alphas
+        """
+        return [self.get(alpha) for alpha in alphas]
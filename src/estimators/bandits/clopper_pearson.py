@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import struct
+import numpy as np
+import numpy.typing as npt
+from estimators import serialization
 from estimators.bandits import base
-from typing import List, Optional, Tuple
-from estimators.math import clopper_pearson
+from estimators.checkpoint import Checkpointable
+from typing import Iterable, List, Optional, Sequence, Tuple
+from estimators.math import as_columns, clopper_pearson_many, dropped_events
 
 from math import inf
 
+_STATE = struct.Struct("<?ddddd")
 
-class Interval(base.Interval):
+
+class Interval(base.Interval, Checkpointable):
     examples_count: float
     weighted_reward: float
     max_weight: float
@@ -51,37 +58,117 @@ class Interval(base.Interval):
         n_drop_tmp: float = (
             float(n_drop) if n_drop is not None else p_drop / (1 - p_drop)
         )
-        r = self._scale(r)
         self.examples_count += 1 + n_drop_tmp
         w = p_pred / (p_log * (1 - p_drop))
-        self.weighted_reward += r * w
+        self.weighted_reward += self._scale(r) * w
         self.max_weight = max(self.max_weight, w)
+        if self._delta is not None:
+            self._delta.add_example(p_log, r, p_pred, p_drop, n_drop)
+
+    def add_examples(
+        self,
+        p_log: npt.ArrayLike,
+        r: npt.ArrayLike,
+        p_pred: npt.ArrayLike,
+        p_drop: npt.ArrayLike = 0,
+        n_drop: Optional[npt.ArrayLike] = None,
+    ) -> None:
+        p_log, r, p_pred, p_drop = as_columns(p_log, r, p_pred, p_drop)
+        if len(r) == 0:
+            return
+
+        if self.empirical_r_bounds:
+            # every example is scaled with the bounds seen up to and including it
+            rmin = np.minimum.accumulate(np.minimum(r, self.rmin))
+            rmax = np.maximum.accumulate(np.maximum(r, self.rmax))
+            self.rmin = float(rmin[-1])
+            self.rmax = float(rmax[-1])
+            scaled = (r - rmin) / (rmax - rmin)
+        else:
+            outside = (r > self.rmax) | (r < self.rmin)
+            if outside.any():
+                raise ValueError(
+                    f"Error: Value of r={r[outside][0]} is outside rmin={self.rmin}, rmax={self.rmax} bounds"
+                )
+            scaled = (r - self.rmin) / (self.rmax - self.rmin)
+
+        n_drop_tmp = dropped_events(p_drop, n_drop)
+        self.examples_count += len(r) + float(np.sum(n_drop_tmp))
+        w = p_pred / (p_log * (1 - p_drop))
+        self.weighted_reward += float(np.sum(scaled * w))
+        self.max_weight = max(self.max_weight, float(np.max(w)))
+        if self._delta is not None:
+            self._delta.add_examples(p_log, r, p_pred, p_drop, n_drop)
+
+    def _empty(self) -> Interval:
+        return Interval(self.rmin, self.rmax, self.empirical_r_bounds)
 
     def get(self, alpha: float = 0.05) -> Tuple[float, float]:
+        return self.get_many([alpha])[0]
+
+    def get_many(self, alphas: Sequence[float]) -> List[Tuple[float, float]]:
         if self.max_weight > 0.0:
             successes = self.weighted_reward / self.max_weight
             n = self.examples_count / self.max_weight
-            cp = clopper_pearson(successes, n, alpha)
-            return (self._scale_back(cp[0]), self._scale_back(cp[1]))
-        return (-inf, inf) if self.empirical_r_bounds else (self.rmin, self.rmax)
+            return [
+                (self._scale_back(cp[0]), self._scale_back(cp[1]))
+                for cp in clopper_pearson_many(successes, n, alphas)
+            ]
+        empty = (-inf, inf) if self.empirical_r_bounds else (self.rmin, self.rmax)
+        return [empty] * len(alphas)
+
+    def to_bytes(self) -> bytes:
+        return (
+            serialization.Writer(serialization.Kind.CLOPPER_PEARSON)
+            .pack(
+                _STATE,
+                self.empirical_r_bounds,
+                self.rmin,
+                self.rmax,
+                self.examples_count,
+                self.weighted_reward,
+                self.max_weight,
+            )
+            .getvalue()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Interval:
+        reader = serialization.Reader(data, serialization.Kind.CLOPPER_PEARSON)
+        empirical_r_bounds, rmin, rmax, *sums = reader.unpack(_STATE)
+        reader.end()
+        result = cls(rmin, rmax, empirical_r_bounds)
+        result.examples_count, result.weighted_reward, result.max_weight = sums
+        return result
 
     def __add__(self, other: Interval) -> Interval:
-        assert not (
-            self.empirical_r_bounds ^ other.empirical_r_bounds
-        ), "Summation of estimators with various r bounds policy is prohibited"
-
-        if not self.empirical_r_bounds:
-            assert (
-                self.rmin == other.rmin
-            ), "Summation of estimators with various r bounds is prohibited"
-            assert (
-                self.rmax == other.rmax
-            ), "Summation of estimators with various r bounds is prohibited"
-
-        result = Interval(
-            rmin=self.rmin, rmax=self.rmax, empirical_r_bounds=self.empirical_r_bounds
+        return Interval.merge_all((self, other))
+
+    @classmethod
+    def merge_all(cls, intervals: Iterable[Interval]) -> Interval:
+        intervals = list(intervals)
+        assert intervals, "Error: nothing to merge"
+        first = intervals[0]
+        for other in intervals[1:]:
+            assert not (
+                first.empirical_r_bounds ^ other.empirical_r_bounds
+            ), "Summation of estimators with various r bounds policy is prohibited"
+
+            if not first.empirical_r_bounds:
+                assert (
+                    first.rmin == other.rmin
+                ), "Summation of estimators with various r bounds is prohibited"
+                assert (
+                    first.rmax == other.rmax
+                ), "Summation of estimators with various r bounds is prohibited"
+
+        result = cls(
+            rmin=first.rmin,
+            rmax=first.rmax,
+            empirical_r_bounds=first.empirical_r_bounds,
         )
-        result.examples_count = self.examples_count + other.examples_count
-        result.weighted_reward = self.weighted_reward + other.weighted_reward
-        result.max_weight = max(self.max_weight, other.max_weight)
+        for x in intervals:
+            result.examples_count += x.examples_count
+            result.weighted_reward += x.weighted_reward
+            result.max_weight = max(result.max_weight, x.max_weight)
         return result
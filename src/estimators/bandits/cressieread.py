@@ -2,39 +2,72 @@
 
 from __future__ import annotations
 
-from math import inf
+import struct
+import typing
+import numpy as np
+import numpy.typing as npt
+from math import inf, isclose, sqrt
+from estimators import serialization
 from estimators.bandits import base
-from typing import List, Optional, Tuple
-from estimators.math import IncrementalFsum
+from estimators.checkpoint import Checkpointable
+from typing import Iterable, List, Optional, Sequence, Tuple, Type
+from estimators.math import (
+    Accumulator,
+    IncrementalFsum,
+    QuantileCache,
+    as_columns,
+    dropped_events,
+)
+
+
+def _f_isf_dfn_1(q: npt.NDArray[np.float64], dfd: float) -> npt.NDArray[np.float64]:
+    from scipy.stats import f  # type: ignore
+
+    return typing.cast(npt.NDArray[np.float64], f.isf(q=q, dfn=1, dfd=dfd))
+
+
+_f_isf = QuantileCache(_f_isf_dfn_1)
+
+# accumulator code, wmin, wmax, n and the sums of EstimatorImpl
+_ESTIMATOR_STATE = struct.Struct("<Bddqddddd")
+# accumulator code, empirical_r_bounds, wmin, wmax, rmin, rmax, n and the sums of IntervalImpl
+_INTERVAL_STATE = struct.Struct("<B?dddddddddd")
 
 
 class EstimatorImpl:
     wmin: float
     wmax: float
-    n: IncrementalFsum
-    sumw: IncrementalFsum
-    sumwsq: IncrementalFsum
-    sumwr: IncrementalFsum
-    sumwsqr: IncrementalFsum
-    sumr: IncrementalFsum
+    accumulator: Type[Accumulator]
+    n: int
+    sumw: Accumulator
+    sumwsq: Accumulator
+    sumwr: Accumulator
+    sumwsqr: Accumulator
+    sumr: Accumulator
 
     # NB: This works better you use the true wmin and wmax
     #     which is _not_ the empirical minimum and maximum
     #     but rather the actual smallest and largest possible values
 
-    def __init__(self, wmin: float = 0, wmax: float = inf):
+    def __init__(
+        self,
+        wmin: float = 0,
+        wmax: float = inf,
+        accumulator: Type[Accumulator] = IncrementalFsum,
+    ):
         assert wmin < 1
         assert wmax > 1
 
         self.wmin = wmin
         self.wmax = wmax
+        self.accumulator = accumulator
 
-        self.n = IncrementalFsum()
-        self.sumw = IncrementalFsum()
-        self.sumwsq = IncrementalFsum()
-        self.sumwr = IncrementalFsum()
-        self.sumwsqr = IncrementalFsum()
-        self.sumr = IncrementalFsum()
+        self.n = 0
+        self.sumw = accumulator()
+        self.sumwsq = accumulator()
+        self.sumwr = accumulator()
+        self.sumwsqr = accumulator()
+        self.sumr = accumulator()
 
     def add(self, w: float, r: float) -> None:
         assert w >= 0, "Error: negative importance weight"
@@ -49,6 +82,22 @@ class EstimatorImpl:
         self.wmax = max(self.wmax, w)
         self.wmin = min(self.wmin, w)
 
+    def add_many(self, w: npt.NDArray[np.float64], r: npt.NDArray[np.float64]) -> None:
+        if len(w) == 0:
+            return
+        assert (w >= 0).all(), "Error: negative importance weight"
+
+        wsq = w**2
+        self.n += len(w)
+        self.sumw.add_many(w)
+        self.sumwsq.add_many(wsq)
+        self.sumwr.add_many(w * r)
+        self.sumwsqr.add_many(wsq * r)
+        self.sumr.add_many(r)
+
+        self.wmax = max(self.wmax, float(np.max(w)))
+        self.wmin = min(self.wmin, float(np.min(w)))
+
     def get(self) -> Optional[float]:
         n = float(self.n)
         if n == 0:
@@ -79,17 +128,55 @@ class EstimatorImpl:
 
         return vhat
 
+    def _write(self, writer: serialization.Writer) -> serialization.Writer:
+        return writer.pack(
+            _ESTIMATOR_STATE,
+            serialization.accumulator_code(self.accumulator),
+            self.wmin,
+            self.wmax,
+            self.n,
+            float(self.sumw),
+            float(self.sumwsq),
+            float(self.sumwr),
+            float(self.sumwsqr),
+            float(self.sumr),
+        )
+
+    @classmethod
+    def _read(cls, reader: serialization.Reader) -> "EstimatorImpl":
+        code, wmin, wmax, n, *sums = reader.unpack(_ESTIMATOR_STATE)
+        accumulator = serialization.accumulator_type(code)
+        result = cls(wmin, wmax, accumulator)
+        result.n = n
+        (
+            result.sumw,
+            result.sumwsq,
+            result.sumwr,
+            result.sumwsqr,
+            result.sumr,
+        ) = (serialization.accumulated(accumulator, x) for x in sums)
+        return result
+
     def __add__(self, other: "EstimatorImpl") -> "EstimatorImpl":
-        result = EstimatorImpl(
-            wmin=min(self.wmin, other.wmin), wmax=max(self.wmax, other.wmax)
+        return EstimatorImpl.merge_all((self, other))
+
+    @classmethod
+    def merge_all(cls, impls: Iterable["EstimatorImpl"]) -> "EstimatorImpl":
+        impls = list(impls)
+        assert impls, "Error: nothing to merge"
+        merge_all = impls[0].accumulator.merge_all
+        result = cls(
+            wmin=min(x.wmin for x in impls),
+            wmax=max(x.wmax for x in impls),
+            accumulator=impls[0].accumulator,
         )
 
-        result.n = IncrementalFsum.merge(self.n, other.n)
-        result.sumw = IncrementalFsum.merge(self.sumw, other.sumw)
-        result.sumwsq = IncrementalFsum.merge(self.sumwsq, other.sumwsq)
-        result.sumwr = IncrementalFsum.merge(self.sumwr, other.sumwr)
-        result.sumwsqr = IncrementalFsum.merge(self.sumwsqr, other.sumwsqr)
-        result.sumr = IncrementalFsum.merge(self.sumr, other.sumr)
+        result.n = sum(x.n for x in impls)
+        result.sumw = merge_all([x.sumw for x in impls])
+        result.sumwsq = merge_all([x.sumwsq for x in impls])
+        result.sumwr = merge_all([x.sumwr for x in impls])
+        result.sumwsqr = merge_all([x.sumwsqr for x in impls])
+        result.sumr = merge_all([x.sumr for x in impls])
 
         return result
 
@@ -99,12 +186,13 @@ class IntervalImpl:
     wmax: float
     rmin: float
     rmax: float
-    n: IncrementalFsum
-    sumw: IncrementalFsum
-    sumwsq: IncrementalFsum
-    sumwr: IncrementalFsum
-    sumwsqr: IncrementalFsum
-    sumwsqrsq: IncrementalFsum
+    accumulator: Type[Accumulator]
+    n: Accumulator
+    sumw: Accumulator
+    sumwsq: Accumulator
+    sumwr: Accumulator
+    sumwsqr: Accumulator
+    sumwsqrsq: Accumulator
     empirical_r_bounds: bool
 
     # NB: This works better you use the true wmin and wmax
@@ -118,6 +206,7 @@ class IntervalImpl:
         rmin: float,
         rmax: float,
         empirical_r_bounds: bool,
+        accumulator: Type[Accumulator] = IncrementalFsum,
     ):
         assert wmin < 1
         assert wmax > 1
@@ -127,13 +216,15 @@ class IntervalImpl:
         self.rmin = rmin
         self.rmax = rmax
         self.empirical_r_bounds = empirical_r_bounds
+        self.accumulator = accumulator
 
-        self.n = IncrementalFsum()
-        self.sumw = IncrementalFsum()
-        self.sumwsq = IncrementalFsum()
-        self.sumwr = IncrementalFsum()
-        self.sumwsqr = IncrementalFsum()
-        self.sumwsqrsq = IncrementalFsum()
+        # n is fractional when dropped events are estimated from p_drop
+        self.n = accumulator()
+        self.sumw = accumulator()
+        self.sumwsq = accumulator()
+        self.sumwr = accumulator()
+        self.sumwsqr = accumulator()
+        self.sumwsqrsq = accumulator()
 
     def add(self, w: float, r: float, p_drop: float, n_drop: Optional[int]) -> None:
         assert w >= 0, "Error: negative importance weight"
@@ -158,13 +249,52 @@ class IntervalImpl:
                     f"Error: Value of r={r} is outside rmin={self.rmin}, rmax={self.rmax} bounds"
                 )
 
+    def add_many(
+        self,
+        w: npt.NDArray[np.float64],
+        r: npt.NDArray[np.float64],
+        p_drop: npt.NDArray[np.float64],
+        n_drop: npt.NDArray[np.float64],
+    ) -> None:
+        """Batch version of add, n_drop is expected to be populated for every example"""
+        if len(w) == 0:
+            return
+        assert (w >= 0).all(), "Error: negative importance weight"
+
+        if self.empirical_r_bounds:
+            self.rmax = max(self.rmax, float(np.max(r)))
+            self.rmin = min(self.rmin, float(np.min(r)))
+        else:
+            outside = (r > self.rmax) | (r < self.rmin)
+            if outside.any():
+                raise ValueError(
+                    f"Error: Value of r={r[outside][0]} is outside rmin={self.rmin}, rmax={self.rmax} bounds"
+                )
+
+        w = w / (1 - p_drop)
+        wsq = w**2
+        wsqr = wsq * r
+        self.n += len(w)
+        self.n.add_many(n_drop)
+        self.sumw.add_many(w)
+        self.sumwsq.add_many(wsq)
+        self.sumwr.add_many(w * r)
+        self.sumwsqr.add_many(wsqr)
+        self.sumwsqrsq.add_many(wsqr * r)
+
+        self.wmax = max(self.wmax, float(np.max(w)))
+        self.wmin = min(self.wmin, float(np.min(w)))
+
     def get(self, alpha: float = 0.05, atol: float = 1e-9) -> Tuple[float, float]:
-        from math import isclose, sqrt
-        from scipy.stats import f  # type: ignore
+        return self.get_many([alpha], atol)[0]
 
+    def get_many(
+        self, alphas: Sequence[float], atol: float = 1e-9
+    ) -> List[Tuple[float, float]]:
         n = float(self.n)
         if n == 0:
-            return (-inf, inf) if self.empirical_r_bounds else (self.rmin, self.rmax)
+            empty = (-inf, inf) if self.empirical_r_bounds else (self.rmin, self.rmax)
+            return [empty] * len(alphas)
 
         sumw = float(self.sumw)
         sumwsq = float(self.sumwsq)
@@ -180,108 +310,316 @@ class IntervalImpl:
             uncb = (uncwfake**2 + sumwsq) / (1 + n)
             uncgstar = (1 + n) * (unca - 1) ** 2 / (uncb - unca * unca)
 
-        delta = f.isf(q=alpha, dfn=1, dfd=n)
-        phi = (-uncgstar - delta) / (2 * (1 + n))
+        sums = (sumw, sumwsq, sumwr, sumwsqr, sumwsqrsq)
+        result: List[Tuple[float, float]] = []
+        for delta in _f_isf(alphas, n):
+            phi = (-uncgstar - delta) / (2 * (1 + n))
+            result.append(
+                (
+                    self._bound(self.rmin, 1, n, sums, phi, atol),
+                    self._bound(self.rmax, -1, n, sums, phi, atol),
+                )
+            )
+
+        return result
 
-        bounds: List[float] = []
-        for r, sign in ((self.rmin, 1), (self.rmax, -1)):
-            candidates = []
-            for wfake in (self.wmin, self.wmax):
-                if wfake == inf:
-                    x = sign * (r + (sumwr - sumw * r) / n)
-                    y = (r * sumw - sumwr) ** 2 / (n * (1 + n)) - (
-                        r**2 * sumwsq - 2 * r * sumwsqr + sumwsqrsq
-                    ) / (1 + n)
-                    z = phi + 1 / (2 * n)
-
-                    if isclose(y * z, 0, abs_tol=atol * atol):
-                        gstar = x - sqrt(2) * atol
-                        candidates.append(gstar)
-                    elif z <= 0 and y * z >= 0:
-                        gstar = x - sqrt(2 * y * z)
-                        candidates.append(gstar)
-                else:
-                    barw = (wfake + sumw) / (1 + n)
-                    barwsq = (wfake * wfake + sumwsq) / (1 + n)
-                    barwr = sign * (wfake * r + sumwr) / (1 + n)
-                    barwsqr = sign * (wfake * wfake * r + sumwsqr) / (1 + n)
-                    barwsqrsq = (wfake * wfake * r * r + sumwsqrsq) / (1 + n)
-
-                    if barwsq > barw**2:
-                        x = barwr + (
-                            (1 - barw) * (barwsqr - barw * barwr) / (barwsq - barw**2)
-                        )
-                        y = (barwsqr - barw * barwr) ** 2 / (barwsq - barw**2) - (
-                            barwsqrsq - barwr**2
-                        )
-                        z = phi + (1 / 2) * (1 - barw) ** 2 / (barwsq - barw**2)
-
-                        if isclose(y * z, 0, abs_tol=atol * atol):
-                            gstar = x - sqrt(2) * atol
-                            candidates.append(gstar)
-                        elif z <= 0 and y * z >= 0:
-                            gstar = x - sqrt(2 * y * z)
-                            candidates.append(gstar)
-
-            if candidates and len(candidates) > 0:
-                best = min(candidates)
+    def _bound(
+        self,
+        r: float,
+        sign: int,
+        n: float,
+        sums: Tuple[float, float, float, float, float],
+        phi: float,
+        atol: float,
+    ) -> float:
+        """Lower bound for r = rmin and sign = 1, upper bound for r = rmax and sign = -1"""
+        sumw, sumwsq, sumwr, sumwsqr, sumwsqrsq = sums
+        candidates = []
+        for wfake in (self.wmin, self.wmax):
+            if wfake == inf:
+                x = sign * (r + (sumwr - sumw * r) / n)
+                y = (r * sumw - sumwr) ** 2 / (n * (1 + n)) - (
+                    r**2 * sumwsq - 2 * r * sumwsqr + sumwsqrsq
+                ) / (1 + n)
+                z = phi + 1 / (2 * n)
             else:
-                best = self.rmin
-            vbound = min(self.rmax, max(self.rmin, sign * best))
-            bounds.append(vbound)
+                barw = (wfake + sumw) / (1 + n)
+                barwsq = (wfake * wfake + sumwsq) / (1 + n)
+                barwr = sign * (wfake * r + sumwr) / (1 + n)
+                barwsqr = sign * (wfake * wfake * r + sumwsqr) / (1 + n)
+                barwsqrsq = (wfake * wfake * r * r + sumwsqrsq) / (1 + n)
+
+                if barwsq <= barw**2:
+                    continue
+                x = barwr + ((1 - barw) * (barwsqr - barw * barwr) / (barwsq - barw**2))
+                y = (barwsqr - barw * barwr) ** 2 / (barwsq - barw**2) - (
+                    barwsqrsq - barwr**2
+                )
+                z = phi + (1 / 2) * (1 - barw) ** 2 / (barwsq - barw**2)
+
+            if isclose(y * z, 0, abs_tol=atol * atol):
+                candidates.append(x - sqrt(2) * atol)
+            elif z <= 0 and y * z >= 0:
+                candidates.append(x - sqrt(2 * y * z))
+
+        best = min(candidates) if candidates else self.rmin
+        return min(self.rmax, max(self.rmin, sign * best))
+
+    def _write(self, writer: serialization.Writer) -> serialization.Writer:
+        return writer.pack(
+            _INTERVAL_STATE,
+            serialization.accumulator_code(self.accumulator),
+            self.empirical_r_bounds,
+            self.wmin,
+            self.wmax,
+            self.rmin,
+            self.rmax,
+            float(self.n),
+            float(self.sumw),
+            float(self.sumwsq),
+            float(self.sumwr),
+            float(self.sumwsqr),
+            float(self.sumwsqrsq),
+        )
 
-        return (bounds[0], bounds[1])
+    @classmethod
+    def _read(cls, reader: serialization.Reader) -> "IntervalImpl":
+        code, empirical_r_bounds, wmin, wmax, rmin, rmax, *sums = reader.unpack(
+            _INTERVAL_STATE
+        )
+        accumulator = serialization.accumulator_type(code)
+        result = cls(wmin, wmax, rmin, rmax, empirical_r_bounds, accumulator)
+        (
+            result.n,
+            result.sumw,
+            result.sumwsq,
+            result.sumwr,
+            result.sumwsqr,
+            result.sumwsqrsq,
+        ) = (serialization.accumulated(accumulator, x) for x in sums)
+        return result
 
     def __add__(self, other: "IntervalImpl") -> "IntervalImpl":
-        assert not (
-            self.empirical_r_bounds ^ other.empirical_r_bounds
-        ), "Summation of estimators with various r bounds policy is prohibited"
-
-        if not self.empirical_r_bounds:
-            assert (
-                self.rmin == other.rmin
-            ), "Summation of estimators with various r bounds is prohibited"
-            assert (
-                self.rmax == other.rmax
-            ), "Summation of estimators with various r bounds is prohibited"
-
-        result = IntervalImpl(
-            wmin=min(self.wmin, other.wmin),
-            wmax=max(self.wmax, other.wmax),
-            rmin=min(self.rmin, other.rmin),
-            rmax=max(self.rmax, other.rmax),
-            empirical_r_bounds=self.empirical_r_bounds,
+        return IntervalImpl.merge_all((self, other))
+
+    @classmethod
+    def merge_all(cls, impls: Iterable["IntervalImpl"]) -> "IntervalImpl":
+        impls = list(impls)
+        assert impls, "Error: nothing to merge"
+        first = impls[0]
+        for other in impls[1:]:
+            assert not (
+                first.empirical_r_bounds ^ other.empirical_r_bounds
+            ), "Summation of estimators with various r bounds policy is prohibited"
+
+            if not first.empirical_r_bounds:
+                assert (
+                    first.rmin == other.rmin
+                ), "Summation of estimators with various r bounds is prohibited"
+                assert (
+                    first.rmax == other.rmax
+                ), "Summation of estimators with various r bounds is prohibited"
+
+        merge_all = first.accumulator.merge_all
+        result = cls(
+            wmin=min(x.wmin for x in impls),
+            wmax=max(x.wmax for x in impls),
+            rmin=min(x.rmin for x in impls),
+            rmax=max(x.rmax for x in impls),
+            empirical_r_bounds=first.empirical_r_bounds,
+            accumulator=first.accumulator,
         )
 
-        result.n = IncrementalFsum.merge(self.n, other.n)
-        result.sumw = IncrementalFsum.merge(self.sumw, other.sumw)
-        result.sumwsq = IncrementalFsum.merge(self.sumwsq, other.sumwsq)
-        result.sumwr = IncrementalFsum.merge(self.sumwr, other.sumwr)
-        result.sumwsqr = IncrementalFsum.merge(self.sumwsqr, other.sumwsqr)
-        result.sumwsqrsq = IncrementalFsum.merge(self.sumwsqrsq, other.sumwsqrsq)
+        result.n = merge_all([x.n for x in impls])
+        result.sumw = merge_all([x.sumw for x in impls])
+        result.sumwsq = merge_all([x.sumwsq for x in impls])
+        result.sumwr = merge_all([x.sumwr for x in impls])
+        result.sumwsqr = merge_all([x.sumwsqr for x in impls])
+        result.sumwsqrsq = merge_all([x.sumwsqrsq for x in impls])
 
         return result
 
 
-class Estimator(base.Estimator):
+def estimates(
+    n: npt.ArrayLike,
+    sumw: npt.ArrayLike,
+    sumwsq: npt.ArrayLike,
+    sumwr: npt.ArrayLike,
+    sumwsqr: npt.ArrayLike,
+    sumr: npt.ArrayLike,
+    wmin: npt.ArrayLike,
+    wmax: npt.ArrayLike,
+) -> npt.NDArray[np.float64]:
+    """EstimatorImpl.get over arrays of sufficient statistics, nan where there is no data"""
+    n, sumw, sumwsq, sumwr, sumwsqr, sumr, wmin, wmax = as_columns(
+        n, sumw, sumwsq, sumwr, sumwsqr, sumr, wmin, wmax
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wfake = np.where(sumw < n, wmax, wmin)
+        unbounded = wfake == inf
+        wfake = np.where(unbounded, 0, wfake)
+
+        a = (wfake + sumw) / (1 + n)
+        b = (wfake**2 + sumwsq) / (1 + n)
+        assert (unbounded | (n == 0) | (a * a < b)).all()
+        gamma = np.where(unbounded, -(1 + n) / n, (b - a) / (a * a - b))
+        beta = np.where(unbounded, 0.0, (1 - a) / (a * a - b))
+
+        vhat = (-gamma * sumwr - beta * sumwsqr) / (1 + n)
+        missing = np.maximum(0.0, 1 - (-gamma * sumw - beta * sumwsq) / (1 + n))
+        rhatmissing = sumr / n
+        vhat += missing * rhatmissing
+
+    result: npt.NDArray[np.float64] = np.where(n == 0, np.nan, vhat)
+    return result
+
+
+def bounds(
+    n: npt.ArrayLike,
+    sumw: npt.ArrayLike,
+    sumwsq: npt.ArrayLike,
+    sumwr: npt.ArrayLike,
+    sumwsqr: npt.ArrayLike,
+    sumwsqrsq: npt.ArrayLike,
+    wmin: npt.ArrayLike,
+    wmax: npt.ArrayLike,
+    rmin: npt.ArrayLike,
+    rmax: npt.ArrayLike,
+    alpha: float = 0.05,
+    atol: float = 1e-9,
+    empirical_r_bounds: bool = False,
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """IntervalImpl.get over arrays of sufficient statistics
+
+    Bounds agree with IntervalImpl.get up to rounding, except that a bound can move by O(atol)
+    when rounding puts y * z on the other side of the atol threshold.
+
+    Returns:
+        arrays of lower and upper bounds
+    """
+    from scipy.stats import f  # type: ignore[import, unused-ignore]
+
+    n, sumw, sumwsq, sumwr, sumwsqr, sumwsqrsq, wmin, wmax, rmin, rmax = as_columns(
+        n, sumw, sumwsq, sumwr, sumwsqr, sumwsqrsq, wmin, wmax, rmin, rmax
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        uncwfake = np.where(sumw < n, wmax, wmin)
+        unca = (uncwfake + sumw) / (1 + n)
+        uncb = (uncwfake**2 + sumwsq) / (1 + n)
+        uncgstar = np.where(
+            uncwfake == inf,
+            1 + 1 / n,
+            (1 + n) * (unca - 1) ** 2 / (uncb - unca * unca),
+        )
+
+        delta = f.isf(q=alpha, dfn=1, dfd=n)
+        phi = (-uncgstar - delta) / (2 * (1 + n))
+
+        result = []
+        for r, sign in ((rmin, 1), (rmax, -1)):
+            best = np.full(len(n), inf)
+            found = np.zeros(len(n), dtype=bool)
+            for wfake in (wmin, wmax):
+                unbounded = wfake == inf
+                finite = np.where(unbounded, 0, wfake)
+
+                barw = (finite + sumw) / (1 + n)
+                barwsq = (finite * finite + sumwsq) / (1 + n)
+                barwr = sign * (finite * r + sumwr) / (1 + n)
+                barwsqr = sign * (finite * finite * r + sumwsqr) / (1 + n)
+                barwsqrsq = (finite * finite * r * r + sumwsqrsq) / (1 + n)
+                spread = barwsq - barw**2
+
+                x = np.where(
+                    unbounded,
+                    sign * (r + (sumwr - sumw * r) / n),
+                    barwr + (1 - barw) * (barwsqr - barw * barwr) / spread,
+                )
+                y = np.where(
+                    unbounded,
+                    (r * sumw - sumwr) ** 2 / (n * (1 + n))
+                    - (r**2 * sumwsq - 2 * r * sumwsqr + sumwsqrsq) / (1 + n),
+                    (barwsqr - barw * barwr) ** 2 / spread - (barwsqrsq - barwr**2),
+                )
+                z = np.where(
+                    unbounded,
+                    phi + 1 / (2 * n),
+                    phi + (1 / 2) * (1 - barw) ** 2 / spread,
+                )
+
+                close = np.abs(y * z) <= atol * atol
+                valid = (unbounded | (spread > 0)) & (close | ((z <= 0) & (y * z >= 0)))
+                gstar = np.where(
+                    close, x - np.sqrt(2) * atol, x - np.sqrt(np.abs(2 * y * z))
+                )
+                best = np.where(valid, np.minimum(best, gstar), best)
+                found |= valid
+
+            best = np.where(found, best, rmin)
+            result.append(np.minimum(rmax, np.maximum(rmin, sign * best)))
+
+    empty = n == 0
+    lower, upper = result
+    if empirical_r_bounds:
+        return (np.where(empty, -inf, lower), np.where(empty, inf, upper))
+    return (np.where(empty, rmin, lower), np.where(empty, rmax, upper))
+
+
+class Estimator(base.Estimator, Checkpointable):
     _impl: EstimatorImpl
 
-    def __init__(self, wmin: float = 0, wmax: float = inf):
-        self._impl = EstimatorImpl(wmin, wmax)
+    def __init__(
+        self,
+        wmin: float = 0,
+        wmax: float = inf,
+        accumulator: Type[Accumulator] = IncrementalFsum,
+    ):
+        self._impl = EstimatorImpl(wmin, wmax, accumulator)
 
     def add_example(self, p_log: float, r: float, p_pred: float) -> None:
         self._impl.add(p_pred / p_log, r)
+        if self._delta is not None:
+            self._delta.add_example(p_log, r, p_pred)
+
+    def add_examples(
+        self, p_log: npt.ArrayLike, r: npt.ArrayLike, p_pred: npt.ArrayLike
+    ) -> None:
+        p_log, r, p_pred = as_columns(p_log, r, p_pred)
+        self._impl.add_many(p_pred / p_log, r)
+        if self._delta is not None:
+            self._delta.add_examples(p_log, r, p_pred)
+
+    def _empty(self) -> "Estimator":
+        return Estimator(self._impl.wmin, self._impl.wmax, self._impl.accumulator)
 
     def get(self) -> Optional[float]:
         return self._impl.get()
 
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(serialization.Kind.CRESSIEREAD_ESTIMATOR)
+        return self._impl._write(writer).getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> "Estimator":
+        reader = serialization.Reader(data, serialization.Kind.CRESSIEREAD_ESTIMATOR)
+        result = cls()
+        result._impl = EstimatorImpl._read(reader)
+        reader.end()
+        return result
+
     def __add__(self, other: "Estimator") -> "Estimator":
         result = Estimator()
         result._impl = self._impl + other._impl
         return result
 
+    @classmethod
+    def merge_all(cls, estimators: Iterable["Estimator"]) -> "Estimator":
+        result = cls()
+        result._impl = EstimatorImpl.merge_all(x._impl for x in estimators)
+        return result
+
 
-class Interval(base.Interval):
+class Interval(base.Interval, Checkpointable):
     _impl: IntervalImpl
 
     def __init__(
@@ -291,8 +629,11 @@ class Interval(base.Interval):
         rmin: float = 0,
         rmax: float = 1,
         empirical_r_bounds: bool = False,
+        accumulator: Type[Accumulator] = IncrementalFsum,
     ) -> None:
-        self._impl = IntervalImpl(wmin, wmax, rmin, rmax, empirical_r_bounds)
+        self._impl = IntervalImpl(
+            wmin, wmax, rmin, rmax, empirical_r_bounds, accumulator
+        )
 
     def add_example(
         self,
@@ -303,11 +644,60 @@ class Interval(base.Interval):
         n_drop: Optional[int] = None,
     ) -> None:
         self._impl.add(p_pred / p_log, r, p_drop, n_drop)
+        if self._delta is not None:
+            self._delta.add_example(p_log, r, p_pred, p_drop, n_drop)
+
+    def add_examples(
+        self,
+        p_log: npt.ArrayLike,
+        r: npt.ArrayLike,
+        p_pred: npt.ArrayLike,
+        p_drop: npt.ArrayLike = 0,
+        n_drop: Optional[npt.ArrayLike] = None,
+    ) -> None:
+        p_log, r, p_pred, p_drop = as_columns(p_log, r, p_pred, p_drop)
+        self._impl.add_many(p_pred / p_log, r, p_drop, dropped_events(p_drop, n_drop))
+        if self._delta is not None:
+            self._delta.add_examples(p_log, r, p_pred, p_drop, n_drop)
+
+    def _empty(self) -> Interval:
+        impl = self._impl
+        return Interval(
+            impl.wmin,
+            impl.wmax,
+            impl.rmin,
+            impl.rmax,
+            impl.empirical_r_bounds,
+            impl.accumulator,
+        )
 
     def get(self, alpha: float = 0.05, atol: float = 1e-9) -> Tuple[float, float]:
         return self._impl.get(alpha, atol)
 
+    def get_many(
+        self, alphas: Sequence[float], atol: float = 1e-9
+    ) -> List[Tuple[float, float]]:
+        return self._impl.get_many(alphas, atol)
+
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(serialization.Kind.CRESSIEREAD_INTERVAL)
+        return self._impl._write(writer).getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Interval:
+        reader = serialization.Reader(data, serialization.Kind.CRESSIEREAD_INTERVAL)
+        result = cls()
+        result._impl = IntervalImpl._read(reader)
+        reader.end()
+        return result
+
     def __add__(self, other: Interval) -> Interval:
         result = Interval()
         result._impl = self._impl + other._impl
         return result
+
+    @classmethod
+    def merge_all(cls, intervals: Iterable[Interval]) -> Interval:
+        result = cls()
+        result._impl = IntervalImpl.merge_all(x._impl for x in intervals)
+        return result
@@ -1,66 +1,280 @@
 from __future__ import annotations
 
+import struct
 import typing
+import numpy as np
+import numpy.typing as npt
+from estimators import serialization
 from estimators.bandits import base
-from typing import List, Optional, Tuple
-from estimators.math import IncrementalFsum
+from typing import List, Optional, Sequence, Tuple, Type
+from estimators.math import Accumulator, IncrementalFsum, as_columns, dropped_events
 
-from math import inf
+from copy import deepcopy
+from functools import lru_cache
+from math import inf, log
 
+# accumulator code, adjust, rho, rmin, rmax, t and the sums of IntervalImpl
+_STATE = struct.Struct("<B?dddd" + "d" * 11)
+# empirical_r_bounds, rmin, rmax and the number of shards of MergeableInterval
+_MERGEABLE_STATE = struct.Struct("<?ddI")
 
-def _logwealth(s: float, v: float, rho: float) -> float:
-    from math import log
+# first step of the search for a bracket around the previous bound, relative to [0, maxmu]
+_WARM_START_STEP = 1e-3
+
+# Bernoulli numbers B2, B4, ..., B14 of the asymptotic expansion of PolyGamma[1, x]
+_TRIGAMMA_SERIES = (1 / 6, -1 / 30, 1 / 42, -1 / 30, 5 / 66, -691 / 2730, 7 / 6)
+
+
+def _trigamma(x: float) -> float:
+    """PolyGamma[1, x] for x > 0 without going through numpy scalars"""
+    result = 0.0
+    while x < 10:
+        result += 1 / (x * x)
+        x += 1
+    # the first omitted term of the expansion is below 1e-16 relative for x >= 10
+    y = 1 / (x * x)
+    series = 0.0
+    for b in reversed(_TRIGAMMA_SERIES):
+        series = series * y + b
+    return result + 1 / x + y / 2 + series * y / x
+
+
+def _loggammalowerinc(*, a: float, x: float) -> float:
+    import scipy.special as sc  # type: ignore
+
+    return log(sc.gammainc(a, x)) + typing.cast(float, sc.loggamma(a))
 
-    def loggammalowerinc(*, a: float, x: float) -> float:
-        import scipy.special as sc  # type: ignore
 
-        return log(sc.gammainc(a, x)) + typing.cast(float, sc.loggamma(a))
+@lru_cache(maxsize=None)
+def _logwealthconstant(rho: float) -> float:
+    return rho * log(rho) - _loggammalowerinc(a=rho, x=rho)
 
+
+def _logwealth(s: float, v: float, rho: float) -> float:
     assert s + v + rho > 0
     assert rho > 0
 
     return (
         s
         + v
-        + rho * log(rho)
         - (v + rho) * log(s + v + rho)
-        + loggammalowerinc(a=v + rho, x=s + v + rho)
-        - loggammalowerinc(a=rho, x=rho)
+        + _loggammalowerinc(a=v + rho, x=s + v + rho)
+        + _logwealthconstant(rho)
     )
 
 
-def _lblogwealth(t: float, sumXt: float, v: float, rho: float, alpha: float) -> float:
-    from math import log
+def _lblogwealth(
+    t: float,
+    sumXt: float,
+    v: float,
+    rho: float,
+    alpha: float,
+    guess: Optional[float] = None,
+) -> float:
+    """Smallest mu for which the log wealth stays below log(1 / alpha).
+
+    The log wealth decreases in mu, so when a guess (e.g. the previous bound) is provided the
+    root is bracketed by stepping away from it instead of searching the whole [0, maxmu] range.
+    """
     import scipy.optimize as so  # type: ignore
 
     assert 0 < alpha < 1, alpha
     thres = -log(alpha)
 
-    minmu = 0
-    logwealthminmu = _logwealth(s=sumXt, v=v, rho=rho)
-
-    if logwealthminmu <= thres:
-        return minmu
+    def f(mu: float) -> float:
+        return _logwealth(s=sumXt - t * mu, v=v, rho=rho) - thres
 
+    minmu = 0.0
     maxmu = min(1, sumXt / t)
-    logwealthmaxmu = _logwealth(s=sumXt - t * maxmu, v=v, rho=rho)
 
-    if logwealthmaxmu >= thres:
-        return maxmu
-
-    res = so.root_scalar(
-        f=lambda mu: _logwealth(s=sumXt - t * mu, v=v, rho=rho) - thres,
-        method="brentq",
-        bracket=[minmu, maxmu],
-    )
+    if guess is not None and minmu < guess < maxmu:
+        # step away from the guess towards the root until f changes its sign
+        direction = 1.0 if f(guess) > 0 else -1.0
+        end = maxmu if direction > 0 else minmu
+        near = guess
+        step = _WARM_START_STEP * (maxmu - minmu)
+        while True:
+            far = near + direction * step
+            if direction * (far - end) >= 0:
+                far = end
+            if direction * f(far) <= 0:
+                break
+            if far == end:
+                return end
+            near = far
+            step *= 4
+        bracket = sorted((near, far))
+    else:
+        if f(minmu) <= 0:
+            return minmu
+        if f(maxmu) >= 0:
+            return maxmu
+        bracket = [minmu, maxmu]
+
+    res = so.root_scalar(f=f, method="brentq", bracket=bracket)
     assert res.converged, res
 
     # according to docs this is guaranteed to be a float
     return typing.cast(float, res.root)
 
 
+def _logwealth_many(
+    s: npt.NDArray[np.float64], v: npt.NDArray[np.float64], rho: float
+) -> npt.NDArray[np.float64]:
+    import scipy.special as sc
+
+    result: npt.NDArray[np.float64] = (
+        s
+        + v
+        - (v + rho) * np.log(s + v + rho)
+        + np.log(sc.gammainc(v + rho, s + v + rho))
+        + sc.loggamma(v + rho)
+        + _logwealthconstant(rho)
+    )
+    return result
+
+
+def _lblogwealth_many(
+    t: npt.NDArray[np.float64],
+    sumXt: npt.NDArray[np.float64],
+    v: npt.NDArray[np.float64],
+    rho: float,
+    alpha: npt.NDArray[np.float64],
+    xtol: float = 2e-12,
+    maxiter: int = 100,
+) -> npt.NDArray[np.float64]:
+    """_lblogwealth over one dimensional arrays, all roots are found together with the
+    Illinois variant of regula falsi
+    """
+    thres = -np.log(alpha)
+
+    def f(
+        mu: npt.NDArray[np.float64], i: npt.NDArray[np.intp]
+    ) -> npt.NDArray[np.float64]:
+        return _logwealth_many(sumXt[i] - t[i] * mu, v[i], rho) - thres[i]
+
+    everything = np.arange(len(t))
+    maxmu = np.minimum(1, sumXt / t)
+    fmin = f(np.zeros(len(t)), everything)
+    fmax = f(maxmu, everything)
+    result = np.where(fmin <= 0, 0.0, maxmu)
+
+    active = np.flatnonzero((fmin > 0) & (fmax < 0))
+    a, fa = np.zeros(len(active)), fmin[active]
+    b, fb = maxmu[active], fmax[active]
+    for _ in range(maxiter):
+        if len(active) == 0:
+            break
+        c = b - fb * (b - a) / (fb - fa)
+        fc = f(c, active)
+        # keep the root bracketed by [a, b], halve the stale side to avoid stagnation
+        crossed = fc * fb < 0
+        a = np.where(crossed, b, a)
+        fa = np.where(crossed, fb, fa / 2)
+        b, fb = c, fc
+
+        done = (fc == 0) | (np.abs(b - a) <= xtol + 4 * np.finfo(float).eps * np.abs(b))
+        result[active[done]] = b[done]
+        active, a, fa, b, fb = (x[~done] for x in (active, a, fa, b, fb))
+    # roots not found within maxiter are finished one by one with brentq
+    for i in active.tolist():
+        result[i] = _lblogwealth(
+            float(t[i]), float(sumXt[i]), float(v[i]), rho, float(alpha[i])
+        )
+    return result
+
+
+def bounds(
+    t: npt.ArrayLike,
+    sumXlow: npt.ArrayLike,
+    sumvlow: npt.ArrayLike,
+    sumXhigh: npt.ArrayLike,
+    sumvhigh: npt.ArrayLike,
+    rmin: npt.ArrayLike,
+    rmax: npt.ArrayLike,
+    alphas: npt.ArrayLike,
+    rho: float = 1,
+) -> npt.NDArray[np.float64]:
+    """Confidence bounds for many segments and alphas at once
+
+    Args:
+        t, sumXlow, sumvlow, sumXhigh, sumvhigh, rmin, rmax: sufficient statistics of each segment,
+            as returned by IntervalImpl.statistics and its t, rmin and rmax. t should be positive
+            and rmin < rmax
+        alphas: confidence levels
+
+    Returns:
+        array of (n_segments, n_alphas, 2) lower and upper bounds
+    """
+    t, sumXlow, sumvlow, sumXhigh, sumvhigh, rmin, rmax = as_columns(
+        t, sumXlow, sumvlow, sumXhigh, sumvhigh, rmin, rmax
+    )
+    alphas = np.atleast_1d(np.asarray(alphas, dtype=np.float64))
+    assert ((0 < alphas) & (alphas < 1)).all(), alphas
+
+    shape = (len(t), len(alphas))
+    halfalphas = np.broadcast_to(alphas / 2, shape).ravel()
+
+    def lower(
+        sumXt: npt.NDArray[np.float64], v: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float64]:
+        return _lblogwealth_many(
+            t=np.repeat(t, len(alphas)),
+            sumXt=np.repeat(sumXt, len(alphas)),
+            v=np.repeat(v, len(alphas)),
+            rho=rho,
+            alpha=halfalphas,
+        ).reshape(shape)
+
+    low = lower(sumXlow, sumvlow)
+    high = 1 - lower(sumXhigh, sumvhigh)
+    scale = (rmax - rmin)[:, np.newaxis]
+    return np.stack(
+        (rmin[:, np.newaxis] + low * scale, rmin[:, np.newaxis] + high * scale), axis=-1
+    )
+
+
+def get_many(
+    intervals: Sequence[Interval], alphas: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    """Interval.get for every interval and every alpha, as an (n_intervals, n_alphas, 2) array"""
+    alphas = np.atleast_1d(np.asarray(alphas, dtype=np.float64))
+    result = np.empty((len(intervals), len(alphas), 2))
+
+    ready = []
+    for i, interval in enumerate(intervals):
+        impl = interval._impl
+        if impl.t == 0 or impl.rmin == impl.rmax:
+            result[i] = (-inf, inf) if impl.adjust else (impl.rmin, impl.rmax)
+        else:
+            ready.append(i)
+
+    if ready:
+        impls = [intervals[i]._impl for i in ready]
+        sumXlow, sumvlow, sumXhigh, sumvhigh = zip(
+            *(impl.statistics() for impl in impls)
+        )
+        result[ready] = bounds(
+            [impl.t for impl in impls],
+            sumXlow,
+            sumvlow,
+            sumXhigh,
+            sumvhigh,
+            [impl.rmin for impl in impls],
+            [impl.rmax for impl in impls],
+            alphas,
+        )
+    return result
+
+
 class IntervalImpl:
-    def __init__(self, rmin: float = 0, rmax: float = 1, adjust: bool = True):
+    def __init__(
+        self,
+        rmin: float = 0,
+        rmax: float = 1,
+        adjust: bool = True,
+        accumulator: Type[Accumulator] = IncrementalFsum,
+    ):
         assert rmin <= rmax, (rmin, rmax)
 
         self.rho = 1
@@ -68,19 +282,30 @@ class IntervalImpl:
         self.rmax = rmax
         self.adjust = adjust
 
+        self.accumulator = accumulator
         self.t = 0.0
 
-        self.sumwsqrsq = IncrementalFsum()
-        self.sumwsqr = IncrementalFsum()
-        self.sumwsq = IncrementalFsum()
-        self.sumwr = IncrementalFsum()
-        self.sumw = IncrementalFsum()
-        self.sumwrxhatlow = IncrementalFsum()
-        self.sumwxhatlow = IncrementalFsum()
-        self.sumxhatlowsq = IncrementalFsum()
-        self.sumwrxhathigh = IncrementalFsum()
-        self.sumwxhathigh = IncrementalFsum()
-        self.sumxhathighsq = IncrementalFsum()
+        self.sumwsqrsq = accumulator()
+        self.sumwsqr = accumulator()
+        self.sumwsq = accumulator()
+        self.sumwr = accumulator()
+        self.sumw = accumulator()
+        self.sumwrxhatlow = accumulator()
+        self.sumwxhatlow = accumulator()
+        self.sumxhatlowsq = accumulator()
+        self.sumwrxhathigh = accumulator()
+        self.sumwxhathigh = accumulator()
+        self.sumxhathighsq = accumulator()
+        # plain running sums of w and w * r, the predictable sequences Xhatlow and Xhathigh
+        # only need them up to rounding, and add and add_many accumulate them in the same order
+        self._sumw = 0.0
+        self._sumwr = 0.0
+
+        self._version = 0
+        self._cached: Optional[Tuple[int, float, Tuple[float, float]]] = None
+        # previous roots in the normalized [0, 1] scale, used to warm start get
+        self._lower: Optional[float] = None
+        self._upper: Optional[float] = None
 
     def add(self, w: float, r: float, p_drop: float, n_drop: Optional[int]) -> None:
         assert w >= 0
@@ -93,45 +318,26 @@ class IntervalImpl:
             self.rmin = min(self.rmin, r)
             self.rmax = max(self.rmax, r)
 
+        sumXlow = (self._sumwr - self._sumw * self.rmin) / (self.rmax - self.rmin)
+        sumXhigh = (self._sumw * self.rmax - self._sumwr) / (self.rmax - self.rmin)
+
         n_drop_tmp: float = (
             float(n_drop) if n_drop is not None else p_drop / (1 - p_drop)
         )
         if n_drop_tmp > 0:
-            import scipy.special as sc
-
             # we have to simulate presenting n_drop_tmp events with w=0 in a row, which we can do in closed form
             # Sum[(a/(b + s))^2, { s, 0, n - 1 }]
             # a^2 PolyGamma[1,b]-a^2 PolyGamma[1,b+n]
 
-            sumXlow = (float(self.sumwr) - float(self.sumw) * self.rmin) / (
-                self.rmax - self.rmin
-            )
-            alow = sumXlow + 1 / 2
-            blow = self.t + 1
-            self.sumxhatlowsq += alow**2 * (
-                sc.polygamma(1, blow).item() - sc.polygamma(1, blow + n_drop_tmp).item()
-            )
-
-            sumXhigh = (float(self.sumw) * self.rmax - float(self.sumwr)) / (
-                self.rmax - self.rmin
-            )
-            ahigh = sumXhigh + 1 / 2
-            bhigh = self.t + 1
-            self.sumxhathighsq += ahigh**2 * (
-                sc.polygamma(1, bhigh).item()
-                - sc.polygamma(1, bhigh + n_drop_tmp).item()
-            )
+            b = self.t + 1
+            trigammas = _trigamma(b) - _trigamma(b + n_drop_tmp)
+            self.sumxhatlowsq += (sumXlow + 1 / 2) ** 2 * trigammas
+            self.sumxhathighsq += (sumXhigh + 1 / 2) ** 2 * trigammas
 
             # TODO: convert t to float or cast n_drop_tmp to int?
             self.t += n_drop_tmp
 
-        sumXlow = (float(self.sumwr) - float(self.sumw) * self.rmin) / (
-            self.rmax - self.rmin
-        )
         Xhatlow = (sumXlow + 1 / 2) / (self.t + 1)
-        sumXhigh = (float(self.sumw) * self.rmax - float(self.sumwr)) / (
-            self.rmax - self.rmin
-        )
         Xhathigh = (sumXhigh + 1 / 2) / (self.t + 1)
 
         w /= 1 - p_drop
@@ -147,13 +353,138 @@ class IntervalImpl:
         self.sumwrxhathigh += w * r * Xhathigh
         self.sumwxhathigh += w * Xhathigh
         self.sumxhathighsq += Xhathigh**2
+        self._sumw += w
+        self._sumwr += w * r
 
         self.t += 1
+        self._version += 1
+
+    def add_many(
+        self,
+        w: npt.NDArray[np.float64],
+        r: npt.NDArray[np.float64],
+        p_drop: npt.NDArray[np.float64],
+        n_drop: npt.NDArray[np.float64],
+    ) -> None:
+        """Batch version of add, n_drop is expected to be populated for every example.
+
+        The predictable sequences Xhatlow and Xhathigh only depend on the sums over previous
+        examples, so they are computed from prefix sums instead of one example at a time.
+        """
+        if len(w) == 0:
+            return
+        assert (w >= 0).all()
+        assert ((0 <= p_drop) & (p_drop < 1)).all()
+        assert (n_drop >= 0).all()
+
+        if not self.adjust:
+            r = np.clip(r, self.rmin, self.rmax)
+            rmin: npt.NDArray[np.float64] = np.full_like(r, self.rmin)
+            rmax: npt.NDArray[np.float64] = np.full_like(r, self.rmax)
+        else:
+            rmin = np.minimum.accumulate(np.minimum(r, self.rmin))
+            rmax = np.maximum.accumulate(np.maximum(r, self.rmax))
+        scale = rmax - rmin
+        if not scale.all():
+            raise ZeroDivisionError("float division by zero")
+
+        w = w / (1 - p_drop)
+        wr = w * r
+
+        # sums over the examples preceding each one, cumsum adds in the same order as add
+        sumw = np.cumsum(np.concatenate(([self._sumw], w[:-1])))
+        sumwr = np.cumsum(np.concatenate(([self._sumwr], wr[:-1])))
+        t = self.t + np.arange(len(w)) + np.cumsum(n_drop) - n_drop
+
+        alow = (sumwr - sumw * rmin) / scale + 1 / 2
+        ahigh = (sumw * rmax - sumwr) / scale + 1 / 2
+
+        dropped = n_drop > 0
+        if dropped.any():
+            import scipy.special as sc
+
+            # see add, PolyGamma[1, x] == Zeta[2, x]
+            b = t[dropped] + 1
+            trigammas = sc.zeta(2, b) - sc.zeta(2, b + n_drop[dropped])
+            self.sumxhatlowsq.add_many(alow[dropped] ** 2 * trigammas)
+            self.sumxhathighsq.add_many(ahigh[dropped] ** 2 * trigammas)
+            t = t + n_drop
+
+        Xhatlow = alow / (t + 1)
+        Xhathigh = ahigh / (t + 1)
+
+        self.sumwsqrsq.add_many(wr**2)
+        self.sumwsqr.add_many(wr * w)
+        self.sumwsq.add_many(w**2)
+        self.sumwr.add_many(wr)
+        self.sumw.add_many(w)
+        self.sumwrxhatlow.add_many(wr * Xhatlow)
+        self.sumwxhatlow.add_many(w * Xhatlow)
+        self.sumxhatlowsq.add_many(Xhatlow**2)
+        self.sumwrxhathigh.add_many(wr * Xhathigh)
+        self.sumwxhathigh.add_many(w * Xhathigh)
+        self.sumxhathighsq.add_many(Xhathigh**2)
+        self._sumw = float(sumw[-1] + w[-1])
+        self._sumwr = float(sumwr[-1] + wr[-1])
+
+        self.t = float(t[-1]) + 1
+        self.rmin = float(rmin[-1])
+        self.rmax = float(rmax[-1])
+        self._version += 1
+
+    def _write(self, writer: serialization.Writer) -> serialization.Writer:
+        return writer.pack(
+            _STATE,
+            serialization.accumulator_code(self.accumulator),
+            self.adjust,
+            self.rho,
+            self.rmin,
+            self.rmax,
+            self.t,
+            float(self.sumwsqrsq),
+            float(self.sumwsqr),
+            float(self.sumwsq),
+            float(self.sumwr),
+            float(self.sumw),
+            float(self.sumwrxhatlow),
+            float(self.sumwxhatlow),
+            float(self.sumxhatlowsq),
+            float(self.sumwrxhathigh),
+            float(self.sumwxhathigh),
+            float(self.sumxhathighsq),
+        )
+
+    @classmethod
+    def _read(cls, reader: serialization.Reader) -> IntervalImpl:
+        code, adjust, rho, rmin, rmax, t, *sums = reader.unpack(_STATE)
+        accumulator = serialization.accumulator_type(code)
+        result = cls(rmin, rmax, adjust, accumulator)
+        result.rho = rho
+        result.t = t
+        (
+            result.sumwsqrsq,
+            result.sumwsqr,
+            result.sumwsq,
+            result.sumwr,
+            result.sumw,
+            result.sumwrxhatlow,
+            result.sumwxhatlow,
+            result.sumxhatlowsq,
+            result.sumwrxhathigh,
+            result.sumwxhathigh,
+            result.sumxhathighsq,
+        ) = (serialization.accumulated(accumulator, x) for x in sums)
+        result._sumw = float(result.sumw)
+        result._sumwr = float(result.sumwr)
+        return result
 
     def get(self, alpha: float) -> Tuple[float, float]:
-        if self.t == 0 or self.rmin == self.rmax:
-            return (-inf, inf) if self.adjust else (self.rmin, self.rmax)
+        if self._cached is None or self._cached[:2] != (self._version, alpha):
+            self._cached = (self._version, alpha, self._get(alpha))
+        return self._cached[2]
 
+    def statistics(self) -> Tuple[float, float, float, float]:
+        """sumXlow, sumvlow, sumXhigh and sumvhigh on the [0, 1] scale of the rewards"""
         sumvlow = (
             (
                 float(self.sumwsqrsq)
@@ -169,10 +500,6 @@ class IntervalImpl:
         sumXlow = (float(self.sumwr) - float(self.sumw) * self.rmin) / (
             self.rmax - self.rmin
         )
-        l = _lblogwealth(
-            t=self.t, sumXt=sumXlow, v=sumvlow, rho=self.rho, alpha=alpha / 2
-        )
-
         sumvhigh = (
             (
                 float(self.sumwsqrsq)
@@ -188,9 +515,32 @@ class IntervalImpl:
         sumXhigh = (float(self.sumw) * self.rmax - float(self.sumwr)) / (
             self.rmax - self.rmin
         )
-        u = 1 - _lblogwealth(
-            t=self.t, sumXt=sumXhigh, v=sumvhigh, rho=self.rho, alpha=alpha / 2
+        return (sumXlow, sumvlow, sumXhigh, sumvhigh)
+
+    def _get(self, alpha: float) -> Tuple[float, float]:
+        if self.t == 0 or self.rmin == self.rmax:
+            return (-inf, inf) if self.adjust else (self.rmin, self.rmax)
+
+        sumXlow, sumvlow, sumXhigh, sumvhigh = self.statistics()
+        l = _lblogwealth(
+            t=self.t,
+            sumXt=sumXlow,
+            v=sumvlow,
+            rho=self.rho,
+            alpha=alpha / 2,
+            guess=self._lower,
+        )
+        self._lower = l
+
+        self._upper = _lblogwealth(
+            t=self.t,
+            sumXt=sumXhigh,
+            v=sumvhigh,
+            rho=self.rho,
+            alpha=alpha / 2,
+            guess=self._upper,
         )
+        u = 1 - self._upper
 
         return (
             self.rmin + l * (self.rmax - self.rmin),
@@ -202,9 +552,15 @@ class Interval(base.Interval):
     _impl: IntervalImpl
 
     def __init__(
-        self, rmin: float = 0, rmax: float = 1, empirical_r_bounds: bool = False
+        self,
+        rmin: float = 0,
+        rmax: float = 1,
+        empirical_r_bounds: bool = False,
+        accumulator: Type[Accumulator] = IncrementalFsum,
     ) -> None:
-        self._impl = IntervalImpl(rmin=rmin, rmax=rmax, adjust=empirical_r_bounds)
+        self._impl = IntervalImpl(
+            rmin=rmin, rmax=rmax, adjust=empirical_r_bounds, accumulator=accumulator
+        )
 
     def add_example(
         self,
@@ -216,8 +572,159 @@ class Interval(base.Interval):
     ) -> None:
         self._impl.add(p_pred / p_log, r, p_drop, n_drop)
 
+    def add_examples(
+        self,
+        p_log: npt.ArrayLike,
+        r: npt.ArrayLike,
+        p_pred: npt.ArrayLike,
+        p_drop: npt.ArrayLike = 0,
+        n_drop: Optional[npt.ArrayLike] = None,
+    ) -> None:
+        p_log, r, p_pred, p_drop = as_columns(p_log, r, p_pred, p_drop)
+        self._impl.add_many(p_pred / p_log, r, p_drop, dropped_events(p_drop, n_drop))
+
     def get(self, alpha: float = 0.05, atol: float = 1e-9) -> Tuple[float, float]:
         return self._impl.get(alpha)
 
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(serialization.Kind.CS_INTERVAL)
+        return self._impl._write(writer).getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Interval:
+        reader = serialization.Reader(data, serialization.Kind.CS_INTERVAL)
+        result = cls()
+        result._impl = IntervalImpl._read(reader)
+        reader.end()
+        return result
+
     def __add__(self, other: Interval) -> Interval:
-        raise NotImplementedError
+        raise NotImplementedError(
+            "cs.Interval depends on the order of examples, use cs.MergeableInterval to combine shards"
+        )
+
+
+class MergeableInterval(base.Interval):
+    """Confidence sequence that can be computed on shards and merged.
+
+    Every shard keeps its own betting confidence sequence over the examples it has seen, in
+    their order. With K non-empty shards each of them is evaluated at alpha / K and the bounds
+    are intersected, which is anytime valid at level alpha by the union bound. Bounds get wider
+    with the number of shards, so shards should be few and large.
+
+    The intersection assumes that every shard estimates the same value, e.g. that examples are
+    assigned to shards independently of their context, logging policy and reward. When the
+    bounds of the shards do not overlap this does not hold, and get returns the smallest
+    interval containing the bounds of every shard instead of an empty intersection.
+    """
+
+    _shards: List[IntervalImpl]
+
+    def __init__(
+        self,
+        rmin: float = 0,
+        rmax: float = 1,
+        empirical_r_bounds: bool = False,
+        accumulator: Type[Accumulator] = IncrementalFsum,
+    ) -> None:
+        self.rmin = rmin
+        self.rmax = rmax
+        self.empirical_r_bounds = empirical_r_bounds
+        # new examples always go to the first shard
+        self._shards = [
+            IntervalImpl(
+                rmin=rmin, rmax=rmax, adjust=empirical_r_bounds, accumulator=accumulator
+            )
+        ]
+
+    def add_example(
+        self,
+        p_log: float,
+        r: float,
+        p_pred: float,
+        p_drop: float = 0,
+        n_drop: Optional[int] = None,
+    ) -> None:
+        self._shards[0].add(p_pred / p_log, r, p_drop, n_drop)
+
+    def add_examples(
+        self,
+        p_log: npt.ArrayLike,
+        r: npt.ArrayLike,
+        p_pred: npt.ArrayLike,
+        p_drop: npt.ArrayLike = 0,
+        n_drop: Optional[npt.ArrayLike] = None,
+    ) -> None:
+        p_log, r, p_pred, p_drop = as_columns(p_log, r, p_pred, p_drop)
+        self._shards[0].add_many(
+            p_pred / p_log, r, p_drop, dropped_events(p_drop, n_drop)
+        )
+
+    def get(self, alpha: float = 0.05, atol: float = 1e-9) -> Tuple[float, float]:
+        shards = [
+            shard for shard in self._shards if shard.t > 0 and shard.rmin < shard.rmax
+        ]
+        if not shards:
+            return self._shards[0].get(alpha)
+
+        statistics = [shard.statistics() for shard in shards]
+        result = bounds(
+            [shard.t for shard in shards],
+            [s[0] for s in statistics],
+            [s[1] for s in statistics],
+            [s[2] for s in statistics],
+            [s[3] for s in statistics],
+            [shard.rmin for shard in shards],
+            [shard.rmax for shard in shards],
+            alpha / len(shards),
+        )
+        lower, upper = float(np.max(result[:, 0, 0])), float(np.min(result[:, 0, 1]))
+        if lower > upper:
+            return (float(np.min(result[:, 0, 0])), float(np.max(result[:, 0, 1])))
+        return (lower, upper)
+
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(serialization.Kind.CS_MERGEABLE_INTERVAL)
+        writer.pack(
+            _MERGEABLE_STATE,
+            self.empirical_r_bounds,
+            self.rmin,
+            self.rmax,
+            len(self._shards),
+        )
+        for shard in self._shards:
+            shard._write(writer)
+        return writer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> MergeableInterval:
+        reader = serialization.Reader(data, serialization.Kind.CS_MERGEABLE_INTERVAL)
+        empirical_r_bounds, rmin, rmax, count = reader.unpack(_MERGEABLE_STATE)
+        result = cls(rmin, rmax, empirical_r_bounds)
+        result._shards = [IntervalImpl._read(reader) for _ in range(count)]
+        reader.end()
+        return result
+
+    def __add__(self, other: MergeableInterval) -> MergeableInterval:
+        assert not (
+            self.empirical_r_bounds ^ other.empirical_r_bounds
+        ), "Summation of estimators with various r bounds policy is prohibited"
+
+        if not self.empirical_r_bounds:
+            assert (
+                self.rmin == other.rmin
+            ), "Summation of estimators with various r bounds is prohibited"
+            assert (
+                self.rmax == other.rmax
+            ), "Summation of estimators with various r bounds is prohibited"
+
+        result = MergeableInterval(
+            rmin=min(self.rmin, other.rmin),
+            rmax=max(self.rmax, other.rmax),
+            empirical_r_bounds=self.empirical_r_bounds,
+            accumulator=self._shards[0].accumulator,
+        )
+        result._shards = [
+            deepcopy(shard) for shard in self._shards + other._shards if shard.t > 0
+        ] or result._shards
+        return result
@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import numpy as np
+import struct
+import numpy.typing as npt
+from estimators import serialization
+from estimators.bandits import clopper_pearson, cressieread, gaussian, ips, snips
+from estimators.math import Accumulator, IncrementalFsum, as_columns, dropped_events
+from math import inf
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Type
+
+# accumulator code, empirical_r_bounds, wmin and wmax of the weights and of the drop-corrected
+# weights, rmin, rmax, n, the shared sums, sumr, scaled reward and largest weight of
+# clopper_pearson and whether the sums over dropped examples follow
+_STATE = struct.Struct("<B?ddddddqdddddddd?")
+# dropped events and the sums over examples with p_drop > 0, with original and corrected weights
+_DROPPED = struct.Struct("<d" + "d" * 10)
+
+
+class EstimatorView:
+    """Read-only estimator over the state of an EstimatorSet"""
+
+    def __init__(self, get: Callable[[], Optional[float]]) -> None:
+        self._get = get
+
+    def get(self) -> Optional[float]:
+        return self._get()
+
+
+class IntervalView:
+    """Read-only interval over the state of an EstimatorSet"""
+
+    def __init__(self, get: Callable[[float], Tuple[float, float]]) -> None:
+        self._get = get
+
+    def get(self, alpha: float = 0.05) -> Tuple[float, float]:
+        return self._get(alpha)
+
+    def get_many(self, alphas: Sequence[float]) -> List[Tuple[float, float]]:
+        return [self._get(alpha) for alpha in alphas]
+
+
+class _Sums:
+    """Sums of w, w^2, w * r, w^2 * r and w^2 * r^2"""
+
+    sumw: Accumulator
+    sumwsq: Accumulator
+    sumwr: Accumulator
+    sumwsqr: Accumulator
+    sumwsqrsq: Accumulator
+
+    def __init__(self, accumulator: Type[Accumulator]) -> None:
+        self.sumw = accumulator()
+        self.sumwsq = accumulator()
+        self.sumwr = accumulator()
+        self.sumwsqr = accumulator()
+        self.sumwsqrsq = accumulator()
+
+    def add(self, w: float, r: float) -> None:
+        wsq = w**2
+        self.sumw += w
+        self.sumwsq += wsq
+        self.sumwr += w * r
+        self.sumwsqr += wsq * r
+        self.sumwsqrsq += wsq * r**2
+
+    def add_many(self, w: npt.NDArray[np.float64], r: npt.NDArray[np.float64]) -> None:
+        wsq = w**2
+        wsqr = wsq * r
+        self.sumw.add_many(w)
+        self.sumwsq.add_many(wsq)
+        self.sumwr.add_many(w * r)
+        self.sumwsqr.add_many(wsqr)
+        self.sumwsqrsq.add_many(wsqr * r)
+
+    def sums(self) -> List[Accumulator]:
+        return [self.sumw, self.sumwsq, self.sumwr, self.sumwsqr, self.sumwsqrsq]
+
+    def assign(self, sums: Sequence[Accumulator]) -> None:
+        self.sumw, self.sumwsq, self.sumwr, self.sumwsqr, self.sumwsqrsq = sums
+
+
+class _Dropped:
+    """Dropped events and the sums over the examples with p_drop > 0, with their original
+    weights for the estimators and with their drop-corrected weights for the intervals. Either
+    one is added to the shared sums over the other examples, nothing is subtracted.
+    """
+
+    n: Accumulator
+    raw: _Sums
+    corrected: _Sums
+
+    def __init__(self, accumulator: Type[Accumulator]) -> None:
+        self.n = accumulator()
+        self.raw = _Sums(accumulator)
+        self.corrected = _Sums(accumulator)
+
+    def sums(self) -> List[Accumulator]:
+        return [self.n] + self.raw.sums() + self.corrected.sums()
+
+    def assign(self, sums: Sequence[Accumulator]) -> None:
+        self.n = sums[0]
+        self.raw.assign(sums[1:6])
+        self.corrected.assign(sums[6:])
+
+
+class EstimatorSet:
+    """ips, snips and cressieread estimators and gaussian, clopper_pearson and cressieread
+    intervals over one shared state.
+
+    The importance weight is computed once per example and every sum is kept once: the sums
+    of cressieread are a superset of what ips, snips and gaussian need, and the estimators
+    are views over them. Intervals with dropped events need the sums over drop-corrected
+    weights, so the examples with p_drop > 0 are summed apart with both of their weights.
+    clopper_pearson adds its scaled reward and largest weight.
+    """
+
+    n: int
+    shared: _Sums
+    sumr: Accumulator
+    dropped: Optional[_Dropped]
+
+    def __init__(
+        self,
+        wmin: float = 0,
+        wmax: float = inf,
+        rmin: float = 0,
+        rmax: float = 1,
+        empirical_r_bounds: bool = False,
+        accumulator: Type[Accumulator] = IncrementalFsum,
+    ) -> None:
+        assert wmin < 1
+        assert wmax > 1
+
+        self.wmin = self.interval_wmin = wmin
+        self.wmax = self.interval_wmax = wmax
+        self.rmin = rmin
+        self.rmax = rmax
+        self.empirical_r_bounds = empirical_r_bounds
+        self.accumulator = accumulator
+
+        self.n = 0
+        # over the examples with p_drop == 0
+        self.shared = _Sums(accumulator)
+        self.sumr = accumulator()
+        self.dropped = None
+        # clopper_pearson scales every reward with the bounds seen up to and including it
+        self.scaled_reward = accumulator()
+        self.max_weight = 0.0
+
+        self.ips = EstimatorView(self._ips)
+        self.snips = EstimatorView(self._snips)
+        self.cressieread = EstimatorView(self._cressieread)
+        self.gaussian = IntervalView(self._gaussian)
+        self.clopper_pearson = IntervalView(self._clopper_pearson)
+        self.cressieread_interval = IntervalView(self._cressieread_interval)
+
+    def add_example(
+        self,
+        p_log: float,
+        r: float,
+        p_pred: float,
+        p_drop: float = 0,
+        n_drop: Optional[int] = None,
+    ) -> None:
+        w = p_pred / p_log
+        assert w >= 0, "Error: negative importance weight"
+        if self.empirical_r_bounds:
+            self.rmax = max(self.rmax, r)
+            self.rmin = min(self.rmin, r)
+        elif r > self.rmax or r < self.rmin:
+            raise ValueError(
+                f"Error: Value of r={r} is outside rmin={self.rmin}, rmax={self.rmax} bounds"
+            )
+
+        self.n += 1
+        self.sumr += r
+        self.wmax = max(self.wmax, w)
+        self.wmin = min(self.wmin, w)
+
+        n_drop_tmp = float(n_drop) if n_drop is not None else p_drop / (1 - p_drop)
+        w_dropped = w / (1 - p_drop)
+        if n_drop_tmp:
+            self._dropped().n += n_drop_tmp
+        if p_drop:
+            self._dropped().raw.add(w, r)
+            self._dropped().corrected.add(w_dropped, r)
+        else:
+            self.shared.add(w, r)
+        self.interval_wmax = max(self.interval_wmax, w_dropped)
+        self.interval_wmin = min(self.interval_wmin, w_dropped)
+
+        self.scaled_reward += w_dropped * (r - self.rmin) / (self.rmax - self.rmin)
+        self.max_weight = max(self.max_weight, w_dropped)
+
+    def add_examples(
+        self,
+        p_log: npt.ArrayLike,
+        r: npt.ArrayLike,
+        p_pred: npt.ArrayLike,
+        p_drop: npt.ArrayLike = 0,
+        n_drop: Optional[npt.ArrayLike] = None,
+    ) -> None:
+        p_log, r, p_pred, p_drop = as_columns(p_log, r, p_pred, p_drop)
+        if len(r) == 0:
+            return
+        w = p_pred / p_log
+        assert (w >= 0).all(), "Error: negative importance weight"
+
+        if self.empirical_r_bounds:
+            rmin = np.minimum.accumulate(np.minimum(r, self.rmin))
+            rmax = np.maximum.accumulate(np.maximum(r, self.rmax))
+            self.rmin = float(rmin[-1])
+            self.rmax = float(rmax[-1])
+            scaled = (r - rmin) / (rmax - rmin)
+        else:
+            outside = (r > self.rmax) | (r < self.rmin)
+            if outside.any():
+                raise ValueError(
+                    f"Error: Value of r={r[outside][0]} is outside rmin={self.rmin}, rmax={self.rmax} bounds"
+                )
+            scaled = (r - self.rmin) / (self.rmax - self.rmin)
+
+        self.n += len(w)
+        self.sumr.add_many(r)
+        self.wmax = max(self.wmax, float(np.max(w)))
+        self.wmin = min(self.wmin, float(np.min(w)))
+
+        n_drop_tmp = dropped_events(p_drop, n_drop)
+        w_dropped = w / (1 - p_drop)
+        if np.any(n_drop_tmp):
+            self._dropped().n.add_many(n_drop_tmp)
+        dropped = p_drop != 0
+        if dropped.any():
+            self._dropped().raw.add_many(w[dropped], r[dropped])
+            self._dropped().corrected.add_many(w_dropped[dropped], r[dropped])
+            self.shared.add_many(w[~dropped], r[~dropped])
+        else:
+            self.shared.add_many(w, r)
+        self.interval_wmax = max(self.interval_wmax, float(np.max(w_dropped)))
+        self.interval_wmin = min(self.interval_wmin, float(np.min(w_dropped)))
+
+        self.scaled_reward.add_many(w_dropped * scaled)
+        self.max_weight = max(self.max_weight, float(np.max(w_dropped)))
+
+    def _sums(self, corrected: bool) -> List[Accumulator]:
+        """Shared sums including the examples with p_drop > 0, with their original or their
+        drop-corrected weights
+        """
+        sums = self.shared.sums()
+        if self.dropped is None:
+            return sums
+        dropped = self.dropped.corrected if corrected else self.dropped.raw
+        merge = self.accumulator.merge
+        return [merge(x, y) for x, y in zip(sums, dropped.sums())]
+
+    def _dropped(self) -> _Dropped:
+        if self.dropped is None:
+            self.dropped = _Dropped(self.accumulator)
+        return self.dropped
+
+    def _estimator(self) -> cressieread.EstimatorImpl:
+        result = cressieread.EstimatorImpl(self.wmin, self.wmax, self.accumulator)
+        result.n = self.n
+        result.sumw, result.sumwsq, result.sumwr, result.sumwsqr, _ = self._sums(False)
+        result.sumr = self.sumr
+        return result
+
+    def _interval(self) -> cressieread.IntervalImpl:
+        result = cressieread.IntervalImpl(
+            self.interval_wmin,
+            self.interval_wmax,
+            self.rmin,
+            self.rmax,
+            self.empirical_r_bounds,
+            self.accumulator,
+        )
+        result.n += self.n
+        if self.dropped is not None:
+            result.n = self.accumulator.merge(result.n, self.dropped.n)
+        (
+            result.sumw,
+            result.sumwsq,
+            result.sumwr,
+            result.sumwsqr,
+            result.sumwsqrsq,
+        ) = self._sums(True)
+        return result
+
+    def _ips(self) -> Optional[float]:
+        estimator = ips.Estimator()
+        estimator.examples_count = self.n
+        estimator.weighted_reward = float(self._estimator().sumwr)
+        return estimator.get()
+
+    def _snips(self) -> Optional[float]:
+        sums = self._estimator()
+        estimator = snips.Estimator()
+        estimator.weighted_examples_count = float(sums.sumw)
+        estimator.weighted_reward = float(sums.sumwr)
+        return estimator.get()
+
+    def _cressieread(self) -> Optional[float]:
+        return self._estimator().get()
+
+    def _gaussian(self, alpha: float) -> Tuple[float, float]:
+        sums = self._interval()
+        interval = gaussian.Interval()
+        interval.examples_count = float(sums.n)
+        interval.weighted_reward = float(sums.sumwr)
+        interval.weighted_reward_sq = float(sums.sumwsqrsq)
+        return interval.get(alpha)
+
+    def _clopper_pearson(self, alpha: float) -> Tuple[float, float]:
+        interval = clopper_pearson.Interval(
+            self.rmin, self.rmax, self.empirical_r_bounds
+        )
+        interval.examples_count = float(self._interval().n)
+        interval.weighted_reward = float(self.scaled_reward)
+        interval.max_weight = self.max_weight
+        return interval.get(alpha)
+
+    def _cressieread_interval(self, alpha: float) -> Tuple[float, float]:
+        return self._interval().get(alpha)
+
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(serialization.Kind.ESTIMATOR_SET).pack(
+            _STATE,
+            serialization.accumulator_code(self.accumulator),
+            self.empirical_r_bounds,
+            self.wmin,
+            self.wmax,
+            self.interval_wmin,
+            self.interval_wmax,
+            self.rmin,
+            self.rmax,
+            self.n,
+            *(float(x) for x in self.shared.sums()),
+            float(self.sumr),
+            float(self.scaled_reward),
+            self.max_weight,
+            self.dropped is not None,
+        )
+        if self.dropped is not None:
+            writer.pack(_DROPPED, *(float(x) for x in self.dropped.sums()))
+        return writer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> EstimatorSet:
+        reader = serialization.Reader(data, serialization.Kind.ESTIMATOR_SET)
+        (
+            code,
+            empirical_r_bounds,
+            wmin,
+            wmax,
+            interval_wmin,
+            interval_wmax,
+            rmin,
+            rmax,
+            n,
+            *sums,
+            max_weight,
+            has_dropped,
+        ) = reader.unpack(_STATE)
+        accumulator = serialization.accumulator_type(code)
+        result = cls(wmin, wmax, rmin, rmax, empirical_r_bounds, accumulator)
+        result.interval_wmin = interval_wmin
+        result.interval_wmax = interval_wmax
+        result.n = n
+        result.max_weight = max_weight
+        sums = [serialization.accumulated(accumulator, x) for x in sums]
+        result.shared.assign(sums[:5])
+        result.sumr, result.scaled_reward = sums[5:]
+        if has_dropped:
+            result._dropped().assign(
+                [
+                    serialization.accumulated(accumulator, x)
+                    for x in reader.unpack(_DROPPED)
+                ]
+            )
+        reader.end()
+        return result
+
+    def __add__(self, other: EstimatorSet) -> EstimatorSet:
+        return EstimatorSet.merge_all((self, other))
+
+    @classmethod
+    def merge_all(cls, sets: Iterable[EstimatorSet]) -> EstimatorSet:
+        sets = list(sets)
+        assert sets, "Error: nothing to merge"
+        first = sets[0]
+        for other in sets[1:]:
+            assert not (
+                first.empirical_r_bounds ^ other.empirical_r_bounds
+            ), "Summation of estimators with various r bounds policy is prohibited"
+            if not first.empirical_r_bounds:
+                assert (
+                    first.rmin == other.rmin
+                ), "Summation of estimators with various r bounds is prohibited"
+                assert (
+                    first.rmax == other.rmax
+                ), "Summation of estimators with various r bounds is prohibited"
+
+        merge_all = first.accumulator.merge_all
+        result = cls(
+            wmin=min(x.wmin for x in sets),
+            wmax=max(x.wmax for x in sets),
+            rmin=min(x.rmin for x in sets),
+            rmax=max(x.rmax for x in sets),
+            empirical_r_bounds=first.empirical_r_bounds,
+            accumulator=first.accumulator,
+        )
+        result.interval_wmin = min(x.interval_wmin for x in sets)
+        result.interval_wmax = max(x.interval_wmax for x in sets)
+        result.n = sum(x.n for x in sets)
+        result.shared.assign(
+            [merge_all(sums) for sums in zip(*(x.shared.sums() for x in sets))]
+        )
+        result.sumr = merge_all([x.sumr for x in sets])
+        result.scaled_reward = merge_all([x.scaled_reward for x in sets])
+        result.max_weight = max(x.max_weight for x in sets)
+
+        dropped = [x.dropped for x in sets if x.dropped is not None]
+        if dropped:
+            result._dropped().assign(
+                [merge_all(sums) for sums in zip(*(x.sums() for x in dropped))]
+            )
+        return result
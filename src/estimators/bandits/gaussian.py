@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import struct
 import math
+import numpy as np
+import numpy.typing as npt
 from estimators.bandits import base
-from scipy import stats  # type: ignore
-from typing import List, Optional, Tuple, cast
+from estimators.checkpoint import Checkpointable
+from estimators import serialization
+from estimators.math import QuantileCache, as_columns, dropped_events, norm_ppf
+from typing import Iterable, List, Optional, Sequence, Tuple, cast
 
+_norm_ppf = QuantileCache(norm_ppf)
+_STATE = struct.Struct("<ddd")
 
-class Interval(base.Interval):
+
+class Interval(base.Interval, Checkpointable):
     examples_count: float
     weighted_reward: float
     weighted_reward_sq: float
@@ -31,18 +39,70 @@ class Interval(base.Interval):
         w = p_pred / (p_log * (1 - p_drop))
         self.weighted_reward += r * w
         self.weighted_reward_sq += (r * w) ** 2
+        if self._delta is not None:
+            self._delta.add_example(p_log, r, p_pred, p_drop, n_drop)
+
+    def add_examples(
+        self,
+        p_log: npt.ArrayLike,
+        r: npt.ArrayLike,
+        p_pred: npt.ArrayLike,
+        p_drop: npt.ArrayLike = 0,
+        n_drop: Optional[npt.ArrayLike] = None,
+    ) -> None:
+        p_log, r, p_pred, p_drop = as_columns(p_log, r, p_pred, p_drop)
+        n_drop_tmp = dropped_events(p_drop, n_drop)
+        self.examples_count += len(r) + float(np.sum(n_drop_tmp))
+        w = p_pred / (p_log * (1 - p_drop))
+        rw = r * w
+        self.weighted_reward += float(np.sum(rw))
+        self.weighted_reward_sq += float(np.sum(rw**2))
+        if self._delta is not None:
+            self._delta.add_examples(p_log, r, p_pred, p_drop, n_drop)
+
+    def _empty(self) -> Interval:
+        return Interval()
 
     def get(self, alpha: float = 0.05) -> Tuple[float, float]:
+        return self.get_many([alpha])[0]
+
+    def get_many(self, alphas: Sequence[float]) -> List[Tuple[float, float]]:
         if self.examples_count <= 1:
-            return (-math.inf, math.inf)
+            return [(-math.inf, math.inf)] * len(alphas)
 
-        z_gaussian_cdf = stats.norm.ppf(1 - alpha / 2)
         variance = (
             self.weighted_reward_sq - self.weighted_reward**2 / self.examples_count
         ) / (self.examples_count - 1)
-        gauss_delta = z_gaussian_cdf * math.sqrt(max(0, variance) / self.examples_count)
         ips = self.weighted_reward / self.examples_count
-        return (ips - gauss_delta, ips + gauss_delta)
+        result = []
+        for z_gaussian_cdf in _norm_ppf([1 - alpha / 2 for alpha in alphas]):
+            gauss_delta = z_gaussian_cdf * math.sqrt(
+                max(0, variance) / self.examples_count
+            )
+            result.append((ips - gauss_delta, ips + gauss_delta))
+        return result
+
+    def to_bytes(self) -> bytes:
+        return (
+            serialization.Writer(serialization.Kind.GAUSSIAN)
+            .pack(
+                _STATE,
+                self.examples_count,
+                self.weighted_reward,
+                self.weighted_reward_sq,
+            )
+            .getvalue()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Interval:
+        reader = serialization.Reader(data, serialization.Kind.GAUSSIAN)
+        result = cls()
+        result.examples_count, result.weighted_reward, result.weighted_reward_sq = (
+            reader.unpack(_STATE)
+        )
+        reader.end()
+        return result
 
     def __add__(self, other: Interval) -> Interval:
         result = Interval()
@@ -50,3 +110,12 @@ class Interval(base.Interval):
         result.weighted_reward = self.weighted_reward + other.weighted_reward
         result.weighted_reward_sq = self.weighted_reward_sq + other.weighted_reward_sq
         return result
+
+    @classmethod
+    def merge_all(cls, intervals: Iterable[Interval]) -> Interval:
+        result = cls()
+        for x in intervals:
+            result.examples_count += x.examples_count
+            result.weighted_reward += x.weighted_reward
+            result.weighted_reward_sq += x.weighted_reward_sq
+        return result
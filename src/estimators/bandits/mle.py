@@ -2,74 +2,569 @@
 
 from __future__ import annotations
 
-from math import fsum, inf
+import numpy as np
+import numpy.typing as npt
+import struct
+import tempfile
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from math import floor, fsum, inf, isnan, log, log1p, nan
+from estimators import serialization
 from estimators.bandits import base
-from typing import List, Optional, Tuple
+from estimators.math import as_columns, blocked_fsum
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+Column = npt.NDArray[np.float64]
+Chunk = Tuple[Column, Column, Column]
+T = TypeVar("T")
+
+# wmin, wmax, the empirical extremes of the weights, the last dual solution (nan if none),
+# the kind of storage, its quantization (nan if none) and the number of stored rows
+_STATE = struct.Struct("<dddddBdQ")
+_ARRAY, _HISTOGRAM, _QUANTIZED = range(3)
+# bucket of the zero weights of QuantizedStorage
+_ZERO_BUCKET = np.iinfo(np.int64).min
+
+
+class ArrayStorage:
+    """Examples stored as growable contiguous float64 columns of counts, weights and rewards"""
+
+    size: int
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.size = 0
+        self._c: Column = np.empty(capacity)
+        self._w: Column = np.empty(capacity)
+        self._r: Column = np.empty(capacity)
+
+    def _reserve(self, capacity: int) -> None:
+        c, w, r = self._c, self._w, self._r
+        self._c, self._w, self._r = (np.empty(capacity) for _ in range(3))
+        self._c[: self.size] = c[: self.size]
+        self._w[: self.size] = w[: self.size]
+        self._r[: self.size] = r[: self.size]
+
+    def append(self, c: float, w: float, r: float) -> None:
+        if self.size == len(self._w):
+            self._reserve(max(1, 2 * self.size))
+        self._c[self.size] = c
+        self._w[self.size] = w
+        self._r[self.size] = r
+        self.size += 1
+
+    def extend(self, c: Column, w: Column, r: Column) -> None:
+        size = self.size + len(w)
+        if size > len(self._w):
+            self._reserve(max(size, 2 * self.size))
+        start = self.size
+        self._c[start:size] = c
+        self._w[start:size] = w
+        self._r[start:size] = r
+        self.size = size
+
+    def columns(self) -> Chunk:
+        return (self._c[: self.size], self._w[: self.size], self._r[: self.size])
+
+    def _state(self) -> Chunk:
+        """Stored rows, as they are kept internally"""
+        return (self._c[: self.size], self._w[: self.size], self._r[: self.size])
+
+    def _load(self, c: Column, w: Column, r: Column) -> None:
+        """Uses the columns as the stored rows without copying them, read-only columns
+        are copied before they are modified"""
+        self._c, self._w, self._r = c, w, r
+        self.size = len(w)
+
+    def _own(self) -> None:
+        if not self._c.flags.writeable:
+            self._reserve(max(1, self.size))
+
+    def chunks(self) -> Iterator[Chunk]:
+        if self.size > 0:
+            yield self.columns()
+
+    def map(self, fn: Callable[[Column, Column, Column], T]) -> List[T]:
+        return [fn(*chunk) for chunk in self.chunks()]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _copy(self, capacity: int) -> ArrayStorage:
+        result = copy(self)
+        result._reserve(max(1, capacity))
+        return result
+
+    def __add__(self, other: ArrayStorage) -> ArrayStorage:
+        assert type(self) is type(
+            other
+        ), "Summation of estimators with various storages is prohibited"
+        result = self._copy(self.size + other.size)
+        if other.size > 0:
+            result.extend(*other.columns())
+        return result
+
+
+class HistogramStorage(ArrayStorage):
+    """Examples with identical (w, r) merged into a single row, so memory is bounded by the number of distinct pairs"""
+
+    def __init__(self, capacity: int = 1024) -> None:
+        super().__init__(capacity)
+        self._index: Dict[Tuple[float, float], int] = {}
+
+    def append(self, c: float, w: float, r: float) -> None:
+        i = self._index.get((w, r))
+        if i is None:
+            self._index[(w, r)] = self.size
+            super().append(c, w, r)
+        else:
+            self._own()
+            self._c[i] += c
+
+    def extend(self, c: Column, w: Column, r: Column) -> None:
+        pairs, inverse = np.unique(
+            np.stack((w, r), axis=1), axis=0, return_inverse=True
+        )
+        counts = np.bincount(inverse.ravel(), weights=c, minlength=len(pairs))
+        for (wi, ri), ci in zip(pairs.tolist(), counts.tolist()):
+            self.append(ci, wi, ri)
+
+    def _copy(self, capacity: int) -> ArrayStorage:
+        result = super()._copy(capacity)
+        assert isinstance(result, HistogramStorage)
+        result._index = dict(self._index)
+        return result
+
+    def _load(self, c: Column, w: Column, r: Column) -> None:
+        super()._load(c, w, r)
+        self._index = {pair: i for i, pair in enumerate(zip(w.tolist(), r.tolist()))}
+
+
+class QuantizedStorage(ArrayStorage):
+    """Examples bucketed on a log-scale grid of weights with relative spacing rel_tol.
+
+    Every bucket keeps the total count, weight and reward of its examples and represents
+    them by their mean weight and mean reward, so memory only depends on the range of the
+    weights: log(max(w) / min(w)) / log(1 + rel_tol) + 2 buckets at most. Zero weights are
+    kept exactly.
+
+    Error bound: every weight is within a factor of (1 + rel_tol) of the mean weight of its
+    bucket, so the estimate is the exact MLE estimate of a dataset with each importance
+    weight misspecified by at most that factor. At a fixed dual variable beta the normalized
+    weight w / ((w - 1) * beta + n) of every example changes by at most the same factor, so
+    the weighted reward and the missing mass change by at most rel_tol of their magnitude
+    and the estimate by at most 2 * rel_tol * max(|r|) while the normalized weights sum to
+    at most one. Rewards are summed exactly within a bucket and add no error.
+    """
+
+    rel_tol: float
+
+    def __init__(self, rel_tol: float, capacity: int = 1024) -> None:
+        assert rel_tol > 0
+        super().__init__(capacity)
+        self.rel_tol = rel_tol
+        self._log_base = log1p(rel_tol)
+        self._index: Dict[Optional[int], int] = {}
+
+    def _add(self, bucket: Optional[int], c: float, sumw: float, sumr: float) -> None:
+        i = self._index.get(bucket)
+        if i is None:
+            self._index[bucket] = self.size
+            super().append(c, sumw, sumr)
+        else:
+            self._own()
+            self._c[i] += c
+            self._w[i] += sumw
+            self._r[i] += sumr
+
+    def append(self, c: float, w: float, r: float) -> None:
+        bucket = floor(log(w) / self._log_base) if w > 0 else None
+        self._add(bucket, c, c * w, c * r)
+
+    def extend(self, c: Column, w: Column, r: Column) -> None:
+        zero = w == 0
+        if zero.any():
+            self._add(None, float(np.sum(c[zero])), 0.0, float(np.sum((c * r)[zero])))
+            c, w, r = c[~zero], w[~zero], r[~zero]
+        buckets, inverse = np.unique(
+            np.floor(np.log(w) / self._log_base), return_inverse=True
+        )
+        inverse = inverse.ravel()
+        sums = (
+            np.bincount(inverse, weights=x, minlength=len(buckets))
+            for x in (c, c * w, c * r)
+        )
+        for bucket, *bucket_sums in zip(buckets.tolist(), *(x.tolist() for x in sums)):
+            self._add(int(bucket), *bucket_sums)
+
+    def columns(self) -> Chunk:
+        c, sumw, sumr = super().columns()
+        return (c, sumw / c, sumr / c)
+
+    def _copy(self, capacity: int) -> ArrayStorage:
+        result = super()._copy(capacity)
+        assert isinstance(result, QuantizedStorage)
+        result._index = dict(self._index)
+        return result
+
+    def __add__(self, other: ArrayStorage) -> ArrayStorage:
+        assert isinstance(
+            other, QuantizedStorage
+        ), "Summation of estimators with various storages is prohibited"
+        assert (
+            self.rel_tol == other.rel_tol
+        ), "Summation of estimators with various quantization is prohibited"
+        result = self._copy(self.size + other.size)
+        assert isinstance(result, QuantizedStorage)
+        for bucket, i in other._index.items():
+            result._add(bucket, other._c[i], other._w[i], other._r[i])
+        return result
+
+
+class MemmapStorage(ArrayStorage):
+    """Examples appended to a memory-mapped file in fixed-size chunks of chunk_size rows.
+
+    Only the last, partially filled chunk is kept in memory; map() evaluates full chunks
+    in parallel threads, NumPy releases the GIL for the arithmetic. The file is a temporary
+    one unless path is given.
+
+    close() releases the file and the threads, and is called on exit when the storage is used
+    as a context manager, or when it is garbage collected otherwise.
+    """
+
+    chunk_size: int
+    workers: Optional[int]
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        chunk_size: int = 1 << 20,
+        workers: Optional[int] = None,
+    ) -> None:
+        super().__init__(chunk_size)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self._file: IO[bytes] = (
+            open(path, "w+b") if path is not None else tempfile.TemporaryFile()
+        )
+        self._spilled = 0
+        self._mapped: Optional[npt.NDArray[np.float64]] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._finalizer = weakref.finalize(self, self._file.close)
+
+    def _spill(self) -> None:
+        for column in self.columns():
+            column.tofile(self._file)
+        self._spilled += 1
+        self._mapped = None
+        self.size = 0
+
+    def append(self, c: float, w: float, r: float) -> None:
+        super().append(c, w, r)
+        if self.size == self.chunk_size:
+            self._spill()
+
+    def extend(self, c: Column, w: Column, r: Column) -> None:
+        while len(w) > 0:
+            k = min(len(w), self.chunk_size - self.size)
+            super().extend(c[:k], w[:k], r[:k])
+            c, w, r = c[k:], w[k:], r[k:]
+            if self.size == self.chunk_size:
+                self._spill()
+
+    def chunks(self) -> Iterator[Chunk]:
+        if self._spilled > 0:
+            if self._mapped is None:
+                self._file.flush()
+                self._mapped = np.memmap(
+                    self._file,
+                    dtype=np.float64,
+                    mode="r",
+                    shape=(self._spilled, 3, self.chunk_size),
+                )
+            for c, w, r in self._mapped:
+                yield (c, w, r)
+        yield from super().chunks()
+
+    def map(self, fn: Callable[[Column, Column, Column], T]) -> List[T]:
+        if self._spilled == 0:
+            return [fn(*chunk) for chunk in self.chunks()]
+        # started once, get() maps over the chunks at every step of the solver
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers)
+        return list(self._executor.map(lambda chunk: fn(*chunk), self.chunks()))
+
+    def __len__(self) -> int:
+        return self._spilled * self.chunk_size + self.size
+
+    def _state(self) -> Chunk:
+        chunks = list(self.chunks())
+        if not chunks:
+            return super()._state()
+        c, w, r = (np.concatenate(column) for column in zip(*chunks))
+        return (c, w, r)
+
+    def close(self) -> None:
+        self._mapped = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._finalizer()
+
+    def __enter__(self) -> MemmapStorage:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __add__(self, other: ArrayStorage) -> ArrayStorage:
+        assert isinstance(
+            other, MemmapStorage
+        ), "Summation of estimators with various storages is prohibited"
+        result = MemmapStorage(chunk_size=self.chunk_size, workers=self.workers)
+        for storage in (self, other):
+            for chunk in storage.chunks():
+                result.extend(*chunk)
+        return result
 
 
 class Estimator(base.Estimator):
+    data: ArrayStorage
+
     # NB: This works better you use the true wmin and wmax
     #     which is _not_ the empirical minimum and maximum
     #     but rather the actual smallest and largest possible values
-    def __init__(self, wmin: float = 0, wmax: float = inf):
+    #     deduplicate=True merges identical (w, r) pairs into a histogram,
+    #     which gives the same estimate when there are few distinct pairs
+    #     quantization=rel_tol buckets weights on a log-scale grid (see QuantizedStorage),
+    #     which bounds memory and get() time for continuous weights at the cost of accuracy
+    #     storage=MemmapStorage(...) spills examples to disk for datasets larger than RAM
+    def __init__(
+        self,
+        wmin: float = 0,
+        wmax: float = inf,
+        deduplicate: bool = False,
+        quantization: Optional[float] = None,
+        storage: Optional[ArrayStorage] = None,
+    ):
         assert wmin < 1
         assert wmax > 1
+        assert (
+            sum((deduplicate, quantization is not None, storage is not None)) <= 1
+        ), "deduplicate, quantization and storage are mutually exclusive"
 
         self.wmin = wmin
         self.wmax = wmax
 
-        self.data: List[Tuple[int, float, float]] = []
+        self.data = (
+            storage
+            if storage is not None
+            else (
+                QuantizedStorage(quantization)
+                if quantization is not None
+                else HistogramStorage() if deduplicate else ArrayStorage()
+            )
+        )
+
+        # empirical extremes of the weights, they define the bracket of the dual variable
+        self._wlow = inf
+        self._whigh = -inf
+
+        # get() is memoized per version of the data and warm-started from the last solution
+        self._version = 0
+        self._cached: Optional[Tuple[int, Optional[float]]] = None
+        self._lambdastar: Optional[float] = None
 
     def add_example(self, p_log: float, r: float, p_pred: float) -> None:
         w = p_pred / p_log
         assert w >= 0, "Error: negative importance weight"
 
-        self.data.append((1, w, r))
+        self.data.append(1, w, r)
         self.wmax = max(self.wmax, w)
         self.wmin = min(self.wmin, w)
+        self._wlow = min(self._wlow, w)
+        self._whigh = max(self._whigh, w)
+        self._version += 1
+
+    def add_examples(
+        self, p_log: npt.ArrayLike, r: npt.ArrayLike, p_pred: npt.ArrayLike
+    ) -> None:
+        p_log, r, p_pred = as_columns(p_log, r, p_pred)
+        if len(r) == 0:
+            return
+        w = p_pred / p_log
+        assert (w >= 0).all(), "Error: negative importance weight"
+
+        self.data.extend(np.ones(len(w)), w, r)
+        wlow, whigh = float(np.min(w)), float(np.max(w))
+        self.wmax = max(self.wmax, whigh)
+        self.wmin = min(self.wmin, wlow)
+        self._wlow = min(self._wlow, wlow)
+        self._whigh = max(self._whigh, whigh)
+        self._version += 1
+
+    def _sum(self, term: Callable[[Column, Column, Column], Column]) -> float:
+        return fsum(self.data.map(lambda c, w, r: blocked_fsum(term(c, w, r))))
 
     def graddualobjective(self, n: float, beta: float) -> float:
-        return fsum(c * (w - 1) / ((w - 1) * beta + n) for c, w, _ in self.data)
+        return self._sum(lambda c, w, _: c * (w - 1) / ((w - 1) * beta + n))
+
+    def _graddualobjective_with_derivative(
+        self, n: float, beta: float
+    ) -> Tuple[float, float]:
+        def partial(c: Column, w: Column, _: Column) -> Tuple[float, float]:
+            x = (w - 1) / ((w - 1) * beta + n)
+            return blocked_fsum(c * x), -blocked_fsum(c * x * x)
+
+        grad, hess = zip(*self.data.map(partial))
+        return fsum(grad), fsum(hess)
+
+    def _solve(
+        self,
+        n: float,
+        betamin: float,
+        betamax: float,
+        beta: float,
+        xtol: float = 2e-12,
+        rtol: float = 4 * np.finfo(float).eps,
+        maxiter: int = 100,
+    ) -> float:
+        """Safeguarded Newton iterations for the root of the (decreasing) dual gradient,
+        falling back to bisection whenever a step leaves the current bracket"""
+        for _ in range(maxiter):
+            grad, hess = self._graddualobjective_with_derivative(n, beta)
+            if grad == 0:
+                return beta
+            if grad > 0:
+                betamin = beta
+            else:
+                betamax = beta
+            step = beta - grad / hess if hess < 0 else inf
+            if not betamin <= step <= betamax:
+                step = (betamin + betamax) / 2
+            if abs(step - beta) <= xtol + rtol * abs(step):
+                return step
+            beta = step
+        return beta
 
     def get(self) -> Optional[float]:
+        if self._cached is None or self._cached[0] != self._version:
+            self._cached = (self._version, self._get())
+        return self._cached[1]
+
+    def _get(self) -> Optional[float]:
         from scipy.optimize import brentq  # type: ignore
 
-        n = fsum(c for c, _, _ in self.data)
+        n = self._sum(lambda c, _, __: c)
         if n == 0:
             return None
 
+        # the bracket keeps the weight of every single example within [0, 1],
+        # so it does not depend on how duplicates are counted and is attained
+        # at the smallest and the largest weight
         betaub = n / (1 - self.wmin)
-        betamax = min(
-            betaub,
-            min(((n - c) / (1 - w) for c, w, _ in self.data if w < 1), default=betaub),
-        )
+        betamax = min(betaub, (n - 1) / (1 - self._wlow)) if self._wlow < 1 else betaub
 
         betalb = 0.0 if self.wmax == inf else n / (1 - self.wmax)
-        betamin = max(
-            betalb,
-            max(((n - c) / (1 - w) for c, w, _ in self.data if w > 1), default=betalb),
+        betamin = (
+            max(betalb, (n - 1) / (1 - self._whigh)) if self._whigh > 1 else betalb
         )
 
         gradmin = self.graddualobjective(n, betamin)
         gradmax = self.graddualobjective(n, betamax)
 
         if gradmin * gradmax < 0:
-            betastar = brentq(
-                f=lambda x: self.graddualobjective(n, x), a=betamin, b=betamax
-            )
+            # the dual variable scales with n, so the previous solution is reused relative to it
+            if (
+                self._lambdastar is not None
+                and betamin < self._lambdastar * n < betamax
+            ):
+                betastar = self._solve(n, betamin, betamax, self._lambdastar * n)
+            else:
+                betastar = brentq(
+                    f=lambda x: self.graddualobjective(n, x), a=betamin, b=betamax
+                )
+            self._lambdastar = betastar / n
         elif gradmin < 0:
             betastar = betamin
         else:
             betastar = betamax
 
-        sumofw = fsum(c * w / ((w - 1) * betastar + n) for c, w, _ in self.data)
+        sumofw = self._sum(lambda c, w, _: c * w / ((w - 1) * betastar + n))
         missing = max(0.0, 1.0 - sumofw)
 
-        vhat = fsum(c * w * r / ((w - 1) * betastar + n) for c, w, r in self.data)
-        rhatmissing = fsum(c * r for c, _, r in self.data) / n
+        vhat = self._sum(lambda c, w, r: c * w * r / ((w - 1) * betastar + n))
+        rhatmissing = self._sum(lambda c, _, r: c * r) / n
         vhat += missing * rhatmissing
 
         return vhat
 
+    def to_bytes(self) -> bytes:
+        """Rows of the storage are written as packed float64 columns. Examples spilled by
+        MemmapStorage are read back and decoded into a plain ArrayStorage"""
+        storage, rel_tol = _ARRAY, nan
+        if isinstance(self.data, QuantizedStorage):
+            storage, rel_tol = _QUANTIZED, self.data.rel_tol
+        elif isinstance(self.data, HistogramStorage):
+            storage = _HISTOGRAM
+
+        c, w, r = self.data._state()
+        writer = serialization.Writer(serialization.Kind.MLE).pack(
+            _STATE,
+            self.wmin,
+            self.wmax,
+            self._wlow,
+            self._whigh,
+            self._lambdastar if self._lambdastar is not None else nan,
+            storage,
+            rel_tol,
+            len(w),
+        )
+        for column in (c, w, r):
+            writer.array(column)
+        if isinstance(self.data, QuantizedStorage):
+            buckets = np.empty(len(w), dtype=np.int64)
+            for bucket, i in self.data._index.items():
+                buckets[i] = _ZERO_BUCKET if bucket is None else bucket
+            writer.array(buckets, np.int64)
+        return writer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Estimator:
+        """Stored rows are read-only views of data until they are modified"""
+        reader = serialization.Reader(data, serialization.Kind.MLE)
+        wmin, wmax, wlow, whigh, lambdastar, storage, rel_tol, rows = reader.unpack(
+            _STATE
+        )
+        if storage not in (_ARRAY, _HISTOGRAM, _QUANTIZED):
+            raise ValueError(f"Error: unknown storage {storage}")
+        c, w, r = (reader.array(rows) for _ in range(3))
+        buckets = reader.array(rows, np.int64) if storage == _QUANTIZED else None
+        reader.end()
+
+        result = cls(
+            wmin,
+            wmax,
+            deduplicate=storage == _HISTOGRAM,
+            quantization=rel_tol if storage == _QUANTIZED else None,
+        )
+        result.data._load(c, w, r)
+        if isinstance(result.data, QuantizedStorage) and buckets is not None:
+            result.data._index = {
+                None if bucket == _ZERO_BUCKET else bucket: i
+                for i, bucket in enumerate(buckets.tolist())
+            }
+        result._wlow = wlow
+        result._whigh = whigh
+        result._lambdastar = None if isnan(lambdastar) else lambdastar
+        return result
+
     def __add__(self, other: Estimator) -> Estimator:
-        raise NotImplementedError()
+        result = Estimator(
+            wmin=min(self.wmin, other.wmin), wmax=max(self.wmax, other.wmax)
+        )
+        result.data = self.data + other.data
+        result._wlow = min(self._wlow, other._wlow)
+        result._whigh = max(self._whigh, other._whigh)
+        result._lambdastar = self._lambdastar
+        return result
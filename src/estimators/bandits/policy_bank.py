@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import numpy as np
+import struct
+import numpy.typing as npt
+from estimators import serialization
+from estimators.bandits import cressieread
+from estimators.math import as_columns, dropped_events, norm_ppf
+from math import inf
+from typing import Iterable, Optional
+
+# number of policies, empirical_r_bounds, rmin, rmax, n, sumr and examples_count,
+# followed by the per-policy arrays
+_STATE = struct.Struct("<Q?ddqdd")
+_ARRAYS = (
+    "sumw",
+    "sumwsq",
+    "sumwr",
+    "sumwsqr",
+    "wmin",
+    "wmax",
+    "sumu",
+    "sumusq",
+    "sumur",
+    "sumusqr",
+    "sumusqrsq",
+    "umin",
+    "umax",
+)
+
+
+class PolicyBank:
+    """Evaluates K target policies on the same log in one pass.
+
+    Importance weights of all policies are computed at once as an (n, K) matrix and the
+    sufficient statistics of ips, snips, cressieread and of the gaussian and cressieread
+    intervals are updated with column sums. Results are returned as arrays over policies.
+    Sums are kept in float64, which is the precision of ips and snips.
+    """
+
+    n_policies: int
+
+    def __init__(
+        self,
+        n_policies: int,
+        wmin: float = 0,
+        wmax: float = inf,
+        rmin: float = 0,
+        rmax: float = 1,
+        empirical_r_bounds: bool = False,
+    ) -> None:
+        assert wmin < 1
+        assert wmax > 1
+
+        self.n_policies = n_policies
+        self.rmin = rmin
+        self.rmax = rmax
+        self.empirical_r_bounds = empirical_r_bounds
+
+        # importance weights p_pred / p_log
+        self.n = 0
+        self.sumr = 0.0
+        self.sumw = np.zeros(n_policies)
+        self.sumwsq = np.zeros(n_policies)
+        self.sumwr = np.zeros(n_policies)
+        self.sumwsqr = np.zeros(n_policies)
+        self.wmin = np.full(n_policies, float(wmin))
+        self.wmax = np.full(n_policies, float(wmax))
+
+        # importance weights corrected for dropped events, p_pred / (p_log * (1 - p_drop))
+        self.examples_count = 0.0
+        self.sumu = np.zeros(n_policies)
+        self.sumusq = np.zeros(n_policies)
+        self.sumur = np.zeros(n_policies)
+        self.sumusqr = np.zeros(n_policies)
+        self.sumusqrsq = np.zeros(n_policies)
+        self.umin = np.full(n_policies, float(wmin))
+        self.umax = np.full(n_policies, float(wmax))
+
+    def add_examples(
+        self,
+        p_log: npt.ArrayLike,
+        r: npt.ArrayLike,
+        p_pred: Optional[npt.ArrayLike] = None,
+        pmf: Optional[npt.ArrayLike] = None,
+        action: Optional[npt.ArrayLike] = None,
+        p_drop: npt.ArrayLike = 0,
+        n_drop: Optional[npt.ArrayLike] = None,
+    ) -> None:
+        """
+        Args:
+                p_log: array of probabilities of the logging policy
+                r: array of rewards
+                p_pred: (n, K) matrix of probabilities of the logged actions under each policy
+                pmf: (n, K, n_actions) probability mass functions of the policies, used with action
+                    instead of p_pred
+                action: array of indices of the logged actions into the last axis of pmf
+                p_drop: array of probabilities for event to be dropped
+                n_drop: array of amounts of dropped events, masked entries are populated as p_drop/(1-p_drop)
+        """
+        if p_pred is None:
+            assert (
+                pmf is not None and action is not None
+            ), "Error: either p_pred or pmf and action must be provided"
+            indices = np.asarray(action, dtype=np.intp)[:, np.newaxis, np.newaxis]
+            p_pred = np.take_along_axis(np.asarray(pmf), indices, axis=2)[..., 0]
+
+        predictions = np.asarray(p_pred, dtype=np.float64)
+        if predictions.ndim != 2 or predictions.shape[1] != self.n_policies:
+            raise ValueError(
+                f"Error: expected p_pred of shape (n, {self.n_policies}), found {predictions.shape}"
+            )
+        p_log, r, p_drop = as_columns(p_log, r, p_drop)
+        if len(r) != len(predictions):
+            raise ValueError(
+                f"Error: expected {len(predictions)} examples, found {len(r)}"
+            )
+        if len(r) == 0:
+            return
+
+        if self.empirical_r_bounds:
+            self.rmax = max(self.rmax, float(np.max(r)))
+            self.rmin = min(self.rmin, float(np.min(r)))
+        else:
+            outside = (r > self.rmax) | (r < self.rmin)
+            if outside.any():
+                raise ValueError(
+                    f"Error: Value of r={r[outside][0]} is outside rmin={self.rmin}, rmax={self.rmax} bounds"
+                )
+
+        w = predictions / p_log[:, np.newaxis]
+        assert (w >= 0).all(), "Error: negative importance weight"
+        wsq = w**2
+        self.n += len(r)
+        self.sumr += float(np.sum(r))
+        self.sumw += w.sum(axis=0)
+        self.sumwsq += wsq.sum(axis=0)
+        self.sumwr += r @ w
+        self.sumwsqr += r @ wsq
+        self.wmin = np.minimum(self.wmin, w.min(axis=0))
+        self.wmax = np.maximum(self.wmax, w.max(axis=0))
+
+        if p_drop.any():
+            u = w / (1 - p_drop[:, np.newaxis])
+            usq = u**2
+        else:
+            u, usq = w, wsq
+        self.examples_count += len(r) + float(np.sum(dropped_events(p_drop, n_drop)))
+        self.sumu += u.sum(axis=0)
+        self.sumusq += usq.sum(axis=0)
+        self.sumur += r @ u
+        self.sumusqr += r @ usq
+        self.sumusqrsq += r**2 @ usq
+        self.umin = np.minimum(self.umin, u.min(axis=0))
+        self.umax = np.maximum(self.umax, u.max(axis=0))
+
+    def get_ips(self) -> npt.NDArray[np.float64]:
+        """ips estimates of every policy, nan if there are no examples"""
+        return self.sumwr / self.n if self.n > 0 else np.full(self.n_policies, np.nan)
+
+    def get_snips(self) -> npt.NDArray[np.float64]:
+        """snips estimates of every policy, nan where the sum of weights is 0"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result: npt.NDArray[np.float64] = np.where(
+                self.sumw != 0, self.sumwr / self.sumw, np.nan
+            )
+        return result
+
+    def get_cressieread(self) -> npt.NDArray[np.float64]:
+        """cressieread estimates of every policy, nan if there are no examples"""
+        return cressieread.estimates(
+            self.n,
+            self.sumw,
+            self.sumwsq,
+            self.sumwr,
+            self.sumwsqr,
+            self.sumr,
+            self.wmin,
+            self.wmax,
+        )
+
+    def get_gaussian_interval(self, alpha: float = 0.05) -> npt.NDArray[np.float64]:
+        """gaussian intervals of every policy as a (K, 2) array"""
+        count = self.examples_count
+        if count <= 1:
+            return np.tile([-inf, inf], (self.n_policies, 1))
+
+        z_gaussian_cdf = float(norm_ppf(1 - alpha / 2))
+        variance = (self.sumusqrsq - self.sumur**2 / count) / (count - 1)
+        gauss_delta = z_gaussian_cdf * np.sqrt(np.maximum(0, variance) / count)
+        ips = self.sumur / count
+        return np.stack((ips - gauss_delta, ips + gauss_delta), axis=-1)
+
+    def get_cressieread_interval(
+        self, alpha: float = 0.05, atol: float = 1e-9
+    ) -> npt.NDArray[np.float64]:
+        """cressieread intervals of every policy as a (K, 2) array"""
+        lower, upper = cressieread.bounds(
+            self.examples_count,
+            self.sumu,
+            self.sumusq,
+            self.sumur,
+            self.sumusqr,
+            self.sumusqrsq,
+            self.umin,
+            self.umax,
+            self.rmin,
+            self.rmax,
+            alpha=alpha,
+            atol=atol,
+            empirical_r_bounds=self.empirical_r_bounds,
+        )
+        return np.stack((lower, upper), axis=-1)
+
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(serialization.Kind.POLICY_BANK).pack(
+            _STATE,
+            self.n_policies,
+            self.empirical_r_bounds,
+            self.rmin,
+            self.rmax,
+            self.n,
+            self.sumr,
+            self.examples_count,
+        )
+        for name in _ARRAYS:
+            writer.array(getattr(self, name))
+        return writer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> PolicyBank:
+        """Per-policy sums are copied from data, they are updated in place"""
+        reader = serialization.Reader(data, serialization.Kind.POLICY_BANK)
+        n_policies, empirical_r_bounds, rmin, rmax, *counts = reader.unpack(_STATE)
+        result = cls(
+            n_policies, rmin=rmin, rmax=rmax, empirical_r_bounds=empirical_r_bounds
+        )
+        result.n, result.sumr, result.examples_count = counts
+        for name in _ARRAYS:
+            setattr(result, name, reader.array(n_policies).copy())
+        reader.end()
+        return result
+
+    def __add__(self, other: PolicyBank) -> PolicyBank:
+        return PolicyBank.merge_all((self, other))
+
+    @classmethod
+    def merge_all(cls, banks: Iterable[PolicyBank]) -> PolicyBank:
+        banks = list(banks)
+        assert banks, "Error: nothing to merge"
+        first = banks[0]
+        for other in banks[1:]:
+            assert (
+                first.n_policies == other.n_policies
+            ), "Summation of policy banks with various number of policies is prohibited"
+            assert not (
+                first.empirical_r_bounds ^ other.empirical_r_bounds
+            ), "Summation of estimators with various r bounds policy is prohibited"
+
+            if not first.empirical_r_bounds:
+                assert (
+                    first.rmin == other.rmin
+                ), "Summation of estimators with various r bounds is prohibited"
+                assert (
+                    first.rmax == other.rmax
+                ), "Summation of estimators with various r bounds is prohibited"
+
+        result = cls(
+            first.n_policies,
+            rmin=min(x.rmin for x in banks),
+            rmax=max(x.rmax for x in banks),
+            empirical_r_bounds=first.empirical_r_bounds,
+        )
+        result.n = sum(x.n for x in banks)
+        result.examples_count = sum(x.examples_count for x in banks)
+        result.sumr = sum(x.sumr for x in banks)
+        for name in (
+            "sumw",
+            "sumwsq",
+            "sumwr",
+            "sumwsqr",
+            "sumu",
+            "sumusq",
+            "sumur",
+            "sumusqr",
+            "sumusqrsq",
+        ):
+            setattr(result, name, np.sum([getattr(x, name) for x in banks], axis=0))
+        result.wmin = np.min([x.wmin for x in banks], axis=0)
+        result.wmax = np.max([x.wmax for x in banks], axis=0)
+        result.umin = np.min([x.umin for x in banks], axis=0)
+        result.umax = np.max([x.umax for x in banks], axis=0)
+        return result
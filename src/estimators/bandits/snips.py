@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import struct
+import numpy as np
+import numpy.typing as npt
 from estimators.bandits import base
-from typing import Optional
+from estimators.checkpoint import Checkpointable
+from estimators import serialization
+from estimators.math import as_columns
+from typing import Iterable, Optional
 
+_STATE = struct.Struct("<dd")
 
-class Estimator(base.Estimator):
+
+class Estimator(base.Estimator, Checkpointable):
     weighted_examples_count: float
     weighted_reward: float
 
@@ -16,6 +24,21 @@ class Estimator(base.Estimator):
         w = p_pred / p_log
         self.weighted_examples_count += w
         self.weighted_reward += r * w
+        if self._delta is not None:
+            self._delta.add_example(p_log, r, p_pred)
+
+    def add_examples(
+        self, p_log: npt.ArrayLike, r: npt.ArrayLike, p_pred: npt.ArrayLike
+    ) -> None:
+        p_log, r, p_pred = as_columns(p_log, r, p_pred)
+        w = p_pred / p_log
+        self.weighted_examples_count += float(np.sum(w))
+        self.weighted_reward += float(np.sum(r * w))
+        if self._delta is not None:
+            self._delta.add_examples(p_log, r, p_pred)
+
+    def _empty(self) -> Estimator:
+        return Estimator()
 
     def get(self) -> Optional[float]:
         return (
@@ -24,6 +47,21 @@ class Estimator(base.Estimator):
             else None
         )
 
+    def to_bytes(self) -> bytes:
+        return (
+            serialization.Writer(serialization.Kind.SNIPS)
+            .pack(_STATE, self.weighted_examples_count, self.weighted_reward)
+            .getvalue()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Estimator:
+        reader = serialization.Reader(data, serialization.Kind.SNIPS)
+        result = cls()
+        result.weighted_examples_count, result.weighted_reward = reader.unpack(_STATE)
+        reader.end()
+        return result
+
     def __add__(self, other: Estimator) -> Estimator:
         result = Estimator()
         result.weighted_examples_count = (
@@ -31,3 +69,11 @@ class Estimator(base.Estimator):
         )
         result.weighted_reward = self.weighted_reward + other.weighted_reward
         return result
+
+    @classmethod
+    def merge_all(cls, estimators: Iterable[Estimator]) -> Estimator:
+        result = cls()
+        for x in estimators:
+            result.weighted_examples_count += x.weighted_examples_count
+            result.weighted_reward += x.weighted_reward
+        return result
@@ -0,0 +1,21 @@
+""" Conditional contextual bandit estimators """
+
+# Submodules are imported on first attribute access, see estimators/__init__.py
+
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+from typing import List
+
+__all__ = ["base", "first_slot", "multislot", "pdis_cressieread"]
+
+
+def __getattr__(name: str) -> ModuleType:
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
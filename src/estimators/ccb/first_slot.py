@@ -1,10 +1,29 @@
 from __future__ import annotations
 
+import struct
+from estimators import serialization
 from estimators.ccb import base
 from estimators.bandits import base as bandits_base
-from typing import List, Optional, Tuple
+from typing import Any, List, Optional, Tuple
 from copy import deepcopy
 
+# number of slots and size of the state of the bandits estimator, which follows
+_STATE = struct.Struct("<qQ")
+
+
+def _write(kind: serialization.Kind, slots_count: int, impl: Any) -> bytes:
+    state = impl.to_bytes()
+    writer = serialization.Writer(kind).pack(_STATE, slots_count, len(state))
+    return writer.raw(state).getvalue()
+
+
+def _read(kind: serialization.Kind, data: serialization.Buffer) -> Tuple[int, Any]:
+    reader = serialization.Reader(data, kind)
+    slots_count, size = reader.unpack(_STATE)
+    impl = serialization.from_bytes(reader.raw(size))
+    reader.end()
+    return slots_count, impl
+
 
 class Estimator(base.Estimator):
     def __init__(self, bandits_impl: bandits_base.Estimator) -> None:
@@ -53,6 +72,19 @@ class Estimator(base.Estimator):
     def get_r_overall(self) -> Optional[float]:
         return self.get_r()[0]
 
+    def to_bytes(self) -> bytes:
+        """The state of the bandits estimator is embedded as it encodes itself"""
+        return _write(
+            serialization.Kind.FIRST_SLOT_ESTIMATOR, self.slots_count, self.impl
+        )
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Estimator:
+        slots_count, impl = _read(serialization.Kind.FIRST_SLOT_ESTIMATOR, data)
+        result = cls(impl)
+        result.slots_count = slots_count
+        return result
+
     def __add__(self, other: Estimator) -> Estimator:
         # TODO: dependency on instance -> dependency on factory
         raise NotImplementedError()
@@ -111,5 +143,18 @@ class Interval(base.Interval):
     def get_r_overall(self, alpha: float = 0.05) -> Tuple[float, float]:
         return self.get_r(alpha)[0]
 
+    def to_bytes(self) -> bytes:
+        """The state of the bandits interval is embedded as it encodes itself"""
+        return _write(
+            serialization.Kind.FIRST_SLOT_INTERVAL, self.slots_count, self.impl
+        )
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Interval:
+        slots_count, impl = _read(serialization.Kind.FIRST_SLOT_INTERVAL, data)
+        result = cls(impl)
+        result.slots_count = slots_count
+        return result
+
     def __add__(self, other: Interval) -> Interval:
         raise NotImplementedError()
@@ -1,22 +1,37 @@
 from __future__ import annotations
 
+import struct
 from math import inf
-from typing import Callable, List, Dict, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple, Type
 import typing
+from estimators import serialization
 from estimators.bandits.cressieread import EstimatorImpl, IntervalImpl
-from estimators.math import IncrementalFsum, clopper_pearson
+from estimators.checkpoint import Checkpointable
+from estimators.math import Accumulator, IncrementalFsum, clopper_pearson_arrays
 
+# accumulator code, wmin, wmax, number of examples and of slots, followed by the slots
+_ESTIMATOR_STATE = struct.Struct("<BddqI")
+# accumulator code, empirical_r_bounds, rmin, rmax, number of examples and of slots
+_INTERVAL_STATE = struct.Struct("<B?ddqI")
 
-class Estimator:
+
+class Estimator(Checkpointable):
     wmin: float
     wmax: float
-    n: IncrementalFsum
+    accumulator: Type[Accumulator]
+    n: int
     _impl: Dict[str, EstimatorImpl]
 
-    def __init__(self, wmin: float = 0, wmax: float = inf):
+    def __init__(
+        self,
+        wmin: float = 0,
+        wmax: float = inf,
+        accumulator: Type[Accumulator] = IncrementalFsum,
+    ):
         self.wmin = wmin
         self.wmax = wmax
-        self.n = IncrementalFsum()
+        self.accumulator = accumulator
+        self.n = 0
         self._impl = {}
 
     def add_example(
@@ -42,8 +57,13 @@ class Estimator:
         for i in range(len(ws)):
             w *= ws[i]
             if slot_ids[i] not in self._impl:
-                self._impl[slot_ids[i]] = EstimatorImpl(0, inf)
+                self._impl[slot_ids[i]] = EstimatorImpl(0, inf, self.accumulator)
             self._impl[slot_ids[i]].add(w, rs[i])
+        if self._delta is not None:
+            self._delta.add_example(slot_ids, p_logs, rs, p_preds)
+
+    def _empty(self) -> Estimator:
+        return Estimator(self.wmin, self.wmax, self.accumulator)
 
     def get_impression(self) -> Dict[str, float]:
         result = {}
@@ -72,34 +92,74 @@ class Estimator:
         return result
 
     def get_r_overall(self) -> Optional[float]:
-        return sum(self._impl.values(), EstimatorImpl(0, inf)).get()
+        return sum(self._impl.values(), EstimatorImpl(0, inf, self.accumulator)).get()
+
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(serialization.Kind.MULTISLOT_ESTIMATOR).pack(
+            _ESTIMATOR_STATE,
+            serialization.accumulator_code(self.accumulator),
+            self.wmin,
+            self.wmax,
+            self.n,
+            len(self._impl),
+        )
+        for slot_id, impl in self._impl.items():
+            impl._write(writer.string(slot_id))
+        return writer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Estimator:
+        reader = serialization.Reader(data, serialization.Kind.MULTISLOT_ESTIMATOR)
+        code, wmin, wmax, n, count = reader.unpack(_ESTIMATOR_STATE)
+        result = cls(wmin, wmax, serialization.accumulator_type(code))
+        result.n = n
+        for _ in range(count):
+            slot_id = reader.string()
+            result._impl[slot_id] = EstimatorImpl._read(reader)
+        reader.end()
+        return result
 
     def __add__(self, other: Estimator) -> Estimator:
-        slot_ids = set(self._impl.keys()).union(set(other._impl.keys()))
-        result = Estimator(
-            wmin=min(self.wmin, other.wmin), wmax=max(self.wmax, other.wmax)
+        return Estimator.merge_all((self, other))
+
+    @classmethod
+    def merge_all(cls, estimators: Iterable[Estimator]) -> Estimator:
+        """Merges any number of estimators, slots are grouped in one pass over all of them"""
+        estimators = list(estimators)
+        assert estimators, "Error: nothing to merge"
+        result = cls(
+            wmin=min(x.wmin for x in estimators),
+            wmax=max(x.wmax for x in estimators),
+            accumulator=estimators[0].accumulator,
         )
-        result.n = IncrementalFsum.merge(self.n, other.n)
-        default: Callable[[], EstimatorImpl] = lambda: EstimatorImpl(0, inf)
-        for id in slot_ids:
-            result._impl[id] = self._impl.get(id, default()) + other._impl.get(
-                id, default()
-            )
+        result.n = sum(x.n for x in estimators)
+        slots: Dict[str, List[EstimatorImpl]] = {}
+        for x in estimators:
+            for id, impl in x._impl.items():
+                slots.setdefault(id, []).append(impl)
+        for id, impls in slots.items():
+            result._impl[id] = EstimatorImpl.merge_all(impls)
         return result
 
 
-class Interval:
+class Interval(Checkpointable):
     rmin: float
     rmax: float
-    n: IncrementalFsum
+    accumulator: Type[Accumulator]
+    n: int
     _impl: Dict[str, IntervalImpl]
 
     def __init__(
-        self, rmin: float = 0, rmax: float = 1, empirical_r_bounds: bool = False
+        self,
+        rmin: float = 0,
+        rmax: float = 1,
+        empirical_r_bounds: bool = False,
+        accumulator: Type[Accumulator] = IncrementalFsum,
     ):
         self.rmin = rmin
         self.rmax = rmax
-        self.n = IncrementalFsum()
+        self.accumulator = accumulator
+        self.n = 0
         self._impl = {}
         self.empirical_r_bounds = empirical_r_bounds
 
@@ -129,18 +189,30 @@ class Interval:
             w *= ws[i]
             if slot_ids[i] not in self._impl:
                 self._impl[slot_ids[i]] = IntervalImpl(
-                    0, inf, self.rmin, self.rmax, self.empirical_r_bounds
+                    0,
+                    inf,
+                    self.rmin,
+                    self.rmax,
+                    self.empirical_r_bounds,
+                    self.accumulator,
                 )
             self._impl[slot_ids[i]].add(w, rs[i], p_drop, n_drop)
+        if self._delta is not None:
+            self._delta.add_example(slot_ids, p_logs, rs, p_preds, p_drop, n_drop)
+
+    def _empty(self) -> Interval:
+        return Interval(self.rmin, self.rmax, self.empirical_r_bounds, self.accumulator)
 
     def get_impression(self, alpha: float = 0.05) -> Dict[str, Tuple[float, float]]:
         result = {}
         # Does self.n > 0 guarantee that each slot has at least one example?
         if float(self.n) > 0:
-            for slot_id, estimator in self._impl.items():
-                result[slot_id] = clopper_pearson(
-                    float(estimator.n), float(self.n), alpha
-                )
+            lower, upper = clopper_pearson_arrays(
+                [float(estimator.n) for estimator in self._impl.values()],
+                float(self.n),
+                alpha,
+            )
+            result = dict(zip(self._impl.keys(), zip(lower.tolist(), upper.tolist())))
         return result
 
     def get_r_given_impression(
@@ -173,37 +245,77 @@ class Interval:
     ) -> Tuple[float, float]:
         return sum(
             self._impl.values(),
-            IntervalImpl(0, inf, self.rmin, self.rmax, self.empirical_r_bounds),
+            IntervalImpl(
+                0,
+                inf,
+                self.rmin,
+                self.rmax,
+                self.empirical_r_bounds,
+                self.accumulator,
+            ),
         ).get(alpha, atol)
 
-    def __add__(self, other: Interval) -> Interval:
-        assert not (
-            self.empirical_r_bounds ^ other.empirical_r_bounds
-        ), "Summation of estimators with various r bounds policy is prohibited"
-
-        if not self.empirical_r_bounds:
-            assert (
-                self.rmin == other.rmin
-            ), "Summation of estimators with various r bounds is prohibited"
-            assert (
-                self.rmax == other.rmax
-            ), "Summation of estimators with various r bounds is prohibited"
-        rmin = min(self.rmin, other.rmin)
-        rmax = max(self.rmax, other.rmax)
-        slot_ids = set(self._impl.keys()).union(set(other._impl.keys()))
-        result = Interval(
-            rmin=rmin, rmax=rmax, empirical_r_bounds=self.empirical_r_bounds
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(serialization.Kind.MULTISLOT_INTERVAL).pack(
+            _INTERVAL_STATE,
+            serialization.accumulator_code(self.accumulator),
+            self.empirical_r_bounds,
+            self.rmin,
+            self.rmax,
+            self.n,
+            len(self._impl),
         )
-        result.n = IncrementalFsum.merge(self.n, other.n)
-        default: Callable[[], IntervalImpl] = lambda: IntervalImpl(
-            wmin=0,
-            wmax=inf,
-            rmin=rmin,
-            rmax=rmax,
-            empirical_r_bounds=self.empirical_r_bounds,
+        for slot_id, impl in self._impl.items():
+            impl._write(writer.string(slot_id))
+        return writer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Interval:
+        reader = serialization.Reader(data, serialization.Kind.MULTISLOT_INTERVAL)
+        code, empirical_r_bounds, rmin, rmax, n, count = reader.unpack(_INTERVAL_STATE)
+        result = cls(
+            rmin, rmax, empirical_r_bounds, serialization.accumulator_type(code)
         )
-        for id in slot_ids:
-            result._impl[id] = self._impl.get(id, default()) + other._impl.get(
-                id, default()
-            )
+        result.n = n
+        for _ in range(count):
+            slot_id = reader.string()
+            result._impl[slot_id] = IntervalImpl._read(reader)
+        reader.end()
+        return result
+
+    def __add__(self, other: Interval) -> Interval:
+        return Interval.merge_all((self, other))
+
+    @classmethod
+    def merge_all(cls, intervals: Iterable[Interval]) -> Interval:
+        """Merges any number of intervals, slots are grouped in one pass over all of them"""
+        intervals = list(intervals)
+        assert intervals, "Error: nothing to merge"
+        first = intervals[0]
+        for other in intervals[1:]:
+            assert not (
+                first.empirical_r_bounds ^ other.empirical_r_bounds
+            ), "Summation of estimators with various r bounds policy is prohibited"
+
+            if not first.empirical_r_bounds:
+                assert (
+                    first.rmin == other.rmin
+                ), "Summation of estimators with various r bounds is prohibited"
+                assert (
+                    first.rmax == other.rmax
+                ), "Summation of estimators with various r bounds is prohibited"
+
+        result = cls(
+            rmin=min(x.rmin for x in intervals),
+            rmax=max(x.rmax for x in intervals),
+            empirical_r_bounds=first.empirical_r_bounds,
+            accumulator=first.accumulator,
+        )
+        result.n = sum(x.n for x in intervals)
+        slots: Dict[str, List[IntervalImpl]] = {}
+        for x in intervals:
+            for id, impl in x._impl.items():
+                slots.setdefault(id, []).append(impl)
+        for id, impls in slots.items():
+            result._impl[id] = IntervalImpl.merge_all(impls)
         return result
@@ -1,21 +1,35 @@
 from __future__ import annotations
 
+import struct
+from estimators import serialization
 from estimators.ccb import base
 from math import inf
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Tuple, Type
 from estimators.bandits.cressieread import EstimatorImpl, IntervalImpl
-from estimators.math import clopper_pearson
-from copy import deepcopy
+from estimators.checkpoint import Checkpointable
+from estimators.math import Accumulator, IncrementalFsum, clopper_pearson_arrays
 
+# accumulator code, wmin, wmax and number of slots, followed by the slots
+_ESTIMATOR_STATE = struct.Struct("<BddI")
+# accumulator code, empirical_r_bounds, wmin, wmax, rmin, rmax and number of slots
+_INTERVAL_STATE = struct.Struct("<B?ddddI")
 
-class Estimator(base.Estimator):
+
+class Estimator(base.Estimator, Checkpointable):
     wmin: float
     wmax: float
+    accumulator: Type[Accumulator]
     _impl: List[EstimatorImpl]
 
-    def __init__(self, wmin: float = 0, wmax: float = inf):
+    def __init__(
+        self,
+        wmin: float = 0,
+        wmax: float = inf,
+        accumulator: Type[Accumulator] = IncrementalFsum,
+    ):
         self.wmin = wmin
         self.wmax = wmax
+        self.accumulator = accumulator
         self._impl = []
 
     def add_example(
@@ -27,9 +41,16 @@ class Estimator(base.Estimator):
             w *= ws[i]
             if len(self._impl) <= i:
                 self._impl.append(
-                    EstimatorImpl(self.wmin ** (i + 1), self.wmax ** (i + 1))
+                    EstimatorImpl(
+                        self.wmin ** (i + 1), self.wmax ** (i + 1), self.accumulator
+                    )
                 )
             self._impl[i].add(w, rs[i])
+        if self._delta is not None:
+            self._delta.add_example(p_logs, rs, p_preds)
+
+    def _empty(self) -> Estimator:
+        return Estimator(self.wmin, self.wmax, self.accumulator)
 
     def get_impression(self) -> List[float]:
         total = float(self._impl[0].n) if any(self._impl) else 0
@@ -45,29 +66,62 @@ class Estimator(base.Estimator):
         ]
 
     def get_r_overall(self) -> Optional[float]:
-        return sum(self._impl, EstimatorImpl(0, inf)).get()
+        return sum(self._impl, EstimatorImpl(0, inf, self.accumulator)).get()
 
-    def __add__(self, other: Estimator) -> Estimator:
-        (large, small) = (
-            (self, other) if len(self._impl) >= len(other._impl) else (other, self)
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(
+            serialization.Kind.PDIS_CRESSIEREAD_ESTIMATOR
+        ).pack(
+            _ESTIMATOR_STATE,
+            serialization.accumulator_code(self.accumulator),
+            self.wmin,
+            self.wmax,
+            len(self._impl),
         )
-        result = Estimator(
-            wmin=min(self.wmin, other.wmin), wmax=max(self.wmax, other.wmax)
+        for impl in self._impl:
+            impl._write(writer)
+        return writer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Estimator:
+        reader = serialization.Reader(
+            data, serialization.Kind.PDIS_CRESSIEREAD_ESTIMATOR
         )
-        for i in range(len(large._impl)):
-            result._impl.append(
-                large._impl[i] + small._impl[i]
-                if i < len(small._impl)
-                else deepcopy(large._impl[i])
-            )
+        code, wmin, wmax, count = reader.unpack(_ESTIMATOR_STATE)
+        result = cls(wmin, wmax, serialization.accumulator_type(code))
+        result._impl = [EstimatorImpl._read(reader) for _ in range(count)]
+        reader.end()
+        return result
+
+    def __add__(self, other: Estimator) -> Estimator:
+        return Estimator.merge_all((self, other))
+
+    @classmethod
+    def merge_all(cls, estimators: Iterable[Estimator]) -> Estimator:
+        """Merges any number of estimators, slots are grouped in one pass over all of them"""
+        estimators = list(estimators)
+        assert estimators, "Error: nothing to merge"
+        result = cls(
+            wmin=min(x.wmin for x in estimators),
+            wmax=max(x.wmax for x in estimators),
+            accumulator=estimators[0].accumulator,
+        )
+        slots: List[List[EstimatorImpl]] = []
+        for x in estimators:
+            for i, impl in enumerate(x._impl):
+                if len(slots) <= i:
+                    slots.append([])
+                slots[i].append(impl)
+        result._impl = [EstimatorImpl.merge_all(impls) for impls in slots]
         return result
 
 
-class Interval(base.Interval):
+class Interval(base.Interval, Checkpointable):
     wmin: float
     wmax: float
     rmin: float
     rmax: float
+    accumulator: Type[Accumulator]
     _impl: List[IntervalImpl]
 
     def __init__(
@@ -77,11 +131,13 @@ class Interval(base.Interval):
         rmin: float = 0,
         rmax: float = 1,
         empirical_r_bounds: bool = False,
+        accumulator: Type[Accumulator] = IncrementalFsum,
     ):
         self.wmin = wmin
         self.wmax = wmax
         self.rmin = rmin
         self.rmax = rmax
+        self.accumulator = accumulator
         self._impl = []
         self.empirical_r_bounds = empirical_r_bounds
 
@@ -105,13 +161,30 @@ class Interval(base.Interval):
                         self.rmin,
                         self.rmax,
                         self.empirical_r_bounds,
+                        self.accumulator,
                     )
                 )
             self._impl[i].add(w, rs[i], p_drop, n_drop)
+        if self._delta is not None:
+            self._delta.add_example(p_logs, rs, p_preds, p_drop, n_drop)
+
+    def _empty(self) -> Interval:
+        return Interval(
+            self.wmin,
+            self.wmax,
+            self.rmin,
+            self.rmax,
+            self.empirical_r_bounds,
+            self.accumulator,
+        )
 
     def get_impression(self, alpha: float = 0.05) -> List[Tuple[float, float]]:
-        total = float(self._impl[0].n) if any(self._impl) else 0
-        return [clopper_pearson(float(e.n), total, alpha) for e in self._impl]
+        if not self._impl:
+            return []
+        lower, upper = clopper_pearson_arrays(
+            [float(e.n) for e in self._impl], float(self._impl[0].n), alpha
+        )
+        return list(zip(lower.tolist(), upper.tolist()))
 
     def get_r_given_impression(self, alpha: float = 0.05) -> List[Tuple[float, float]]:
         return [e.get(alpha) for e in self._impl]
@@ -127,36 +200,88 @@ class Interval(base.Interval):
     def get_r_overall(self, alpha: float = 0.05) -> Tuple[float, float]:
         return sum(
             self._impl,
-            IntervalImpl(0, inf, self.rmin, self.rmax, self.empirical_r_bounds),
+            IntervalImpl(
+                0,
+                inf,
+                self.rmin,
+                self.rmax,
+                self.empirical_r_bounds,
+                self.accumulator,
+            ),
         ).get(alpha)
 
-    def __add__(self, other: Interval) -> Interval:
-        assert not (
-            self.empirical_r_bounds ^ other.empirical_r_bounds
-        ), "Summation of estimators with various r bounds policy is prohibited"
-
-        if not self.empirical_r_bounds:
-            assert (
-                self.rmin == other.rmin
-            ), "Summation of estimators with various r bounds is prohibited"
-            assert (
-                self.rmax == other.rmax
-            ), "Summation of estimators with various r bounds is prohibited"
-
-        (large, small) = (
-            (self, other) if len(self._impl) >= len(other._impl) else (other, self)
+    def to_bytes(self) -> bytes:
+        writer = serialization.Writer(
+            serialization.Kind.PDIS_CRESSIEREAD_INTERVAL
+        ).pack(
+            _INTERVAL_STATE,
+            serialization.accumulator_code(self.accumulator),
+            self.empirical_r_bounds,
+            self.wmin,
+            self.wmax,
+            self.rmin,
+            self.rmax,
+            len(self._impl),
+        )
+        for impl in self._impl:
+            impl._write(writer)
+        return writer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Interval:
+        reader = serialization.Reader(
+            data, serialization.Kind.PDIS_CRESSIEREAD_INTERVAL
         )
-        result = Interval(
-            wmin=min(self.wmin, other.wmin),
-            wmax=max(self.wmax, other.wmax),
-            rmin=min(self.rmin, other.rmin),
-            rmax=max(self.rmax, other.rmax),
-            empirical_r_bounds=self.empirical_r_bounds,
+        code, empirical_r_bounds, wmin, wmax, rmin, rmax, count = reader.unpack(
+            _INTERVAL_STATE
         )
-        for i in range(len(large._impl)):
-            result._impl.append(
-                large._impl[i] + small._impl[i]
-                if i < len(small._impl)
-                else deepcopy(large._impl[i])
-            )
+        result = cls(
+            wmin,
+            wmax,
+            rmin,
+            rmax,
+            empirical_r_bounds,
+            serialization.accumulator_type(code),
+        )
+        result._impl = [IntervalImpl._read(reader) for _ in range(count)]
+        reader.end()
+        return result
+
+    def __add__(self, other: Interval) -> Interval:
+        return Interval.merge_all((self, other))
+
+    @classmethod
+    def merge_all(cls, intervals: Iterable[Interval]) -> Interval:
+        """Merges any number of intervals, slots are grouped in one pass over all of them"""
+        intervals = list(intervals)
+        assert intervals, "Error: nothing to merge"
+        first = intervals[0]
+        for other in intervals[1:]:
+            assert not (
+                first.empirical_r_bounds ^ other.empirical_r_bounds
+            ), "Summation of estimators with various r bounds policy is prohibited"
+
+            if not first.empirical_r_bounds:
+                assert (
+                    first.rmin == other.rmin
+                ), "Summation of estimators with various r bounds is prohibited"
+                assert (
+                    first.rmax == other.rmax
+                ), "Summation of estimators with various r bounds is prohibited"
+
+        result = cls(
+            wmin=min(x.wmin for x in intervals),
+            wmax=max(x.wmax for x in intervals),
+            rmin=min(x.rmin for x in intervals),
+            rmax=max(x.rmax for x in intervals),
+            empirical_r_bounds=first.empirical_r_bounds,
+            accumulator=first.accumulator,
+        )
+        slots: List[List[IntervalImpl]] = []
+        for x in intervals:
+            for i, impl in enumerate(x._impl):
+                if len(slots) <= i:
+                    slots.append([])
+                slots[i].append(impl)
+        result._impl = [IntervalImpl.merge_all(impls) for impls in slots]
         return result
@@ -0,0 +1,50 @@
+""" Increments of estimator state since a checkpoint """
+
+from __future__ import annotations
+
+from abc import abstractmethod
+from itertools import count
+from typing import Any, Optional, Tuple, TypeVar
+
+C = TypeVar("C", bound="Checkpointable")
+
+_tokens = count(1)
+
+
+class Checkpointable:
+    """Mixin of mergeable estimators that can ship only the examples added since the last sync.
+
+    checkpoint() starts an empty estimator with the same configuration that receives every
+    example added afterwards. delta_since() hands it over and starts the next checkpoint at
+    once, so every example ends up in exactly one delta. The delta is a regular estimator,
+    so the receiving side merges it with +:
+
+        token = estimator.checkpoint()
+        ...
+        delta, token = estimator.delta_since(token)
+
+    While a checkpoint is active every example is added twice, to the estimator and to the
+    delta, which doubles the cost of add_example and add_examples.
+    """
+
+    _delta: Any = None
+    _token: Optional[int] = None
+
+    @abstractmethod
+    def _empty(self: C) -> C:
+        """Estimator without examples and with the configuration of this one"""
+
+    def checkpoint(self) -> int:
+        """Starts recording a delta, the one of a previous checkpoint is discarded"""
+        self._token = next(_tokens)
+        self._delta = self._empty()
+        return self._token
+
+    def delta_since(self: C, token: int) -> Tuple[C, int]:
+        """Examples added since token, and the token of the checkpoint started instead"""
+        if self._token is None or token != self._token:
+            raise ValueError(
+                f"Error: checkpoint {token} is stale or unknown, the latest is {self._token}"
+            )
+        result: C = self._delta
+        return result, self.checkpoint()
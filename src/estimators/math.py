@@ -1,12 +1,123 @@
 from __future__ import annotations
 
-from scipy.stats import beta  # type: ignore
-from typing import List, Tuple
+import typing
+import numpy as np
+import numpy.typing as npt
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from math import fsum, inf, isfinite, nan
+from statistics import NormalDist
+from typing import (
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
+A = TypeVar("A", bound="Accumulator")
 
-class IncrementalFsum:
+
+class Accumulator(ABC):
+    """Interface of the running sums kept by the estimators.
+
+    Implementations trade throughput for exactness: FloatSum is a plain float, NeumaierSum
+    keeps a compensated pair of floats and IncrementalFsum is exact. Accumulators of any
+    kind can be merged into each other.
+    """
+
+    __slots__ = ()
+
+    @abstractmethod
+    def __iadd__(self, x: float) -> Accumulator:
+        """Adds a single value"""
+
+    @abstractmethod
+    def add_many(self, values: npt.ArrayLike) -> Accumulator:
+        """Adds all values of a one dimensional array"""
+
+    @abstractmethod
+    def components(self) -> List[float]:
+        """Floats whose exact sum is the accumulated value"""
+
+    @abstractmethod
+    def __float__(self) -> float:
+        """Accumulated value"""
+
+    @classmethod
+    def merge(cls: Type[A], *args: Accumulator) -> A:
+        return cls.merge_all(args)
+
+    @classmethod
+    def merge_all(cls: Type[A], accumulators: Iterable[Accumulator]) -> A:
+        """Merges any number of accumulators into a new one"""
+        result = cls()
+        for x in accumulators:
+            for y in x.components():
+                result.__iadd__(y)
+        return result
+
+
+class FloatSum(Accumulator):
+    """Plain floating point summation"""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def __iadd__(self, x: float) -> FloatSum:
+        self.value += x
+        return self
+
+    def add_many(self, values: npt.ArrayLike) -> FloatSum:
+        self.value += float(np.sum(values))
+        return self
+
+    def components(self) -> List[float]:
+        return [self.value]
+
+    def __float__(self) -> float:
+        return float(self.value)
+
+
+class NeumaierSum(Accumulator):
+    """Compensated summation https://en.wikipedia.org/wiki/Kahan_summation_algorithm#Further_enhancements"""
+
+    __slots__ = ("sum", "compensation")
+
+    def __init__(self) -> None:
+        self.sum = 0.0
+        self.compensation = 0.0
+
+    def __iadd__(self, x: float) -> NeumaierSum:
+        t = self.sum + x
+        if abs(self.sum) >= abs(x):
+            self.compensation += (self.sum - t) + x
+        else:
+            self.compensation += (x - t) + self.sum
+        self.sum = t
+        return self
+
+    def add_many(self, values: npt.ArrayLike) -> NeumaierSum:
+        self += blocked_fsum(np.asarray(values, dtype=np.float64))
+        return self
+
+    def components(self) -> List[float]:
+        return [self.compensation, self.sum]
+
+    def __float__(self) -> float:
+        return float(self.sum + self.compensation)
+
+
+class IncrementalFsum(Accumulator):
     """Incremental version of https://en.wikipedia.org/wiki/Kahan_summation_algorithm"""
 
+    __slots__ = ("partials",)
+
     def __init__(self) -> None:
         self.partials: List[float] = []
 
@@ -21,28 +132,234 @@ class IncrementalFsum:
                 self.partials[i] = lo
                 i += 1
             x = hi
+        if not isfinite(x):
+            # as in math.fsum, the partials of an infinite or nan sum are meaningless
+            i = 0
         self.partials[i:] = [x]
         return self
 
-    @staticmethod
-    def merge(*args: IncrementalFsum) -> IncrementalFsum:
-        result = IncrementalFsum()
-        for x in args:
-            for y in x.partials:
-                result += y
+    def add_many(self, values: npt.ArrayLike) -> IncrementalFsum:
+        self._assign(
+            self.partials + np.asarray(values, dtype=np.float64).ravel().tolist()
+        )
+        return self
+
+    def _assign(self, terms: List[float]) -> None:
+        """Sets the state to the exact sum of terms as non-overlapping partials.
+
+        math.fsum rounds the exact sum correctly, so summing the terms again with the negated
+        partials found so far yields the next partial, until nothing is left.
+        """
+        partials: List[float] = []
+        count = len(terms)
+        try:
+            x = fsum(terms)
+            while x:
+                partials.append(x)
+                if not isfinite(x):
+                    break
+                terms.append(-x)
+                x = fsum(terms)
+        except (OverflowError, ValueError):
+            # fsum raises on overflow and on inf - inf, where __iadd__ yields inf or nan
+            self.partials = []
+            for term in terms[:count]:
+                self += term
+            return
+        # smallest first, the order kept by __iadd__
+        partials.reverse()
+        self.partials = partials
+
+    @classmethod
+    def merge_all(
+        cls: Type[IncrementalFsum], accumulators: Iterable[Accumulator]
+    ) -> IncrementalFsum:
+        """Merges any number of accumulators with a single fsum over all of their components"""
+        result = cls()
+        result._assign([y for x in accumulators for y in x.components()])
         return result
 
+    def components(self) -> List[float]:
+        return self.partials
+
     def __float__(self) -> float:
-        return sum(self.partials, 0.0)
+        return float(sum(self.partials, 0.0))
+
+
+def blocked_fsum(values: npt.NDArray[np.float64], block_size: int = 1024) -> float:
+    """Compensated sum of an array: pairwise NumPy sums of fixed-size blocks are combined
+    exactly with math.fsum, so the rounding error does not grow with the length of the array.
+    """
+    values = values.ravel()
+    whole = len(values) - len(values) % block_size
+    blocks = np.sum(values[:whole].reshape(-1, block_size), axis=1).tolist()
+    blocks.append(float(np.sum(values[whole:])))
+    return fsum(blocks)
+
+
+class QuantileCache:
+    """Least recently used cache of distribution quantiles keyed by (q, *parameters).
+
+    The quantiles missing from the cache are computed with one vectorized call.
+    """
+
+    def __init__(
+        self, quantile: Callable[..., npt.ArrayLike], maxsize: int = 1024
+    ) -> None:
+        self.quantile = quantile
+        self.maxsize = maxsize
+        self._cache: OrderedDict[Tuple[float, ...], float] = OrderedDict()
+
+    def __call__(self, qs: Sequence[float], *parameters: float) -> List[float]:
+        return self._get(
+            [(q, *parameters) for q in qs],
+            lambda missing: self.quantile(
+                np.array([key[0] for key in missing]), *parameters
+            ),
+        )
+
+    def many(self, q: float, *parameters: npt.ArrayLike) -> List[float]:
+        """Quantile q for each set of parameters, given as arrays of the same length"""
+        return self._get(
+            [(q, *p) for p in zip(*(np.asarray(x).tolist() for x in parameters))],
+            lambda missing: self.quantile(*np.array(missing).T),
+        )
+
+    def _get(
+        self,
+        keys: List[Tuple[float, ...]],
+        compute: Callable[[List[Tuple[float, ...]]], npt.ArrayLike],
+    ) -> List[float]:
+        missing = [key for key in dict.fromkeys(keys) if key not in self._cache]
+        if missing:
+            for key, value in zip(missing, np.atleast_1d(compute(missing)).tolist()):
+                self._cache[key] = value
+
+        result = []
+        for key in keys:
+            self._cache.move_to_end(key)
+            result.append(self._cache[key])
+
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return result
+
+
+def beta_ppf(
+    q: npt.ArrayLike, a: npt.ArrayLike, b: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    # scipy takes hundreds of milliseconds to import, so it is only loaded on first use
+    from scipy.stats import beta  # type: ignore
+
+    return typing.cast(npt.NDArray[np.float64], beta.ppf(q, a, b))
+
+
+def _normal_inv_cdf(q: float) -> float:
+    # NormalDist raises outside of (0, 1), scipy returns the limits and nan
+    if 0 < q < 1:
+        return NormalDist().inv_cdf(q)
+    return -inf if q == 0 else inf if q == 1 else nan
+
+
+def norm_ppf(q: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    """Quantiles of the standard normal distribution, falls back to statistics.NormalDist
+    when scipy is not installed
+    """
+    try:
+        from scipy.stats import norm  # type: ignore[import, unused-ignore]
+    except ImportError:
+        inv_cdf = np.frompyfunc(_normal_inv_cdf, 1, 1)
+        with np.errstate(invalid="ignore"):
+            return np.asarray(inv_cdf(q), dtype=np.float64)
+    return typing.cast(npt.NDArray[np.float64], norm.ppf(q))
+
+
+# shared by the scalar and array versions of clopper_pearson, which see many (a, b) pairs
+_beta_ppf = QuantileCache(beta_ppf, maxsize=1 << 14)
+
+
+def clopper_pearson_many(
+    successes: float, n: float, alphas: Sequence[float]
+) -> List[Tuple[float, float]]:
+    """clopper_pearson for each of the alphas"""
+    lower_bounds = (
+        _beta_ppf([alpha / 2 for alpha in alphas], successes, n - successes + 1)
+        if successes > 0
+        else [0.0] * len(alphas)
+    )
+    upper_bounds = (
+        _beta_ppf([1 - alpha / 2 for alpha in alphas], successes + 1, n - successes)
+        if successes < n
+        else [1.0] * len(alphas)
+    )
+    return list(zip(lower_bounds, upper_bounds))
 
 
 def clopper_pearson(
     successes: float, n: float, alpha: float = 0.05
 ) -> Tuple[float, float]:
-    lower_bound = (
-        beta.ppf(alpha / 2, successes, n - successes + 1) if successes > 0 else 0
+    return clopper_pearson_many(successes, n, [alpha])[0]
+
+
+def clopper_pearson_arrays(
+    successes: npt.ArrayLike, n: npt.ArrayLike, alpha: float = 0.05
+) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """clopper_pearson over arrays of successes and n
+
+    Every distinct (successes, n) pair is computed once, through the same quantile cache as
+    clopper_pearson.
+
+    Returns:
+        arrays of lower and upper bounds
+    """
+    successes, n = as_columns(successes, n)
+    pairs, inverse = np.unique(
+        np.stack((successes, n), axis=1), axis=0, return_inverse=True
+    )
+    s, m = pairs.T
+    lower = np.zeros(len(pairs))
+    upper = np.ones(len(pairs))
+    positive = s > 0
+    lower[positive] = _beta_ppf.many(
+        alpha / 2, s[positive], m[positive] - s[positive] + 1
+    )
+    incomplete = s < m
+    upper[incomplete] = _beta_ppf.many(
+        1 - alpha / 2, s[incomplete] + 1, m[incomplete] - s[incomplete]
     )
-    upper_bound = (
-        beta.ppf(1 - alpha / 2, successes + 1, n - successes) if successes < n else 1
+
+    inverse = inverse.reshape(-1)
+    return (lower[inverse], upper[inverse])
+
+
+def as_columns(*values: npt.ArrayLike) -> List[npt.NDArray[np.float64]]:
+    """Converts per-example values into float64 columns of the same length.
+
+    Arrays that are already float64 (including slices and memory-mapped arrays)
+    are returned as views without copying; scalars are broadcast to the common length.
+    """
+    columns: List[npt.NDArray[np.float64]] = list(
+        np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in values)
+        )
     )
-    return (lower_bound, upper_bound)
+    if columns and columns[0].ndim != 1:
+        raise ValueError(
+            f"Error: expected one-dimensional arrays, found shape {columns[0].shape}"
+        )
+    return columns
+
+
+def dropped_events(
+    p_drop: npt.NDArray[np.float64], n_drop: Optional[npt.ArrayLike] = None
+) -> npt.NDArray[np.float64]:
+    """Amount of dropped events per example.
+
+    Uses n_drop where it is present and falls back to p_drop / (1 - p_drop) where it is
+    missing, i.e. n_drop is None or the corresponding entry of a masked array is masked.
+    """
+    expected = p_drop / (1 - p_drop)
+    if n_drop is None:
+        return expected
+    counts = np.ma.masked_array(n_drop, dtype=np.float64)
+    return np.where(np.ma.getmaskarray(counts), expected, counts.data)
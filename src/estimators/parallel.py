@@ -0,0 +1,151 @@
+""" Sharded evaluation of logs in a process pool """
+
+from __future__ import annotations
+
+import os
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+if typing.TYPE_CHECKING:
+    # typing.Protocol is only available from python 3.8
+    from typing import Protocol
+
+    class _Summable(Protocol):
+        def __add__(self, other: Any) -> Any: ...
+
+    S = TypeVar("S", bound=_Summable)
+else:
+    S = TypeVar("S")
+
+
+class Shard(NamedTuple):
+    """Lines of path starting in the byte range [start, end), end is None for the whole file"""
+
+    path: str
+    start: int
+    end: Optional[int]
+
+
+def _line_boundary(f: Any, offset: int) -> int:
+    """Offset of the first line starting at or after offset"""
+    if offset == 0:
+        return 0
+    f.seek(offset - 1)
+    f.readline()
+    return int(f.tell())
+
+
+def split(paths: Union[str, Sequence[str]], shard_size: int) -> List[Shard]:
+    """Splits files into shards of about shard_size bytes at line boundaries.
+
+    Compressed files cannot be read from an arbitrary offset, so .gz files are single shards.
+    """
+    assert shard_size > 0, "Error: shard_size must be positive"
+    if isinstance(paths, str):
+        paths = [paths]
+
+    result: List[Shard] = []
+    for path in paths:
+        if path.endswith(".gz"):
+            result.append(Shard(path, 0, None))
+            continue
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            starts = {
+                _line_boundary(f, offset) for offset in range(0, size, shard_size)
+            }
+        # an empty file is a single empty shard, so that it still yields a result
+        boundaries = sorted(starts | {size}) if size > 0 else [0, 0]
+        result.extend(
+            Shard(path, start, end) for start, end in zip(boundaries, boundaries[1:])
+        )
+    return result
+
+
+def lines(shard: Shard) -> Iterator[bytes]:
+    """Lines of the shard, including line terminators"""
+    if shard.end is None:
+        import gzip
+
+        opener = gzip.open if shard.path.endswith(".gz") else open
+        with opener(shard.path, "rb") as f:
+            yield from f
+        return
+
+    with open(shard.path, "rb") as f:
+        f.seek(shard.start)
+        position = shard.start
+        while position < shard.end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+
+
+def tree_sum(items: Sequence[S]) -> S:
+    """Sums adjacent pairs level by level, so every item takes part in log2(n) additions"""
+    assert len(items) > 0, "Error: nothing to sum"
+    level = list(items)
+    while len(level) > 1:
+        paired = [a + b for a, b in zip(level[::2], level[1::2])]
+        if len(level) % 2 == 1:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+def _evaluate_shard(evaluate_lines: Callable[[Iterator[bytes]], S], shard: Shard) -> S:
+    return evaluate_lines(lines(shard))
+
+
+def evaluate(
+    paths: Union[str, Sequence[str]],
+    evaluate_lines: Callable[[Iterator[bytes]], S],
+    max_workers: Optional[int] = None,
+    shard_size: Optional[int] = None,
+) -> S:
+    """Evaluates logs shard by shard in a process pool and sums the results.
+
+    Args:
+            paths: log file or files, one example per line
+            evaluate_lines: picklable function that consumes the lines of a shard and returns
+                estimators, or any other object supporting +, e.g. an EstimatorSet. Results
+                are combined with merge_all when their class provides it, with tree_sum
+                otherwise
+            max_workers: number of processes, all cpus by default, 1 evaluates in this process
+            shard_size: approximate shard size in bytes, by default about four shards per
+                worker, between 1 MiB and 256 MiB
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if isinstance(paths, str):
+        paths = [paths]
+    if shard_size is None:
+        total = sum(os.path.getsize(path) for path in paths)
+        shard_size = max(1 << 20, min(1 << 28, total // (4 * max_workers)))
+
+    shards = split(paths, shard_size)
+    if max_workers == 1:
+        results = [_evaluate_shard(evaluate_lines, shard) for shard in shards]
+    else:
+        with ProcessPoolExecutor(max_workers) as executor:
+            results = list(
+                executor.map(_evaluate_shard, repeat(evaluate_lines), shards)
+            )
+
+    # estimators that provide merge_all combine all shards without intermediate results
+    merge_all = getattr(type(results[0]), "merge_all", None)
+    return typing.cast(S, merge_all(results)) if merge_all else tree_sum(results)
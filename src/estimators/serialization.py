@@ -0,0 +1,192 @@
+""" Versioned binary format of estimator state """
+
+# Every encoded state starts with an 8 byte header: magic, format version and the kind of
+# the estimator. The body is a fixed layout of little-endian fields, one float64 per running
+# sum, followed by packed arrays for estimators that keep examples (mle) or per-policy state.
+# Arrays are aligned to 8 bytes and decoded as read-only views of the input buffer.
+
+from __future__ import annotations
+
+import importlib
+import struct
+import numpy as np
+import numpy.typing as npt
+from enum import IntEnum
+from estimators.math import Accumulator, FloatSum, IncrementalFsum, NeumaierSum
+from typing import Any, Dict, List, Tuple, Type, Union
+
+MAGIC = b"VWES"
+VERSION = 1
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+_HEADER = struct.Struct("<4sHH")
+_LENGTH = struct.Struct("<I")
+_ACCUMULATORS: Tuple[Type[Accumulator], ...] = (FloatSum, NeumaierSum, IncrementalFsum)
+
+
+class Kind(IntEnum):
+    IPS = 1
+    SNIPS = 2
+    GAUSSIAN = 3
+    CLOPPER_PEARSON = 4
+    CRESSIEREAD_ESTIMATOR = 5
+    CRESSIEREAD_INTERVAL = 6
+    CS_INTERVAL = 7
+    CS_MERGEABLE_INTERVAL = 8
+    MLE = 9
+    MULTISLOT_ESTIMATOR = 10
+    MULTISLOT_INTERVAL = 11
+    PDIS_CRESSIEREAD_ESTIMATOR = 12
+    PDIS_CRESSIEREAD_INTERVAL = 13
+    SLATES_PSEUDO_INVERSE = 14
+    SLATES_GAUSSIAN = 15
+    ESTIMATOR_SET = 16
+    POLICY_BANK = 17
+    FIRST_SLOT_ESTIMATOR = 18
+    FIRST_SLOT_INTERVAL = 19
+
+
+# module and class decoding each kind, imported on first use
+_CLASSES: Dict[Kind, Tuple[str, str]] = {
+    Kind.IPS: ("estimators.bandits.ips", "Estimator"),
+    Kind.SNIPS: ("estimators.bandits.snips", "Estimator"),
+    Kind.GAUSSIAN: ("estimators.bandits.gaussian", "Interval"),
+    Kind.CLOPPER_PEARSON: ("estimators.bandits.clopper_pearson", "Interval"),
+    Kind.CRESSIEREAD_ESTIMATOR: ("estimators.bandits.cressieread", "Estimator"),
+    Kind.CRESSIEREAD_INTERVAL: ("estimators.bandits.cressieread", "Interval"),
+    Kind.CS_INTERVAL: ("estimators.bandits.cs", "Interval"),
+    Kind.CS_MERGEABLE_INTERVAL: ("estimators.bandits.cs", "MergeableInterval"),
+    Kind.MLE: ("estimators.bandits.mle", "Estimator"),
+    Kind.MULTISLOT_ESTIMATOR: ("estimators.ccb.multislot", "Estimator"),
+    Kind.MULTISLOT_INTERVAL: ("estimators.ccb.multislot", "Interval"),
+    Kind.PDIS_CRESSIEREAD_ESTIMATOR: ("estimators.ccb.pdis_cressieread", "Estimator"),
+    Kind.PDIS_CRESSIEREAD_INTERVAL: ("estimators.ccb.pdis_cressieread", "Interval"),
+    Kind.SLATES_PSEUDO_INVERSE: ("estimators.slates.pseudo_inverse", "Estimator"),
+    Kind.SLATES_GAUSSIAN: ("estimators.slates.gaussian", "Interval"),
+    Kind.ESTIMATOR_SET: ("estimators.bandits.estimator_set", "EstimatorSet"),
+    Kind.POLICY_BANK: ("estimators.bandits.policy_bank", "PolicyBank"),
+    Kind.FIRST_SLOT_ESTIMATOR: ("estimators.ccb.first_slot", "Estimator"),
+    Kind.FIRST_SLOT_INTERVAL: ("estimators.ccb.first_slot", "Interval"),
+}
+
+
+def accumulator_code(accumulator: Type[Accumulator]) -> int:
+    if accumulator not in _ACCUMULATORS:
+        raise ValueError(f"Error: {accumulator.__name__} cannot be serialized")
+    return _ACCUMULATORS.index(accumulator)
+
+
+def accumulator_type(code: int) -> Type[Accumulator]:
+    if code >= len(_ACCUMULATORS):
+        raise ValueError(f"Error: unknown accumulator code {code}")
+    return _ACCUMULATORS[code]
+
+
+def accumulated(accumulator: Type[Accumulator], value: float) -> Accumulator:
+    """Accumulator of the given type holding value"""
+    result = accumulator()
+    result += value
+    return result
+
+
+def kind_of(data: Buffer) -> Kind:
+    """Kind of the encoded state, only the header is checked"""
+    view = memoryview(data).cast("B")
+    if len(view) < _HEADER.size:
+        raise ValueError("Error: truncated estimator state")
+    magic, version, kind = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Error: not an estimator state")
+    if version != VERSION:
+        raise ValueError(f"Error: unsupported format version {version}")
+    if kind not in _CLASSES:
+        raise ValueError(f"Error: unknown estimator kind {kind}")
+    return Kind(kind)
+
+
+def from_bytes(data: Buffer) -> Any:
+    """Decodes a state of any kind into an instance of the class that encoded it"""
+    module, name = _CLASSES[kind_of(data)]
+    return getattr(importlib.import_module(module), name).from_bytes(data)
+
+
+class Writer:
+    def __init__(self, kind: Kind) -> None:
+        self._parts: List[Buffer] = [_HEADER.pack(MAGIC, VERSION, kind)]
+        self._size = _HEADER.size
+
+    def pack(self, layout: struct.Struct, *values: Any) -> Writer:
+        self._parts.append(layout.pack(*values))
+        self._size += layout.size
+        return self
+
+    def string(self, value: str) -> Writer:
+        encoded = value.encode()
+        return self.pack(_LENGTH, len(encoded)).raw(encoded)
+
+    def raw(self, value: Buffer) -> Writer:
+        self._parts.append(value)
+        self._size += len(value)
+        return self
+
+    def array(self, values: npt.ArrayLike, dtype: npt.DTypeLike = np.float64) -> Writer:
+        """Appends the values, the number of values is expected to be written before.
+
+        Contiguous little-endian arrays are not copied until getvalue, so they must not be
+        modified before.
+        """
+        padding = -self._size % 8
+        if padding:
+            self.raw(bytes(padding))
+        values = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+        return self.raw(values.data.cast("B"))
+
+    def getvalue(self) -> bytes:
+        """Every part is copied once, into the returned bytes"""
+        return b"".join(self._parts)
+
+
+class Reader:
+    def __init__(self, data: Buffer, kind: Kind) -> None:
+        self._view = memoryview(data).cast("B")
+        found = kind_of(self._view)
+        if found != kind:
+            raise ValueError(
+                f"Error: expected state of kind {kind.name}, found {found.name}"
+            )
+        self._offset = _HEADER.size
+
+    def unpack(self, layout: struct.Struct) -> Tuple[Any, ...]:
+        if self._offset + layout.size > len(self._view):
+            raise ValueError("Error: truncated estimator state")
+        values = layout.unpack_from(self._view, self._offset)
+        self._offset += layout.size
+        return values
+
+    def string(self) -> str:
+        (length,) = self.unpack(_LENGTH)
+        return bytes(self.raw(length)).decode()
+
+    def raw(self, count: int) -> memoryview:
+        """View of the next count bytes, nothing is copied"""
+        start, end = self._offset, self._offset + count
+        if end > len(self._view):
+            raise ValueError("Error: truncated estimator state")
+        self._offset = end
+        return self._view[start:end]
+
+    def array(self, count: int, dtype: npt.DTypeLike = np.float64) -> npt.NDArray[Any]:
+        """Read-only view of count values, nothing is copied"""
+        self._offset += -self._offset % 8
+        layout = np.dtype(dtype).newbyteorder("<")
+        if self._offset + count * layout.itemsize > len(self._view):
+            raise ValueError("Error: truncated estimator state")
+        result = np.frombuffer(self._view, layout, count, self._offset)
+        result.flags.writeable = False
+        self._offset += count * layout.itemsize
+        return result
+
+    def end(self) -> None:
+        if self._offset != len(self._view):
+            raise ValueError("Error: unexpected trailing bytes in estimator state")
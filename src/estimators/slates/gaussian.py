@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import struct
 import math
 from estimators.slates import base
-from scipy import stats  # type: ignore
-from typing import List, Optional, Tuple
+from estimators import serialization
+from estimators.math import norm_ppf
+from typing import Iterable, List, Optional, Tuple
+
+_STATE = struct.Struct("<ddd")
 
 
 class Interval(base.Interval):
@@ -45,7 +49,7 @@ class Interval(base.Interval):
         if self.examples_count <= 1:
             return (-math.inf, +math.inf)
 
-        z_gaussian_cdf = stats.norm.ppf(1 - alpha / 2)
+        z_gaussian_cdf = float(norm_ppf(1 - alpha / 2))
         variance = (
             self.weighted_reward_sq
             - self.weighted_reward * self.weighted_reward / self.examples_count
@@ -54,9 +58,40 @@ class Interval(base.Interval):
         ips = self.weighted_reward / self.examples_count
         return (ips - gauss_delta, ips + gauss_delta)
 
+    def to_bytes(self) -> bytes:
+        return (
+            serialization.Writer(serialization.Kind.SLATES_GAUSSIAN)
+            .pack(
+                _STATE,
+                self.examples_count,
+                self.weighted_reward,
+                self.weighted_reward_sq,
+            )
+            .getvalue()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> Interval:
+        reader = serialization.Reader(data, serialization.Kind.SLATES_GAUSSIAN)
+        result = cls()
+        result.examples_count, result.weighted_reward, result.weighted_reward_sq = (
+            reader.unpack(_STATE)
+        )
+        reader.end()
+        return result
+
     def __add__(self, other: Interval) -> Interval:
         result = Interval()
         result.examples_count = self.examples_count + other.examples_count
         result.weighted_reward = self.weighted_reward + other.weighted_reward
         result.weighted_reward_sq = self.weighted_reward_sq + other.weighted_reward_sq
         return result
+
+    @classmethod
+    def merge_all(cls, intervals: Iterable[Interval]) -> Interval:
+        result = cls()
+        for x in intervals:
+            result.examples_count += x.examples_count
+            result.weighted_reward += x.weighted_reward
+            result.weighted_reward_sq += x.weighted_reward_sq
+        return result
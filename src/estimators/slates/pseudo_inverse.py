@@ -1,5 +1,7 @@
+import struct
 from estimators.slates import base
-from typing import List, Optional
+from estimators import serialization
+from typing import Iterable, List, Optional
 
 # PseudoInverse estimator for slate recommendation. The following implements the
 # case for a Cartesian product when mu is a product distribution. This can be
@@ -7,6 +9,9 @@ from typing import List, Optional
 # https://arxiv.org/abs/1605.04812
 
 
+_STATE = struct.Struct("<dd")
+
+
 class Estimator(base.Estimator):
     examples_count: float
     weighted_reward: float
@@ -44,8 +49,31 @@ class Estimator(base.Estimator):
             return self.weighted_reward / self.examples_count
         return None
 
+    def to_bytes(self) -> bytes:
+        return (
+            serialization.Writer(serialization.Kind.SLATES_PSEUDO_INVERSE)
+            .pack(_STATE, self.examples_count, self.weighted_reward)
+            .getvalue()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: serialization.Buffer) -> "Estimator":
+        reader = serialization.Reader(data, serialization.Kind.SLATES_PSEUDO_INVERSE)
+        result = cls()
+        result.examples_count, result.weighted_reward = reader.unpack(_STATE)
+        reader.end()
+        return result
+
     def __add__(self, other: "Estimator") -> "Estimator":
         result = Estimator()
         result.examples_count = self.examples_count + other.examples_count
         result.weighted_reward = self.weighted_reward + other.weighted_reward
         return result
+
+    @classmethod
+    def merge_all(cls, estimators: Iterable["Estimator"]) -> "Estimator":
+        result = cls()
+        for x in estimators:
+            result.examples_count += x.examples_count
+            result.weighted_reward += x.weighted_reward
+        return result
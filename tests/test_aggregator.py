@@ -0,0 +1,154 @@
+import asyncio
+import socket
+import numpy as np
+import pytest
+from estimators.aggregator import Aggregator, Client
+from estimators.bandits import cressieread, ips
+from estimators.ccb import multislot
+
+
+def intervals(count):
+    rng = np.random.default_rng(0)
+    result = []
+    for _ in range(count):
+        interval = cressieread.Interval()
+        interval.add_examples(
+            rng.uniform(0.1, 1, 100), rng.choice([0, 1], 100), rng.uniform(0, 1, 100)
+        )
+        result.append(interval)
+    return result
+
+
+def slots(count):
+    result = []
+    for i in range(count):
+        estimator = multislot.Interval()
+        estimator.add_example([str(i % 3), "x"], [0.5, 0.5], [i % 2, 1], [1, 0.5])
+        result.append(estimator)
+    return result
+
+
+def test_tcp_pushes_from_many_workers_are_merged():
+    async def main():
+        pushed = intervals(30)
+        pushed_slots = slots(30)
+        async with Aggregator(max_pending=4) as aggregator:
+            host, port = await aggregator.start_tcp()
+
+            async def worker(i):
+                async with await Client.connect_tcp(host, port) as client:
+                    for interval in pushed[i::3]:
+                        await client.push("cressieread", interval)
+                    for estimator in pushed_slots[i::3]:
+                        await client.push("multislot", estimator.to_bytes())
+                    return await client.get("cressieread")
+
+            # each worker sees at least its own pushes
+            for result in await asyncio.gather(*(worker(i) for i in range(3))):
+                assert float(result._impl.n) >= 10 * 100
+
+            async with await Client.connect_tcp(host, port) as client:
+                merged = await client.get("cressieread")
+                merged_slots = await client.get("multislot")
+                assert await client.get("unknown") is None
+
+            assert aggregator.pushed == 60
+            assert aggregator.rejected == 0
+            return merged, merged_slots
+
+    merged, merged_slots = asyncio.run(main())
+    expected = cressieread.Interval.merge_all(intervals(30))
+    assert merged.get() == pytest.approx(expected.get())
+    expected_slots = multislot.Interval.merge_all(slots(30))
+    assert merged_slots.get_r() == pytest.approx(expected_slots.get_r())
+
+
+def test_queued_states_are_merged_together():
+    async def main():
+        async with Aggregator() as aggregator:
+            host, port = await aggregator.start_tcp()
+            async with await Client.connect_tcp(host, port) as client:
+                for _ in range(100):
+                    await client.push("ips", ips.Estimator())
+                await client.get("ips")
+            return aggregator.pushed, aggregator.merges
+
+    pushed, merges = asyncio.run(main())
+    assert pushed == 100
+    assert merges < pushed
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="no unix sockets")
+def test_unix_socket(tmp_path):
+    async def main():
+        async with Aggregator() as aggregator:
+            path = await aggregator.start_unix(str(tmp_path / "aggregator.sock"))
+            async with await Client.connect_unix(path) as client:
+                for interval in intervals(3):
+                    await client.push("cressieread", interval)
+                return await client.get("cressieread"), await aggregator.get(
+                    "cressieread"
+                )
+
+    remote, local = asyncio.run(main())
+    assert remote.get() == pytest.approx(local.get())
+    assert remote.get() == pytest.approx(
+        cressieread.Interval.merge_all(intervals(3)).get()
+    )
+
+
+def test_invalid_and_incompatible_states_are_rejected():
+    async def main():
+        async with Aggregator() as aggregator:
+            host, port = await aggregator.start_tcp()
+            async with await Client.connect_tcp(host, port) as client:
+                await client.push("cressieread", b"garbage")
+                with pytest.raises(ValueError):
+                    await client.get("cressieread")
+
+            async with await Client.connect_tcp(host, port) as client:
+                first = intervals(1)[0]
+                await client.push("cressieread", first)
+                await client.push("cressieread", ips.Estimator())
+                await client.push("cressieread", cressieread.Interval(rmax=2))
+                with pytest.raises(ValueError) as rejections:
+                    await client.get("ips")
+                assert len(str(rejections.value).splitlines()) == 2
+
+                # the connection stays open and the errors are reported once
+                merged = await client.get("cressieread")
+            return first, merged, aggregator.rejected
+
+    first, merged, rejected = asyncio.run(main())
+    assert rejected == 2
+    assert merged.get() == pytest.approx(first.get())
+
+
+def test_failed_merges_are_reported_and_merging_goes_on(monkeypatch):
+    add = Aggregator._add
+
+    def failing_add(self, name, pushed):
+        if name == "broken":
+            raise RuntimeError("broken merge")
+        add(self, name, pushed)
+
+    monkeypatch.setattr(Aggregator, "_add", failing_add)
+
+    async def main():
+        async with Aggregator() as aggregator:
+            host, port = await aggregator.start_tcp()
+            async with await Client.connect_tcp(host, port) as client:
+                await client.push("broken", ips.Estimator())
+                with pytest.raises(ValueError, match="broken merge"):
+                    await client.get("ips")
+
+                await client.push("ips", ips.Estimator())
+                assert await client.get("ips") is not None
+
+            await aggregator._queue.put(("broken", ips.Estimator(), None, None))
+            with pytest.raises(RuntimeError, match="broken merge"):
+                await aggregator.get("broken")
+            assert await aggregator.get("broken") is None
+            return aggregator.rejected
+
+    assert asyncio.run(main()) == 2
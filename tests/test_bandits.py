@@ -10,6 +10,7 @@ from estimators.bandits import clopper_pearson
 from estimators.bandits import cs
 from utils import Helper, Scenario, get_intervals
 
+from estimators.math import FloatSum, IncrementalFsum, NeumaierSum
 from math import inf
 
 import pytest
@@ -274,6 +275,7 @@ def test_summation_works():
     assert_summation_works(ips.Estimator, simulator)
     assert_summation_works(snips.Estimator, simulator)
     assert_summation_works(cressieread.Estimator, simulator)
+    assert_summation_works(mle.Estimator, simulator)
 
     assert_summation_works(gaussian.Interval, simulator)
     assert_summation_works(clopper_pearson.Interval, simulator)
@@ -415,3 +417,294 @@ def test_cats_baseline():
     baseline = cats_transformer.get_baseline1_prediction()
     ## unit range is 4, min_value is 1 so baseline action should be the centre of the firt unit range, starting off from min_value i.e. 3
     assert baseline == 3
+
+
+def assert_add_examples_matches_add_example(estimator, examples):
+    columns = {key: np.array([e[key] for e in examples]) for key in examples[0]}
+    if "n_drop" in columns:
+        columns["n_drop"] = np.ma.masked_invalid(columns["n_drop"])
+
+    expected = estimator()
+    for e in examples:
+        e = dict(e)
+        if "n_drop" in e and np.isnan(e["n_drop"]):
+            e["n_drop"] = None
+        expected.add_example(**e)
+
+    actual = estimator()
+    actual.add_examples(**columns)
+
+    if isinstance(expected.get(), float):
+        assert actual.get() == pytest.approx(expected.get())
+    else:
+        assert actual.get(0.1) == pytest.approx(expected.get(0.1))
+
+
+def test_add_examples_matches_add_example():
+    rng = np.random.default_rng(0)
+    examples = [
+        {
+            "p_log": rng.uniform(0.1, 1),
+            "r": rng.uniform(-1, 2),
+            "p_pred": rng.uniform(0, 1),
+            "p_drop": float(rng.choice([0, 0.1, 0.5])),
+            "n_drop": float(rng.choice([np.nan, 0, 3])),
+        }
+        for _ in range(500)
+    ]
+    point_examples = [
+        {key: e[key] for key in ("p_log", "r", "p_pred")} for e in examples
+    ]
+
+    assert_add_examples_matches_add_example(ips.Estimator, point_examples)
+    assert_add_examples_matches_add_example(snips.Estimator, point_examples)
+    assert_add_examples_matches_add_example(cressieread.Estimator, point_examples)
+    assert_add_examples_matches_add_example(gaussian.Interval, examples)
+    assert_add_examples_matches_add_example(
+        lambda: clopper_pearson.Interval(rmin=-1, rmax=2), examples
+    )
+    assert_add_examples_matches_add_example(
+        lambda: clopper_pearson.Interval(empirical_r_bounds=True), examples
+    )
+    assert_add_examples_matches_add_example(
+        lambda: cressieread.Interval(rmin=-1, rmax=2), examples
+    )
+    assert_add_examples_matches_add_example(
+        lambda: cressieread.Interval(empirical_r_bounds=True), examples
+    )
+    assert_add_examples_matches_add_example(cs.Interval, examples)
+    assert_add_examples_matches_add_example(
+        lambda: cs.Interval(empirical_r_bounds=True), examples
+    )
+
+
+def test_cs_add_examples_continues_stream():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 1000)
+    p_pred = rng.uniform(0, 1, 1000)
+    r = rng.uniform(0, 1, 1000)
+    n_drop = rng.choice([0, 2], 1000)
+
+    expected = cs.Interval()
+    for example in zip(p_log.tolist(), r.tolist(), p_pred.tolist(), n_drop.tolist()):
+        expected.add_example(*example[:3], n_drop=example[3])
+
+    actual = cs.Interval()
+    actual.add_example(p_log[0], r[0], p_pred[0], n_drop=n_drop[0])
+    actual.add_examples(p_log[1:600], r[1:600], p_pred[1:600], n_drop=n_drop[1:600])
+    actual.add_examples(p_log[600:], r[600:], p_pred[600:], n_drop=n_drop[600:])
+
+    assert actual._impl.t == expected._impl.t
+    assert actual.get() == pytest.approx(expected.get(), rel=1e-12)
+
+    with pytest.raises(ZeroDivisionError):
+        cs.Interval(rmin=1, rmax=1).add_examples([0.5], [1], [0.5])
+
+
+def test_cs_add_examples_matches_add_example_on_ill_conditioned_streams():
+    rng = np.random.default_rng(0)
+    n = 20000
+    p_log = 10.0 ** rng.uniform(-8, 0, n)
+    p_pred = rng.uniform(0, 1, n)
+    r = rng.choice([-1.0, 2.0], n) * 10.0 ** rng.uniform(-12, 0, n)
+
+    expected = cs.Interval(rmin=-1, rmax=2)
+    for example in zip(p_log.tolist(), r.tolist(), p_pred.tolist()):
+        expected.add_example(*example)
+    actual = cs.Interval(rmin=-1, rmax=2)
+    for chunk in np.array_split(np.arange(n), 7):
+        actual.add_examples(p_log[chunk], r[chunk], p_pred[chunk])
+
+    # the predictable sequences are accumulated in the same order on both paths
+    for name in ("sumwrxhatlow", "sumwxhatlow", "sumxhatlowsq", "sumxhathighsq"):
+        assert float(getattr(actual._impl, name)) == float(
+            getattr(expected._impl, name)
+        )
+    assert actual.get() == expected.get()
+
+
+def test_cs_trigamma():
+    import scipy.special as sc
+
+    for x in np.concatenate([np.linspace(0.01, 30, 301), np.logspace(1, 8, 20)]):
+        assert cs._trigamma(float(x)) == pytest.approx(sc.polygamma(1, x), rel=1e-14)
+
+
+def test_add_examples_validates_rewards_before_update():
+    for interval in (clopper_pearson.Interval(), cressieread.Interval()):
+        with pytest.raises(ValueError):
+            interval.add_examples([0.5, 0.5], [1, 2], [0.5, 0.5])
+        assert interval.get() == (0, 1)
+
+
+@pytest.mark.parametrize("accumulator", [FloatSum, NeumaierSum])
+def test_accumulator_tiers_match_exact_summation(accumulator):
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 1000)
+    p_pred = rng.uniform(0, 1, 1000)
+    r = rng.uniform(0, 1, 1000)
+
+    for estimator in (cressieread.Estimator, cs.Interval, cressieread.Interval):
+        exact, approximate = estimator(), estimator(accumulator=accumulator)
+        for example in zip(p_log.tolist(), r.tolist(), p_pred.tolist()):
+            exact.add_example(*example)
+            approximate.add_example(*example)
+        assert approximate.get() == pytest.approx(exact.get(), rel=1e-12)
+
+    first = cressieread.Interval(accumulator=accumulator)
+    second = cressieread.Interval(accumulator=accumulator)
+    first.add_examples(p_log[:500], r[:500], p_pred[:500])
+    second.add_examples(p_log[500:], r[500:], p_pred[500:])
+    merged = first + second
+    assert isinstance(merged._impl.sumw, accumulator)
+    assert merged.get() == pytest.approx(exact.get(), rel=1e-12)
+
+
+def test_cs_get_is_warm_started_and_memoized(monkeypatch):
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 20000)
+    p_pred = rng.uniform(0, 1, 20000) * p_log
+    r = rng.uniform(0, 1, 20000)
+
+    evaluations = []
+    logwealth = cs._logwealth
+    monkeypatch.setattr(
+        cs, "_logwealth", lambda **kwargs: evaluations.append(1) or logwealth(**kwargs)
+    )
+
+    warm = cs.Interval()
+    for i in range(0, 20000, 2000):
+        warm.add_examples(p_log[i : i + 2000], r[i : i + 2000], p_pred[i : i + 2000])
+        cold = cs.Interval()
+        cold.add_examples(p_log[: i + 2000], r[: i + 2000], p_pred[: i + 2000])
+
+        expected = cold.get()
+        del evaluations[:]
+        assert warm.get() == pytest.approx(expected, abs=1e-10)
+        assert 0 < len(evaluations) < 30
+
+        del evaluations[:]
+        assert warm.get() == warm.get()
+        assert len(evaluations) == 0
+
+
+def test_cs_get_many_matches_get():
+    rng = np.random.default_rng(0)
+    intervals = [cs.Interval(), cs.Interval(empirical_r_bounds=True)]
+    for i in range(50):
+        n = int(rng.integers(1, 200))
+        p_log = rng.uniform(0.1, 1, n)
+        interval = cs.Interval(rmin=-1, rmax=2, empirical_r_bounds=bool(i % 2))
+        interval.add_examples(
+            p_log, rng.uniform(-1, 2, n), rng.uniform(0, 1, n) * p_log
+        )
+        intervals.append(interval)
+
+    alphas = [0.05, 0.1, 0.2]
+    actual = cs.get_many(intervals, alphas)
+
+    assert actual.shape == (len(intervals), len(alphas), 2)
+    for interval, bounds in zip(intervals, actual):
+        for alpha, (lower, upper) in zip(alphas, bounds):
+            expected = interval.get(alpha)
+            assert lower == pytest.approx(expected[0], abs=1e-10)
+            assert upper == pytest.approx(expected[1], abs=1e-10)
+
+
+def test_cs_roots_not_found_within_maxiter_are_finished_with_brentq():
+    rng = np.random.default_rng(0)
+    t = rng.uniform(10, 1000, 20)
+    sumXt = t * rng.uniform(0.2, 0.8, 20)
+    v = t * rng.uniform(0.01, 0.2, 20)
+    alpha = np.full(20, 0.025)
+
+    expected = [cs._lblogwealth(*args, rho=1, alpha=0.025) for args in zip(t, sumXt, v)]
+    for maxiter in (0, 1, 100):
+        actual = cs._lblogwealth_many(t, sumXt, v, 1, alpha, maxiter=maxiter)
+        assert actual == pytest.approx(expected, abs=1e-10)
+
+
+def test_cs_mergeable_interval():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 4000)
+    p_pred = rng.uniform(0, 1, 4000) * p_log
+    r = rng.uniform(0, 1, 4000)
+
+    shards = [cs.MergeableInterval() for _ in range(4)]
+    for i, shard in enumerate(shards):
+        chunk = slice(i * 1000, (i + 1) * 1000)
+        shard.add_examples(p_log[chunk], r[chunk], p_pred[chunk])
+
+    merged = sum(shards[1:], shards[0])
+    assert len(merged._shards) == 4
+
+    lower, upper = merged.get(0.05)
+    for i in range(4):
+        single = cs.Interval()
+        chunk = slice(i * 1000, (i + 1) * 1000)
+        single.add_examples(p_log[chunk], r[chunk], p_pred[chunk])
+        assert lower >= single.get(0.05 / 4)[0] - 1e-10
+        assert upper <= single.get(0.05 / 4)[1] + 1e-10
+    assert lower <= float(np.mean(p_pred / p_log * r)) <= upper
+
+    merged.add_example(0.5, 1, 0.5)
+    assert shards[0]._shards[0].t == 1000
+    assert (cs.MergeableInterval() + cs.MergeableInterval()).get() == (0, 1)
+
+    with pytest.raises(NotImplementedError):
+        cs.Interval() + cs.Interval()
+
+
+def test_cs_mergeable_interval_of_disagreeing_shards():
+    shards = [cs.MergeableInterval() for _ in range(2)]
+    for shard, r in zip(shards, (0, 1)):
+        shard.add_examples(np.full(1000, 0.5), np.full(1000, r), np.full(1000, 0.5))
+    first, second = (shard.get(0.025) for shard in shards)
+    assert first[1] < second[0]
+
+    # no common value, the bounds of both shards are returned instead of an empty interval
+    assert (shards[0] + shards[1]).get(0.05) == pytest.approx((first[0], second[1]))
+
+
+def test_get_many_matches_get():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 500)
+    p_pred = rng.uniform(0, 1, 500) * p_log
+    r = rng.uniform(0, 1, 500)
+    alphas = [0.2, 0.1, 0.05, 0.01]
+
+    for interval in (
+        gaussian.Interval(),
+        clopper_pearson.Interval(),
+        cressieread.Interval(),
+        cs.Interval(),
+    ):
+        assert interval.get_many(alphas) == [interval.get(alpha) for alpha in alphas]
+        interval.add_examples(p_log, r, p_pred)
+        many = interval.get_many(alphas)
+        for alpha, bounds in zip(alphas, many):
+            assert bounds == pytest.approx(interval.get(alpha))
+        for wider, narrower in zip(many[1:], many[:-1]):
+            assert wider[0] <= narrower[0] and wider[1] >= narrower[1]
+
+
+def test_merge_all_matches_pairwise_summation():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 1000)
+    p_pred = rng.uniform(0, 1, 1000)
+    r = rng.uniform(0, 1, 1000)
+
+    for estimator in (
+        ips.Estimator,
+        snips.Estimator,
+        cressieread.Estimator,
+        gaussian.Interval,
+        clopper_pearson.Interval,
+        cressieread.Interval,
+    ):
+        shards = [estimator() for _ in range(10)]
+        for i, shard in enumerate(shards):
+            shard.add_examples(p_log[i::10], r[i::10], p_pred[i::10])
+
+        merged = estimator.merge_all(shards)
+        assert merged.get() == pytest.approx(sum(shards[1:], shards[0]).get())
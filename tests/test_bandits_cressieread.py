@@ -1,7 +1,64 @@
+import numpy as np
+import pytest
 from estimators.bandits import cressieread
+from math import inf
 
 
 def test_single_example():
     estimator = cressieread.Estimator()
     estimator.add_example(0.3, 1, 0.6)
     assert estimator.get() == 1.0
+
+
+def statistics(impls, names):
+    return [np.array([float(getattr(impl, name)) for impl in impls]) for name in names]
+
+
+def test_vectorized_finalization_matches_get():
+    rng = np.random.default_rng(0)
+    intervals, estimators = [], []
+    for i in range(300):
+        wmin, wmax = [(0, inf), (0.5, 5), (0, 20)][i % 3]
+        rmin, rmax = [(0, 1), (-1, 2)][i % 2]
+        interval = cressieread.IntervalImpl(wmin, wmax, rmin, rmax, False)
+        estimator = cressieread.EstimatorImpl(wmin, wmax)
+        n = int(rng.integers(0, 50))
+        w = rng.uniform(wmin, min(wmax, 4), n)
+        r = rng.uniform(rmin, rmax, n)
+        if i % 7 == 0:
+            r[:] = rmin
+        interval.add_many(w, r, np.zeros(n), np.zeros(n))
+        estimator.add_many(w, r)
+        intervals.append(interval)
+        estimators.append(estimator)
+
+    lower, upper = cressieread.bounds(
+        *statistics(
+            intervals,
+            ("n", "sumw", "sumwsq", "sumwr", "sumwsqr", "sumwsqrsq"),
+        ),
+        *statistics(intervals, ("wmin", "wmax", "rmin", "rmax")),
+        alpha=0.1,
+    )
+    for interval, bounds in zip(intervals, zip(lower, upper)):
+        # rounding can flip the atol branch of a bound
+        assert bounds == pytest.approx(interval.get(0.1), abs=1e-7)
+
+    estimates = cressieread.estimates(
+        *statistics(
+            estimators,
+            ("n", "sumw", "sumwsq", "sumwr", "sumwsqr", "sumr", "wmin", "wmax"),
+        )
+    )
+    for estimator, estimate in zip(estimators, estimates):
+        expected = estimator.get()
+        if expected is None:
+            assert np.isnan(estimate)
+        else:
+            assert estimate == pytest.approx(expected, rel=1e-12)
+
+
+def test_vectorized_bounds_without_data():
+    args = [0, 0, 0, 0, 0, 0, 0, inf, 0, 1]
+    assert cressieread.bounds(*args) == ([0], [1])
+    assert cressieread.bounds(*args, empirical_r_bounds=True) == ([-inf], [inf])
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+from estimators.math import FloatSum, NeumaierSum
+from estimators.bandits import (
+    clopper_pearson,
+    cressieread,
+    estimator_set,
+    gaussian,
+    ips,
+    snips,
+)
+
+
+def simulate(rng, n):
+    p_log = rng.uniform(0.1, 1, n)
+    p_pred = rng.uniform(0, 1, n)
+    r = rng.uniform(0, 1, n)
+    p_drop = rng.choice([0, 0.2], n)
+    return p_log, r, p_pred, p_drop
+
+
+def separate(p_log, r, p_pred, p_drop, empirical_r_bounds=False):
+    estimators = [ips.Estimator(), snips.Estimator(), cressieread.Estimator()]
+    intervals = [
+        gaussian.Interval(),
+        clopper_pearson.Interval(empirical_r_bounds=empirical_r_bounds),
+        cressieread.Interval(empirical_r_bounds=empirical_r_bounds),
+    ]
+    for estimator in estimators:
+        estimator.add_examples(p_log, r, p_pred)
+    for interval in intervals:
+        interval.add_examples(p_log, r, p_pred, p_drop=p_drop)
+    return estimators, intervals
+
+
+def assert_matches(views, estimators, intervals):
+    assert views.ips.get() == pytest.approx(estimators[0].get())
+    assert views.snips.get() == pytest.approx(estimators[1].get())
+    assert views.cressieread.get() == pytest.approx(estimators[2].get())
+    for alpha in (0.05, 0.1):
+        assert views.gaussian.get(alpha) == pytest.approx(intervals[0].get(alpha))
+        assert views.clopper_pearson.get(alpha) == pytest.approx(
+            intervals[1].get(alpha)
+        )
+        assert views.cressieread_interval.get(alpha) == pytest.approx(
+            intervals[2].get(alpha)
+        )
+
+
+@pytest.mark.parametrize("empirical_r_bounds", [False, True])
+def test_estimator_set_matches_estimators(empirical_r_bounds):
+    rng = np.random.default_rng(0)
+    p_log, r, p_pred, p_drop = simulate(rng, 1000)
+
+    views = estimator_set.EstimatorSet(empirical_r_bounds=empirical_r_bounds)
+    for i in range(100):
+        views.add_example(p_log[i], r[i], p_pred[i], p_drop[i])
+    views.add_examples(p_log[100:], r[100:], p_pred[100:], p_drop[100:])
+
+    assert_matches(views, *separate(p_log, r, p_pred, p_drop, empirical_r_bounds))
+
+
+def test_estimator_set_summation_works():
+    rng = np.random.default_rng(0)
+    p_log, r, p_pred, p_drop = simulate(rng, 1000)
+
+    first, second = estimator_set.EstimatorSet(), estimator_set.EstimatorSet()
+    first.add_examples(p_log[:300], r[:300], p_pred[:300], p_drop[:300])
+    second.add_examples(p_log[300:], r[300:], p_pred[300:], p_drop[300:])
+
+    assert_matches(first + second, *separate(p_log, r, p_pred, p_drop))
+
+
+def test_estimator_set_rejects_rewards_before_updating():
+    views = estimator_set.EstimatorSet()
+    views.add_example(0.5, 0.5, 0.5)
+    with pytest.raises(ValueError):
+        views.add_example(0.5, 2, 0.5)
+    with pytest.raises(ValueError):
+        views.add_examples([0.5, 0.5], [0.5, 2], [0.5, 0.5])
+    assert views.ips.get() == pytest.approx(0.5)
+    assert views.gaussian.get() == (-np.inf, np.inf)
+
+
+def test_estimator_set_keeps_drop_corrections_only_when_needed():
+    rng = np.random.default_rng(0)
+    p_log, r, p_pred, p_drop = simulate(rng, 1000)
+
+    views = estimator_set.EstimatorSet()
+    views.add_examples(p_log, r, p_pred)
+    assert views.dropped is None
+
+    interval = cressieread.Interval()
+    interval.add_examples(p_log[100:], r[100:], p_pred[100:], p_drop[100:])
+    for i in range(100):
+        views.add_example(p_log[i], r[i], p_pred[i], p_drop[i])
+        interval.add_example(p_log[i], r[i], p_pred[i], p_drop[i])
+    views.add_examples(p_log[100:], r[100:], p_pred[100:], p_drop[100:])
+    interval.add_examples(p_log, r, p_pred)
+
+    # the corrected sums are exact, not only close
+    shared, expected = views._interval(), interval._impl
+    for name in ("n", "sumw", "sumwsq", "sumwr", "sumwsqr", "sumwsqrsq"):
+        assert float(getattr(shared, name)) == float(getattr(expected, name))
+
+
+@pytest.mark.parametrize("accumulator", [FloatSum, NeumaierSum])
+def test_estimator_set_drop_corrections_do_not_cancel(accumulator):
+    rng = np.random.default_rng(0)
+    n = 10000
+    p_log = 10.0 ** rng.uniform(-6, 0, n)
+    p_pred = rng.uniform(0, 1, n)
+    r = rng.choice([-1.0, 1.0], n) * rng.uniform(0, 1, n)
+    p_drop = rng.choice([0, 1e-9, 0.5], n)
+
+    exact = estimator_set.EstimatorSet(rmin=-1, rmax=1)
+    approximate = estimator_set.EstimatorSet(rmin=-1, rmax=1, accumulator=accumulator)
+    for views in (exact, approximate):
+        views.add_examples(p_log[:5000], r[:5000], p_pred[:5000], p_drop[:5000])
+        for example in zip(p_log[5000:], r[5000:], p_pred[5000:], p_drop[5000:]):
+            views.add_example(*example)
+
+    # the error is relative to the sum of the magnitudes of the drop-corrected terms
+    w = p_pred / p_log / (1 - p_drop)
+    magnitudes = {
+        "sumw": w,
+        "sumwsq": w**2,
+        "sumwr": w * abs(r),
+        "sumwsqr": w**2 * abs(r),
+        "sumwsqrsq": (w * r) ** 2,
+    }
+    expected, actual = exact._interval(), approximate._interval()
+    for name, magnitude in magnitudes.items():
+        error = abs(float(getattr(actual, name)) - float(getattr(expected, name)))
+        assert error <= 1e-12 * np.sum(magnitude)
+    assert approximate.cressieread_interval.get() == pytest.approx(
+        exact.cressieread_interval.get(), rel=1e-9
+    )
@@ -1,3 +1,6 @@
+import numpy as np
+import pytest
+
 from estimators.bandits import ips
 
 
@@ -5,3 +8,34 @@ def test_single_example():
     estimator = ips.Estimator()
     estimator.add_example(0.3, 1, 0.6)
     assert estimator.get() == 2.0
+
+
+def test_add_examples_matches_add_example():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 1000)
+    r = rng.uniform(0, 1, 1000)
+    p_pred = rng.uniform(0, 1, 1000)
+
+    expected = ips.Estimator()
+    for example in zip(p_log, r, p_pred):
+        expected.add_example(*example)
+
+    actual = ips.Estimator()
+    actual.add_examples(p_log[:500], r[:500], p_pred[:500])
+    actual.add_examples(p_log[500:], r[500:], p_pred[500:])
+
+    assert actual.examples_count == expected.examples_count
+    assert actual.get() == pytest.approx(expected.get())
+
+
+def test_add_examples_strided_slices():
+    columns = np.array([[0.5, 1, 0.5], [0.25, 0, 1], [0.5, 1, 1], [0.2, 0, 0]])
+
+    expected = ips.Estimator()
+    for p_log, r, p_pred in columns[::2]:
+        expected.add_example(p_log, r, p_pred)
+
+    actual = ips.Estimator()
+    actual.add_examples(columns[::2, 0], columns[::2, 1], columns[::2, 2])
+
+    assert actual.get() == pytest.approx(expected.get())
@@ -1,7 +1,221 @@
+import numpy as np
+import pytest
+
 from estimators.bandits import mle
 
 
+def mle_get(p_log, r, p_pred):
+    estimator = mle.Estimator()
+    estimator.add_examples(p_log, r, p_pred)
+    return estimator.get()
+
+
 def test_single_example():
     estimator = mle.Estimator()
     estimator.add_example(0.3, 1, 0.6)
     assert estimator.get() == 1.0
+
+
+def test_add_examples_matches_add_example():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.05, 1, 5000)
+    r = rng.uniform(0, 1, 5000)
+    p_pred = rng.uniform(0, 1, 5000)
+
+    expected = mle.Estimator(wmax=20)
+    for example in zip(p_log.tolist(), r.tolist(), p_pred.tolist()):
+        expected.add_example(*example)
+
+    actual = mle.Estimator(wmax=20)
+    actual.add_examples(p_log[:10], r[:10], p_pred[:10])
+    actual.add_examples(p_log[10:], r[10:], p_pred[10:])
+
+    assert actual.data.size == expected.data.size == 5000
+    assert actual.get() == pytest.approx(expected.get())
+
+
+def test_storage_grows():
+    storage = mle.ArrayStorage(capacity=1)
+    for i in range(100):
+        storage.append(1, i, -i)
+    storage.extend(np.ones(3), np.zeros(3), np.zeros(3))
+
+    c, w, r = storage.columns()
+    assert storage.size == 103
+    assert list(w[:100]) == list(range(100))
+    assert list(r[:100]) == [-i for i in range(100)]
+    assert c.sum() == 103
+
+
+def test_deduplicate_gives_same_estimate():
+    rng = np.random.default_rng(0)
+    p_log = rng.choice([0.1, 0.25, 0.5], 5000)
+    r = rng.choice([0.0, 1.0], 5000)
+    p_pred = rng.choice([0.0, 1.0], 5000)
+
+    expected = mle.Estimator()
+    expected.add_examples(p_log, r, p_pred)
+
+    actual = mle.Estimator(deduplicate=True)
+    actual.add_examples(p_log[:2500], r[:2500], p_pred[:2500])
+    for example in zip(
+        p_log[2500:].tolist(), r[2500:].tolist(), p_pred[2500:].tolist()
+    ):
+        actual.add_example(*example)
+
+    assert actual.data.size <= 12
+    assert actual.data.columns()[0].sum() == 5000
+    assert actual.get() == pytest.approx(expected.get(), rel=1e-12)
+
+
+def test_deduplicate_single_pair():
+    expected = mle.Estimator()
+    actual = mle.Estimator(deduplicate=True)
+    for _ in range(10):
+        expected.add_example(0.5, 1, 0.25)
+        actual.add_example(0.5, 1, 0.25)
+
+    assert actual.data.size == 1
+    assert actual.get() == pytest.approx(expected.get(), rel=1e-12)
+
+
+def test_quantization_error_is_bounded():
+    rng = np.random.default_rng(0)
+    for rel_tol in (1e-3, 1e-2, 1e-1):
+        p_log = rng.uniform(0.01, 1, 20000)
+        p_pred = rng.uniform(0, 1, 20000)
+        r = rng.uniform(0, 1, 20000)
+
+        exact = mle.Estimator()
+        exact.add_examples(p_log, r, p_pred)
+
+        sketch = mle.Estimator(quantization=rel_tol)
+        sketch.add_examples(p_log[:100], r[:100], p_pred[:100])
+        for example in zip(p_log[100:200], r[100:200], p_pred[100:200]):
+            sketch.add_example(*example)
+        sketch.add_examples(p_log[200:], r[200:], p_pred[200:])
+
+        max_buckets = np.log(p_pred.max() / p_pred.min() * 100) / np.log1p(rel_tol) + 2
+        assert sketch.data.size <= max_buckets
+        assert abs(sketch.get() - exact.get()) <= 2 * rel_tol
+
+
+def test_quantization_memory_is_constant():
+    sketch = mle.Estimator(quantization=0.01)
+    for _ in range(10):
+        sketch.add_examples([0.5, 0.25, 1], [1, 0, 1], [0.5, 0.5, 0])
+    assert sketch.data.size == 3
+    assert sketch.get() == pytest.approx(
+        mle_get([0.5, 0.25, 1] * 10, [1, 0, 1] * 10, [0.5, 0.5, 0] * 10)
+    )
+
+
+def test_summation_matches_single_estimator():
+    rng = np.random.default_rng(0)
+    p_log = rng.choice([0.1, 0.25, 0.5], 3000)
+    r = rng.uniform(0, 1, 3000)
+    p_pred = rng.uniform(0, 1, 3000)
+
+    for options in ({}, {"deduplicate": True}, {"quantization": 0.01}):
+        expected = mle.Estimator(wmax=200, **options)
+        expected.add_examples(p_log, r, p_pred)
+
+        first = mle.Estimator(wmax=100, **options)
+        second = mle.Estimator(wmax=200, **options)
+        first.add_examples(p_log[:1000], r[:1000], p_pred[:1000])
+        second.add_examples(p_log[1000:], r[1000:], p_pred[1000:])
+        merged = first + second
+
+        assert merged.wmax == 200
+        assert merged.data.size == expected.data.size
+        assert merged.get() == pytest.approx(expected.get(), rel=1e-12)
+        assert (first + mle.Estimator(**options)).get() == pytest.approx(first.get())
+
+
+def test_warm_started_get_matches_cold_start():
+    rng = np.random.default_rng(0)
+    live = mle.Estimator()
+    for _ in range(20):
+        p_log = rng.uniform(0.05, 1, 500)
+        r = rng.uniform(0, 1, 500)
+        p_pred = rng.uniform(0, 1, 500)
+        live.add_examples(p_log, r, p_pred)
+
+        cold = mle.Estimator()
+        cold.data = live.data
+        cold._wlow, cold._whigh = live._wlow, live._whigh
+
+        assert live.get() == pytest.approx(cold.get(), rel=1e-9)
+
+
+def test_get_is_memoized_until_new_data():
+    estimator = mle.Estimator()
+    estimator.add_examples([0.5, 0.25, 0.5], [1, 0, 1], [0.25, 0.5, 1])
+    value = estimator.get()
+
+    def fail(*args):
+        raise AssertionError("get() recomputed without new data")
+
+    estimator.graddualobjective = fail
+    assert estimator.get() == value
+
+    del estimator.graddualobjective
+    estimator.add_example(0.5, 1, 0.5)
+    assert estimator.get() != value
+
+
+def test_memmap_storage_matches_in_memory(tmp_path):
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.05, 1, 10000)
+    r = rng.uniform(0, 1, 10000)
+    p_pred = rng.uniform(0, 1, 10000)
+
+    expected = mle.Estimator()
+    expected.add_examples(p_log, r, p_pred)
+
+    storage = mle.MemmapStorage(str(tmp_path / "mle.bin"), chunk_size=1024, workers=4)
+    actual = mle.Estimator(storage=storage)
+    actual.add_examples(p_log[:5000], r[:5000], p_pred[:5000])
+    for example in zip(p_log[5000:6000], r[5000:6000], p_pred[5000:6000]):
+        actual.add_example(*example)
+    actual.add_examples(p_log[6000:], r[6000:], p_pred[6000:])
+
+    assert len(storage) == 10000
+    assert (tmp_path / "mle.bin").stat().st_size == 9 * 1024 * 3 * 8
+    assert actual.get() == pytest.approx(expected.get(), rel=1e-12)
+
+    first = mle.Estimator(storage=mle.MemmapStorage(chunk_size=1000))
+    second = mle.Estimator(storage=mle.MemmapStorage(chunk_size=1000))
+    first.add_examples(p_log[:3333], r[:3333], p_pred[:3333])
+    second.add_examples(p_log[3333:], r[3333:], p_pred[3333:])
+    merged = first + second
+
+    assert len(merged.data) == 10000
+    assert merged.get() == pytest.approx(expected.get(), rel=1e-12)
+    storage.close()
+
+
+def test_memmap_storage_releases_its_file_and_threads():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.05, 1, 1000)
+    r = rng.uniform(0, 1, 1000)
+    p_pred = rng.uniform(0, 1, 1000)
+
+    with mle.MemmapStorage(chunk_size=100, workers=2) as storage:
+        estimator = mle.Estimator(storage=storage)
+        estimator.add_examples(p_log, r, p_pred)
+        estimator.get()
+        executor = storage._executor
+        assert executor is not None
+
+        estimator.add_example(0.5, 1, 0.5)
+        estimator.get()
+        assert storage._executor is executor
+    assert storage._file.closed
+    assert storage._executor is None
+
+    storage = mle.MemmapStorage(chunk_size=100)
+    storage.extend(p_log, r, p_pred)
+    file = storage._file
+    del storage
+    assert file.closed
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from estimators.bandits import cressieread, gaussian, ips, policy_bank, snips
+
+
+def simulate(rng, n, n_policies, n_actions=4):
+    logging = rng.dirichlet(np.ones(n_actions), n)
+    action = np.array([rng.choice(n_actions, p=p) for p in logging])
+    pmf = rng.dirichlet(np.ones(n_actions), (n, n_policies))
+    r = rng.uniform(0, 1, n)
+    return logging[np.arange(n), action], r, pmf, action
+
+
+def test_policy_bank_matches_estimators():
+    rng = np.random.default_rng(0)
+    p_log, r, pmf, action = simulate(rng, 1000, 3)
+    p_drop = rng.choice([0, 0.2], 1000)
+
+    bank = policy_bank.PolicyBank(3)
+    bank.add_examples(p_log[:600], r[:600], pmf=pmf[:600], action=action[:600])
+    bank.add_examples(
+        p_log[600:], r[600:], pmf=pmf[600:], action=action[600:], p_drop=p_drop[600:]
+    )
+
+    for k in range(3):
+        p_pred = pmf[np.arange(1000), k, action]
+        estimators = [ips.Estimator(), snips.Estimator(), cressieread.Estimator()]
+        intervals = [gaussian.Interval(), cressieread.Interval()]
+        for estimator in estimators:
+            estimator.add_examples(p_log, r, p_pred)
+        for interval in intervals:
+            interval.add_examples(
+                p_log, r, p_pred, p_drop=np.where(np.arange(1000) < 600, 0, p_drop)
+            )
+
+        assert bank.get_ips()[k] == pytest.approx(estimators[0].get())
+        assert bank.get_snips()[k] == pytest.approx(estimators[1].get())
+        assert bank.get_cressieread()[k] == pytest.approx(estimators[2].get())
+        assert tuple(bank.get_gaussian_interval(0.1)[k]) == pytest.approx(
+            intervals[0].get(0.1)
+        )
+        assert tuple(bank.get_cressieread_interval(0.1)[k]) == pytest.approx(
+            intervals[1].get(0.1)
+        )
+
+
+def test_policy_bank_summation_works():
+    rng = np.random.default_rng(0)
+    p_log, r, pmf, action = simulate(rng, 1000, 2)
+    p_pred = pmf[np.arange(1000), :, action]
+
+    first, second, both = (policy_bank.PolicyBank(2) for _ in range(3))
+    first.add_examples(p_log[:300], r[:300], p_pred[:300])
+    second.add_examples(p_log[300:], r[300:], p_pred[300:])
+    both.add_examples(p_log, r, p_pred)
+
+    merged = first + second
+    assert merged.get_snips() == pytest.approx(both.get_snips())
+    assert merged.get_cressieread_interval() == pytest.approx(
+        both.get_cressieread_interval()
+    )
+
+
+def test_policy_bank_validates_input():
+    bank = policy_bank.PolicyBank(2)
+    assert np.isnan(bank.get_ips()).all()
+    assert np.isnan(bank.get_cressieread()).all()
+    with pytest.raises(ValueError):
+        bank.add_examples([0.5], [0.5], [[0.5, 0.5, 0.5]])
+    with pytest.raises(ValueError):
+        bank.add_examples([0.5], [2], [[0.5, 0.5]])
+    assert bank.n == 0
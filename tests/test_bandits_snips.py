@@ -1,3 +1,6 @@
+import numpy as np
+import pytest
+
 from estimators.bandits import snips
 
 
@@ -5,3 +8,30 @@ def test_single_example():
     estimator = snips.Estimator()
     estimator.add_example(0.3, 1, 0.6)
     assert estimator.get() == 1.0
+
+
+def test_add_examples_matches_add_example():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 1000)
+    r = rng.uniform(0, 1, 1000)
+    p_pred = rng.uniform(0, 1, 1000)
+
+    expected = snips.Estimator()
+    for example in zip(p_log, r, p_pred):
+        expected.add_example(*example)
+
+    actual = snips.Estimator()
+    actual.add_examples(p_log, r, p_pred)
+
+    assert actual.get() == pytest.approx(expected.get())
+
+
+def test_add_examples_broadcasts_scalars():
+    expected = snips.Estimator()
+    for r in [0, 1, 1]:
+        expected.add_example(0.5, r, 0.25)
+
+    actual = snips.Estimator()
+    actual.add_examples(0.5, [0, 1, 1], 0.25)
+
+    assert actual.get() == pytest.approx(expected.get())
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from estimators.bandits import clopper_pearson, cressieread, gaussian, ips, snips
+from estimators.ccb import multislot, pdis_cressieread
+
+
+@pytest.mark.parametrize(
+    "estimator",
+    [
+        ips.Estimator,
+        snips.Estimator,
+        cressieread.Estimator,
+        gaussian.Interval,
+        clopper_pearson.Interval,
+        lambda: clopper_pearson.Interval(empirical_r_bounds=True),
+        cressieread.Interval,
+        lambda: cressieread.Interval(empirical_r_bounds=True),
+    ],
+)
+def test_bandits_base_and_deltas_add_up_to_full_state(estimator):
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 300)
+    p_pred = rng.choice([0, 0.5, 1], 300)
+    r = rng.choice([0, 1], 300).astype(float)
+
+    edge, full, central = estimator(), estimator(), estimator()
+    edge.add_examples(p_log[:100], r[:100], p_pred[:100])
+    full.add_examples(p_log[:100], r[:100], p_pred[:100])
+    central = central + edge
+
+    token = edge.checkpoint()
+    for i in range(100, 200, 2):
+        edge.add_examples(p_log[i : i + 2], r[i : i + 2], p_pred[i : i + 2])
+    for i in range(200, 300):
+        edge.add_example(p_log[i], r[i], p_pred[i])
+    full.add_examples(p_log[100:], r[100:], p_pred[100:])
+
+    delta, _ = edge.delta_since(token)
+    assert (central + delta).get() == pytest.approx(full.get(), rel=1e-9)
+    assert edge.get() == pytest.approx(full.get(), rel=1e-9)
+
+
+def test_delta_since_stale_checkpoint_is_rejected():
+    estimator = ips.Estimator()
+    with pytest.raises(ValueError):
+        estimator.delta_since(1)
+
+    token = estimator.checkpoint()
+    estimator.add_example(0.5, 1, 1)
+    delta, next_token = estimator.delta_since(token)
+    assert delta.get() == 2
+
+    # the shipped delta is not fed anymore, the next one starts empty
+    estimator.add_example(0.5, 1, 0.5)
+    assert delta.get() == 2
+    with pytest.raises(ValueError):
+        estimator.delta_since(token)
+    assert estimator.delta_since(next_token)[0].get() == 1
+
+
+def test_interleaved_adds_and_shipping_lose_nothing():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 1000)
+    p_pred = rng.uniform(0, 1, 1000)
+    r = rng.uniform(0, 1, 1000)
+
+    # the edge ships after every batch and single examples arrive in between
+    edge = cressieread.Interval()
+    deltas = []
+    token = edge.checkpoint()
+    for start in range(0, 1000, 37):
+        end = min(start + 37, 1000)
+        edge.add_examples(
+            p_log[start : end - 1], r[start : end - 1], p_pred[start : end - 1]
+        )
+        delta, token = edge.delta_since(token)
+        deltas.append(delta)
+        edge.add_example(p_log[end - 1], r[end - 1], p_pred[end - 1])
+    deltas.append(edge.delta_since(token)[0])
+
+    central = cressieread.Interval.merge_all(deltas)
+    assert central.to_bytes() == edge.to_bytes()
+
+
+def test_rejected_examples_do_not_reach_the_delta():
+    interval = clopper_pearson.Interval()
+    token = interval.checkpoint()
+    with pytest.raises(ValueError):
+        interval.add_examples([0.5], [2], [1])
+    assert interval.delta_since(token)[0].examples_count == 0
+
+
+def test_ccb_delta_holds_only_touched_slots():
+    estimator, full = multislot.Estimator(), multislot.Estimator()
+    for i in range(100):
+        for x in (estimator, full):
+            x.add_example([str(i), "x"], [0.5, 0.5], [1, 0], [1, 0.5])
+    central = multislot.Estimator() + estimator
+
+    token = estimator.checkpoint()
+    for x in (estimator, full):
+        x.add_example(["0", "y"], [0.5, 0.5], [0, 1], [1, 1])
+
+    delta, _ = estimator.delta_since(token)
+    assert sorted(delta._impl) == ["0", "y"]
+    assert len(delta.to_bytes()) < len(estimator.to_bytes()) / 10
+    assert (central + delta).get_r() == pytest.approx(full.get_r())
+
+
+def test_pdis_delta_adds_up_to_full_state():
+    for make in (pdis_cressieread.Estimator, pdis_cressieread.Interval):
+        edge, full = make(), make()
+        for i in range(20):
+            for x in (edge, full):
+                x.add_example([0.5, 0.5], [i % 2, 1], [1, i % 3 / 2])
+        central = make() + edge
+        token = edge.checkpoint()
+        for i in range(20):
+            for x in (edge, full):
+                x.add_example([0.5, 0.5, 0.5], [1, i % 2, 0], [1, 1, i % 3 / 2])
+
+        merged = central + edge.delta_since(token)[0]
+        assert merged.get_r() == pytest.approx(full.get_r())
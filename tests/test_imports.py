@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "estimators",
+        "estimators.bandits.ips",
+        "estimators.bandits.gaussian",
+        "estimators.bandits.cs",
+        "estimators.ccb.multislot",
+    ],
+)
+def test_import_does_not_load_scipy(module):
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; assert 'scipy' not in sys.modules",
+        ],
+        check=True,
+    )
+
+
+def test_submodules_are_loaded_on_access():
+    import estimators
+
+    assert estimators.bandits.ips.Estimator is not None
+    with pytest.raises(AttributeError):
+        estimators.bandits.unknown
+
+
+def test_gaussian_quantiles_without_scipy(monkeypatch):
+    from estimators.math import norm_ppf
+    from scipy.stats import norm
+
+    q = [0.9, 0.975, 0, 1, -0.5, 1.5, float("nan")]
+    expected = norm.ppf(q)
+    monkeypatch.setitem(sys.modules, "scipy.stats", None)
+    assert norm_ppf(q) == pytest.approx(expected, rel=1e-12, nan_ok=True)
@@ -1,7 +1,21 @@
 from re import L
-from estimators.math import IncrementalFsum
+from estimators.math import (
+    FloatSum,
+    IncrementalFsum,
+    NeumaierSum,
+    QuantileCache,
+    as_columns,
+    blocked_fsum,
+    clopper_pearson,
+    clopper_pearson_arrays,
+    clopper_pearson_many,
+)
+import estimators.math
 from utils import Helper
 import math
+from fractions import Fraction
+import numpy as np
+import pytest
 
 
 def test_incremental_fsum_simple():
@@ -59,3 +73,221 @@ def test_incremental_fsum_summation():
 
     expected = 3 * large + 3
     assert math.isclose(float(first_plus_second), expected, rel_tol=0.5**52)
+
+
+def test_as_columns_does_not_copy_float64_views():
+    data = np.arange(12, dtype=np.float64).reshape(4, 3)
+    column, scalar = as_columns(data[1:, 2], 1)
+    assert np.shares_memory(column, data)
+    assert list(scalar) == [1, 1, 1]
+
+
+def test_as_columns_rejects_matrices():
+    with pytest.raises(ValueError):
+        as_columns(np.ones((2, 2)))
+
+
+def test_blocked_fsum_matches_fsum():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 1, 100003) * 10.0 ** rng.integers(-8, 8, 100003)
+    assert blocked_fsum(values) == pytest.approx(math.fsum(values), rel=1e-15)
+    assert blocked_fsum(np.array([])) == 0
+
+
+def test_incremental_fsum_add_many_is_exact():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(-1, 1, 10000) * 10.0 ** rng.integers(-20, 20, 10000)
+
+    one_by_one = IncrementalFsum()
+    for value in values:
+        one_by_one += float(value)
+
+    batched = IncrementalFsum()
+    batched += 2**60
+    batched.add_many(values[:5000])
+    batched.add_many([])
+    batched.add_many(values[5000:])
+    batched += -(2**60)
+
+    assert float(batched) == math.fsum(values) == float(one_by_one)
+
+
+def test_incremental_fsum_add_many_keeps_small_terms():
+    fsum = IncrementalFsum()
+    fsum.add_many(np.full(2**15, 0.5**15))
+    fsum.add_many([2**50])
+    fsum.add_many(np.full(2**15, 0.5**15))
+    assert float(fsum) == 2**50 + 2
+
+
+@pytest.mark.parametrize("accumulator", [FloatSum, NeumaierSum, IncrementalFsum])
+def test_accumulators_agree_on_well_conditioned_sums(accumulator):
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 1, 10000)
+
+    one_by_one = accumulator()
+    for value in values[:5000]:
+        one_by_one += float(value)
+    one_by_one.add_many(values[5000:])
+
+    assert float(one_by_one) == pytest.approx(math.fsum(values), rel=1e-12)
+
+
+def test_neumaier_sum_keeps_small_terms():
+    float_sum = FloatSum()
+    neumaier_sum = NeumaierSum()
+    for accumulator in (float_sum, neumaier_sum):
+        accumulator += 2**53
+        for _ in range(1024):
+            accumulator += 1.0
+        accumulator += -(2**53)
+
+    assert float(float_sum) == 0
+    assert float(neumaier_sum) == 1024
+
+
+def test_accumulators_merge_across_tiers():
+    exact = IncrementalFsum()
+    exact += 2**60
+    exact += 1.0
+    compensated = NeumaierSum()
+    compensated += -(2**60)
+
+    assert float(IncrementalFsum.merge(exact, compensated)) == 1
+    assert float(NeumaierSum.merge(exact, compensated)) == 1
+    assert isinstance(FloatSum.merge(exact, compensated), FloatSum)
+
+
+def test_incremental_fsum_merge_all_is_exact():
+    accumulators = []
+    for value in (2**60, 1.0, -(2**60), 0.5**60, 3.0):
+        accumulator = IncrementalFsum()
+        accumulator += value
+        accumulators.append(accumulator)
+    compensated = NeumaierSum()
+    compensated += -3.0
+    accumulators.append(compensated)
+
+    merged = IncrementalFsum.merge_all(accumulators)
+    assert float(merged) == 1.0 + 0.5**60
+    assert float(IncrementalFsum.merge_all([])) == 0
+
+
+def test_incremental_fsum_keeps_every_partial():
+    # partials more than 2 * 53 bits apart
+    values = [2.0**100, 1.0, 2.0**-100, 2.0**-200]
+
+    first = IncrementalFsum()
+    for value in values:
+        first += value
+    second = IncrementalFsum()
+    second += -(2.0**100)
+    merged = IncrementalFsum.merge_all([first, second])
+
+    batched = IncrementalFsum()
+    batched.add_many(values + [-(2.0**100)])
+
+    for accumulator in (merged, batched):
+        accumulator += -1.0
+        accumulator += -(2.0**-100)
+        assert float(accumulator) == 2.0**-200
+
+
+def test_incremental_fsum_add_many_matches_scalar_path_on_ill_conditioned_sums():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(-1, 1, 3000) * 2.0 ** rng.integers(-300, 300, 3000)
+    values = np.concatenate((values, -values[::2]))
+    rng.shuffle(values)
+
+    one_by_one = IncrementalFsum()
+    for value in values:
+        one_by_one += float(value)
+    batched = IncrementalFsum()
+    for chunk in np.array_split(values, 7):
+        batched.add_many(chunk)
+
+    exact = sum(map(Fraction, values.tolist()))
+    assert sum(map(Fraction, batched.partials)) == exact
+    assert sum(map(Fraction, one_by_one.partials)) == exact
+    assert float(batched) == float(one_by_one) == math.fsum(values)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [1e308, 1e308, -1e308],
+        [math.inf, 1.0, -math.inf],
+        [math.inf, 1.0],
+        [math.nan, 1.0],
+    ],
+)
+def test_incremental_fsum_batches_match_scalar_path_on_non_finite_sums(values):
+    one_by_one = IncrementalFsum()
+    for value in values:
+        one_by_one += value
+    batched = IncrementalFsum().add_many(values)
+    parts = []
+    for value in values:
+        part = IncrementalFsum()
+        part += value
+        parts.append(part)
+    merged = IncrementalFsum.merge_all(parts)
+
+    expected = float(one_by_one)
+    assert not math.isfinite(expected)
+    for result in (batched, merged):
+        assert float(result) == expected or math.isnan(float(result)) == math.isnan(
+            expected
+        )
+
+
+def test_quantile_cache_computes_missing_quantiles_at_once():
+    calls = []
+
+    def quantile(qs, scale):
+        calls.append(list(qs))
+        return qs * scale
+
+    cache = QuantileCache(quantile, maxsize=3)
+    assert cache([0.1, 0.2, 0.1], 10) == [1, 2, 1]
+    assert cache([0.2, 0.3], 10) == [2, 3]
+    assert cache([0.2], 100) == [20]
+    assert calls == [[0.1, 0.2], [0.3], [0.2]]
+
+    # (0.1, 10) is the least recently used entry
+    assert cache([0.3, 0.1], 10) == [3, 1]
+    assert calls[-1] == [0.1]
+
+    # one call for the missing parameters of a fixed quantile
+    assert cache.many(0.3, [10, 20, 10]) == [3, 6, 3]
+    assert calls[-1] == [0.3]
+
+
+def test_clopper_pearson_many_matches_scipy():
+    from scipy.stats import beta
+
+    alphas = [0.2, 0.1, 0.05]
+    for successes, n in ((0, 10), (3, 10), (10, 10), (2.5, 7.5)):
+        for alpha, bounds in zip(alphas, clopper_pearson_many(successes, n, alphas)):
+            expected = (
+                beta.ppf(alpha / 2, successes, n - successes + 1) if successes else 0,
+                (
+                    beta.ppf(1 - alpha / 2, successes + 1, n - successes)
+                    if successes < n
+                    else 1
+                ),
+            )
+            assert bounds == expected
+
+
+def test_clopper_pearson_arrays_matches_clopper_pearson():
+    successes = [0, 3, 10, 3, 2.5, 0, 7]
+    n = [10, 10, 10, 10, 7.5, 0, 7]
+    for alpha in (0.05, 0.1):
+        lower, upper = clopper_pearson_arrays(successes, n, alpha)
+        for s, m, bounds in zip(successes, n, zip(lower, upper)):
+            assert bounds == pytest.approx(clopper_pearson(s, m, alpha), rel=1e-12)
+
+    # the bounds are served from the quantile cache of clopper_pearson
+    assert (0.025, 3.0, 8.0) in estimators.math._beta_ppf._cache
+    assert (0.975, 4.0, 7.0) in estimators.math._beta_ppf._cache
@@ -1,7 +1,9 @@
 import numpy as np
+import pytest
 from math import inf
 
 from estimators.ccb import multislot
+from estimators.math import NeumaierSum
 from utils import Scenario, get_r_intervals, get_r_overall_intervals
 
 
@@ -399,3 +401,30 @@ def test_summation_with_various_slots_works():
     assert_summation_with_different_simulators_works(
         multislot.Interval, simulator1, simulator2, expected
     )
+
+
+def test_summation_keeps_accumulator():
+    first = multislot.Estimator(accumulator=NeumaierSum)
+    second = multislot.Estimator(accumulator=NeumaierSum)
+    for _ in range(10):
+        first.add_example(["0", "1"], [1, 1], [1, 1], [1, 1])
+        second.add_example(["0", "2"], [1, 1], [1, 1], [1, 1])
+
+    result = first + second
+    assert result.n == 20
+    assert isinstance(result._impl["2"].sumw, NeumaierSum)
+    assert result.get_impression() == {"0": 1.0, "1": 0.5, "2": 0.5}
+
+
+def test_merge_all_matches_pairwise_summation():
+    for estimator in (multislot.Estimator, multislot.Interval):
+        shards = [estimator() for _ in range(5)]
+        for i, shard in enumerate(shards):
+            for j in range(10):
+                shard.add_example(["0", str(i % 3 + 1)], [0.5, 0.5], [j % 2, 1], [1, 1])
+
+        merged = estimator.merge_all(shards)
+        pairwise = sum(shards[1:], shards[0])
+        assert merged.n == 50
+        assert merged.get_impression() == pytest.approx(pairwise.get_impression())
+        assert merged.get_r() == pytest.approx(pairwise.get_r())
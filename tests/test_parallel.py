@@ -0,0 +1,78 @@
+import gzip
+
+import numpy as np
+import pytest
+from estimators import parallel
+from estimators.bandits import estimator_set
+
+
+def evaluate_lines(lines):
+    columns = np.loadtxt(lines, delimiter=",", ndmin=2).reshape(-1, 3)
+    result = estimator_set.EstimatorSet()
+    result.add_examples(columns[:, 0], columns[:, 1], columns[:, 2])
+    return result
+
+
+@pytest.fixture
+def log(tmp_path):
+    rng = np.random.default_rng(0)
+    columns = np.column_stack(
+        (rng.uniform(0.1, 1, 1000), rng.uniform(0, 1, 1000), rng.uniform(0, 1, 1000))
+    )
+    path = tmp_path / "log.csv"
+    np.savetxt(path, columns, delimiter=",")
+    return str(path), columns
+
+
+@pytest.mark.parametrize("shard_size", [1, 7, 1000, 1 << 20])
+def test_split_yields_every_line_once(log, shard_size):
+    path, _ = log
+    with open(path, "rb") as f:
+        expected = f.readlines()
+
+    shards = parallel.split(path, shard_size)
+    assert b"".join(line for shard in shards for line in parallel.lines(shard)) == (
+        b"".join(expected)
+    )
+    assert sum(1 for shard in shards for _ in parallel.lines(shard)) == len(expected)
+
+
+def test_split_handles_missing_trailing_newline_and_empty_files(tmp_path):
+    path = tmp_path / "log.txt"
+    path.write_bytes(b"a\nbb\nccc")
+    shards = parallel.split(str(path), 2)
+    assert [list(parallel.lines(shard)) for shard in shards] == [
+        [b"a\n"],
+        [b"bb\n"],
+        [b"ccc"],
+    ]
+
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    assert [list(parallel.lines(shard)) for shard in parallel.split(str(empty), 2)] == [
+        []
+    ]
+
+
+def test_tree_sum_keeps_order():
+    items = [str(i) for i in range(11)]
+    assert parallel.tree_sum(items) == "".join(items)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_evaluate_matches_single_pass(log, tmp_path, max_workers):
+    path, columns = log
+    compressed = str(tmp_path / "log.csv.gz")
+    with open(path, "rb") as src, gzip.open(compressed, "wb") as dst:
+        dst.write(src.read())
+
+    expected = estimator_set.EstimatorSet()
+    for _ in range(2):
+        expected.add_examples(columns[:, 0], columns[:, 1], columns[:, 2])
+
+    result = parallel.evaluate(
+        [path, compressed], evaluate_lines, max_workers=max_workers, shard_size=4096
+    )
+    assert result.ips.get() == pytest.approx(expected.ips.get())
+    assert result.cressieread.get() == pytest.approx(expected.cressieread.get())
+    assert result.clopper_pearson.get() == pytest.approx(expected.clopper_pearson.get())
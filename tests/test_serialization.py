@@ -0,0 +1,171 @@
+import numpy as np
+import pytest
+from estimators import serialization
+from estimators.bandits import (
+    clopper_pearson,
+    cressieread,
+    cs,
+    estimator_set,
+    gaussian,
+    ips,
+    mle,
+    policy_bank,
+    snips,
+)
+from estimators.ccb import first_slot, multislot, pdis_cressieread
+from estimators.math import NeumaierSum
+from estimators.slates import gaussian as slates_gaussian
+from estimators.slates import pseudo_inverse
+
+
+@pytest.fixture
+def examples():
+    rng = np.random.default_rng(0)
+    p_log = rng.uniform(0.1, 1, 1000)
+    p_pred = rng.choice([0, 0.5, 1], 1000)
+    r = rng.choice([0, 1], 1000).astype(float)
+    return p_log, r, p_pred
+
+
+@pytest.mark.parametrize(
+    "estimator",
+    [
+        ips.Estimator,
+        snips.Estimator,
+        cressieread.Estimator,
+        lambda: cressieread.Estimator(accumulator=NeumaierSum),
+        gaussian.Interval,
+        clopper_pearson.Interval,
+        lambda: clopper_pearson.Interval(empirical_r_bounds=True),
+        cressieread.Interval,
+        cs.Interval,
+        cs.MergeableInterval,
+        mle.Estimator,
+        lambda: mle.Estimator(deduplicate=True),
+        lambda: mle.Estimator(quantization=0.01),
+        lambda: mle.Estimator(storage=mle.MemmapStorage(chunk_size=300)),
+    ],
+)
+def test_bandits_round_trip(estimator, examples):
+    original = estimator()
+    original.add_examples(*examples)
+    decoded = type(original).from_bytes(original.to_bytes())
+
+    assert decoded.get() == pytest.approx(original.get(), rel=1e-12)
+    assert decoded.to_bytes() == original.to_bytes()
+
+    # decoded state keeps accumulating
+    for state in (original, decoded):
+        state.add_example(0.5, 1, 0.5)
+        state.add_example(0.5, 0, 0)
+    assert decoded.get() == pytest.approx(original.get(), rel=1e-12)
+
+
+def test_moment_estimators_use_a_few_floats():
+    header = 8
+    assert len(ips.Estimator().to_bytes()) == header + 2 * 8
+    assert len(gaussian.Interval().to_bytes()) == header + 3 * 8
+    assert len(cressieread.Estimator().to_bytes()) == header + 1 + 8 * 8
+    assert len(cressieread.Interval().to_bytes()) == header + 2 + 10 * 8
+
+
+def test_estimator_set_and_policy_bank_round_trip(examples):
+    p_log, r, p_pred = examples
+
+    views = estimator_set.EstimatorSet()
+    views.add_examples(p_log, r, p_pred)
+    decoded = estimator_set.EstimatorSet.from_bytes(views.to_bytes())
+    assert decoded.cressieread.get() == pytest.approx(views.cressieread.get())
+    assert decoded.clopper_pearson.get() == pytest.approx(views.clopper_pearson.get())
+
+    bank = policy_bank.PolicyBank(2)
+    bank.add_examples(p_log, r, np.column_stack((p_pred, 1 - p_pred)))
+    decoded = policy_bank.PolicyBank.from_bytes(bank.to_bytes())
+    assert decoded.get_cressieread_interval() == pytest.approx(
+        bank.get_cressieread_interval()
+    )
+    decoded.add_examples(p_log, r, np.column_stack((p_pred, 1 - p_pred)))
+
+
+def test_ccb_and_slates_round_trip():
+    estimators = [
+        multislot.Estimator(),
+        multislot.Interval(),
+        pdis_cressieread.Estimator(),
+        pdis_cressieread.Interval(),
+    ]
+    for i in range(100):
+        for estimator in estimators[:2]:
+            estimator.add_example(["a", "é"], [0.5, 0.5], [i % 2, 1], [1, i % 3 / 2])
+        for estimator in estimators[2:]:
+            estimator.add_example([0.5, 0.5], [i % 2, 1], [1, i % 3 / 2])
+
+    for estimator in estimators:
+        decoded = type(estimator).from_bytes(estimator.to_bytes())
+        assert decoded.get_r() == pytest.approx(estimator.get_r())
+        assert decoded.get_r_overall() == pytest.approx(estimator.get_r_overall())
+
+    for estimator in (pseudo_inverse.Estimator(), slates_gaussian.Interval()):
+        for i in range(10):
+            estimator.add_example([0.5, 0.5], i % 2, [1, 0])
+        decoded = type(estimator).from_bytes(estimator.to_bytes())
+        assert decoded.get() == pytest.approx(estimator.get())
+
+
+def test_mle_decoding_does_not_copy_or_modify_the_buffer(examples):
+    for estimator in (mle.Estimator(), mle.Estimator(deduplicate=True)):
+        estimator.add_examples(*examples)
+        data = bytearray(estimator.to_bytes())
+        decoded = mle.Estimator.from_bytes(memoryview(data))
+
+        assert np.shares_memory(
+            decoded.data.columns()[1], np.frombuffer(data, np.uint8)
+        )
+        decoded.add_examples(*examples)
+        assert bytes(data) == estimator.to_bytes()
+
+
+def test_invalid_states_are_rejected():
+    data = ips.Estimator().to_bytes()
+    with pytest.raises(ValueError):
+        snips.Estimator.from_bytes(data)
+    with pytest.raises(ValueError):
+        ips.Estimator.from_bytes(data[:-1])
+    with pytest.raises(ValueError):
+        ips.Estimator.from_bytes(data + b"\0")
+    with pytest.raises(ValueError):
+        ips.Estimator.from_bytes(b"NOPE" + data[4:])
+    with pytest.raises(ValueError):
+        ips.Estimator.from_bytes(
+            data[:4] + (serialization.VERSION + 1).to_bytes(2, "little") + data[6:]
+        )
+
+
+def test_any_kind_is_decoded_by_its_class(examples):
+    for estimator in (ips.Estimator(), cressieread.Interval(), multislot.Interval()):
+        decoded = serialization.from_bytes(estimator.to_bytes())
+        assert type(decoded) is type(estimator)
+        assert decoded.to_bytes() == estimator.to_bytes()
+    with pytest.raises(ValueError):
+        serialization.from_bytes(b"VWES\x01\x00\xff\x00")
+
+
+def test_first_slot_embeds_the_bandits_state(examples):
+    p_log, r, p_pred = examples
+    estimators = [
+        first_slot.Estimator(ips.Estimator()),
+        first_slot.Estimator(mle.Estimator()),
+        first_slot.Interval(cressieread.Interval()),
+        first_slot.Interval(clopper_pearson.Interval(empirical_r_bounds=True)),
+    ]
+    for estimator in estimators:
+        for i in range(100):
+            estimator.add_example([p_log[i], 0.5], [r[i], 1], [p_pred[i], 1])
+        decoded = type(estimator).from_bytes(estimator.to_bytes())
+
+        assert type(decoded.impl) is type(estimator.impl)
+        assert decoded.get_r() == pytest.approx(estimator.get_r())
+        assert decoded.to_bytes() == estimator.to_bytes()
+
+    with pytest.raises(ValueError):
+        first_slot.Estimator.from_bytes(estimators[0].to_bytes()[:-1])